@@ -0,0 +1,116 @@
+"""
+CapabilityCache.py
+This file implements a persistent, on-disk store of static device facts
+("capabilities"), keyed by physical endpoint. Each entry is stored along with
+an identity that the device reads cheaply on init; if the identity still
+matches, the facts in the entry can be used instead of probing for them again.
+On a mismatch (e.g. a different instrument now sits at that address), the
+device probes as usual and replaces the entry.
+
+What is cached:
+- SCPIPowerSupply: the SCPI version, validated by the *IDN? response, so
+  SYST:VERS? is skipped when the same instrument is still at that address.
+- CAENPowerSupply: the boards found in the crate at the last login, for the GUI
+  only. The crate map is still read on every login, as that also initializes
+  the crate.
+The readout board is not cached: reading its board ID is already the cheapest
+check of which board is connected.
+
+Entries may also carry "field_hints", which the EnvironmentConfig GUI shows as
+tooltips on the corresponding config fields (e.g. the boards found in a crate,
+next to the board slot field). They describe the device as last seen, and are
+not validated.
+
+The store is a single JSON file, located in $CEREBELLUM_CACHE_DIR if set, and
+~/.cache/cerebellum otherwise. Any failure to read or write the store is only
+logged - a broken cache never stops a device from initializing.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from json import dump, load
+from typing import Any
+import logging, os, threading, time
+
+CACHE_DIR = os.environ.get("CEREBELLUM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cerebellum"))
+CACHE_PATH = os.path.join(CACHE_DIR, "capabilities.json")
+
+# In-memory copy of the store, reloaded whenever the file changes on disk (e.g. written by a test subprocess)
+# {key: {"identity": str, "updated": float, "data": dict}}
+_entries: dict[str, dict[str, Any]] = {}
+_entries_mtime: (float | None) = None
+_lock = threading.Lock()
+
+
+
+# Reload the store from disk if it has changed since it was last read
+def _refresh() -> None:
+    global _entries, _entries_mtime
+    try:
+        mtime = os.path.getmtime(CACHE_PATH)
+    except OSError:
+        return
+    if mtime == _entries_mtime:
+        return
+    try:
+        with open(CACHE_PATH, 'r') as f:
+            _entries = load(f)
+        _entries_mtime = mtime
+    except Exception as e:
+        logging.warning(f"Failed to read device capability cache ({CACHE_PATH}): {e}")
+        _entries = {}
+        _entries_mtime = mtime
+
+# Write the store to disk, replacing the old file atomically
+def _flush() -> None:
+    global _entries_mtime
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            dump(_entries, f, indent=4)
+        os.replace(temp_path, CACHE_PATH)
+        _entries_mtime = os.path.getmtime(CACHE_PATH)
+    except Exception as e:
+        logging.warning(f"Failed to write device capability cache ({CACHE_PATH}): {e}")
+
+
+
+"""
+Returns the cached data for `key` if its stored identity matches `identity`.
+Returns None on a miss or a mismatch, in which case the caller should probe the
+device and store the result with store_capabilities().
+"""
+def get_capabilities(key: str, identity: str) -> (dict[str, Any] | None):
+    with _lock:
+        _refresh()
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry.get("identity") != identity:
+            logging.info(f"Cached capabilities for {key} do not match the device identity; probing again.")
+            return None
+        return entry.get("data")
+
+"""
+Returns the cached data for `key` without an identity check, or None. Only use
+this where stale data is harmless, e.g. for GUI hints.
+"""
+def peek_capabilities(key: str) -> (dict[str, Any] | None):
+    with _lock:
+        _refresh()
+        entry = _entries.get(key)
+        return entry.get("data") if entry else None
+
+"""
+Stores `data` for `key`, along with the `identity` used to validate it later.
+"""
+def store_capabilities(key: str, identity: str, data: dict[str, Any]) -> None:
+    with _lock:
+        _refresh()
+        entry = _entries.get(key)
+        if entry and (entry.get("identity") == identity) and (entry.get("data") == data):
+            return # Nothing changed; skip the write
+        _entries[key] = {"identity": identity, "updated": time.time(), "data": data}
+        _flush()
@@ -0,0 +1,177 @@
+"""
+Codec.py
+This file converts Events and DeviceConfigs to and from JSON-ready data, driven by
+the field schema of each class (see Common.get_schema). Encoding only reads the
+schema's fields from an object, so live objects are never modified. Decoding
+checks every field against the schema and fills in missing fields with their
+defaults in a single pass, before the object is constructed.
+
+There are two encodings:
+- The file format: one dict per object, with a "class_name" key. This is what
+  the config JSON files contain.
+- The wire format: one list per object ([class_name, value, value, ...], in
+  schema order), plus one table of field names per class. It is smaller and
+  faster to parse, and is used to hand configs to the test process.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from Cerebellum.Common import get_schema
+
+from json import dumps
+from typing import Any
+import copy, logging, os
+
+# JSON separators for each encoding
+FILE_INDENT = 4
+WIRE_SEPARATORS = (",", ":")
+
+# Key of the field name table in wire-encoded configs: {class_name: [field names, ...]}
+WIRE_FIELDS_KEY = "fields"
+
+
+
+"""
+Encoding =======================================================================
+"""
+
+# File format: dict of the schema fields of `obj`, followed by its class_name
+def encode_object(obj: Any) -> dict[str, Any]:
+    data = {field.name: getattr(obj, field.name) for field in get_schema(obj.__class__)}
+    data["class_name"] = obj.__class__.__name__
+    return data
+
+# Wire format: [class_name, values...] of `obj`; adds the class's field names to `field_table` if needed
+def encode_object_wire(obj: Any, field_table: dict[str, list[str]]) -> list[Any]:
+    schema = get_schema(obj.__class__)
+    class_name = obj.__class__.__name__
+    if class_name not in field_table:
+        field_table[class_name] = [field.name for field in schema]
+    return [class_name, *(getattr(obj, field.name) for field in schema)]
+
+# Serialize JSON-ready data in the file format (indented) or the wire format (compact)
+def dumps_data(data: Any, wire: bool = False) -> str:
+    if wire:
+        return dumps(data, separators=WIRE_SEPARATORS)
+    return dumps(data, indent=FILE_INDENT)
+
+"""
+Writes `data` to `filepath` in the file format. It is written to a temporary
+file first and then renamed, so a failed write never leaves a partial file.
+"""
+def write_file(filepath: str, data: Any) -> None:
+    temp_filepath = f"{filepath}.tmp"
+    try:
+        with open(temp_filepath, 'w') as f:
+            f.write(dumps_data(data))
+        os.replace(temp_filepath, filepath)
+    finally:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+
+
+
+"""
+Decoding =======================================================================
+"""
+
+# Decoding plans computed so far, by class: (name, type, default, default is mutable) per schema field
+_PLANS: dict[type, tuple[tuple[str, type, Any, bool], ...]] = {}
+
+def _plan(cls: type) -> tuple[tuple[str, type, Any, bool], ...]:
+    plan = _PLANS.get(cls)
+    if plan is None:
+        plan = _PLANS[cls] = tuple((field.name, field.type, field.default, isinstance(field.default, (list, dict))) for field in get_schema(cls))
+    return plan
+
+# Sentinel for fields that are not in the encoded data
+_MISSING = object()
+
+# Check one value against the type of its field; returns the value, converted where lossless (int -> float)
+def check_field(cls: type, name: str, expected: type, value: Any) -> Any:
+    if expected is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif expected is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    elif expected in (bool, str, list, dict):
+        if isinstance(value, expected):
+            return value
+    else:
+        return value # No JSON type to check against (e.g. a None default)
+    raise ValueError(f"Field {name} of {cls.__name__} must be {expected.__name__}, not {type(value).__name__} ({value!r}).")
+
+"""
+Returns the complete field dict for constructing `cls` from `fields`: each schema
+field is type-checked, missing fields get their default (for files written before
+a field was added), and unknown fields are dropped with a warning (a "class_name"
+key is ignored). Raises
+ValueError on the first field with the wrong type.
+"""
+def decode_fields(cls: type, fields: dict[str, Any]) -> dict[str, Any]:
+    values: dict[str, Any] = {}
+    present = 0
+    for name, expected, default, mutable in _plan(cls):
+        value = fields.get(name, _MISSING)
+        if value is _MISSING:
+            values[name] = copy.copy(default) if mutable else default
+            continue
+        present += 1
+        values[name] = value if type(value) is expected else check_field(cls, name, expected, value)
+    if present + ("class_name" in fields) < len(fields):
+        unknown = [name for name in fields if (name not in values) and (name != "class_name")]
+        logging.warning(f"Ignoring unknown field(s) of {cls.__name__}: {', '.join(unknown)}")
+    return values
+
+# Construct `cls` from an encoded field dict, validating it first
+def decode_object(cls: type, fields: dict[str, Any]) -> Any:
+    return cls(vars_dict=decode_fields(cls, fields))
+
+
+
+# Return the class_name of an encoded object in either format
+def object_class_name(data: Any) -> str:
+    if isinstance(data, dict) and ("class_name" in data):
+        return str(data["class_name"])
+    if isinstance(data, list) and data:
+        return str(data[0])
+    raise ValueError(f"Not an encoded object: {str(data)[:80]}")
+
+# --- WireTable: Decodes wire-format objects using the field name table sent with them
+# If the sender's field names for a class match the local schema (the usual case, as both sides run the
+# same installation), rows are decoded by position; otherwise they are matched up by name
+class WireTable:
+    def __init__(self, field_table: dict[str, list[str]]):
+        self.field_table = field_table
+        self.positional: dict[str, bool] = {}
+
+    def decode(self, cls: type, row: list[Any]) -> Any:
+        class_name = row[0]
+        names = self.field_table.get(class_name)
+        if names is None:
+            raise ValueError(f"No field table for {class_name}.")
+        if len(names) != len(row) - 1:
+            raise ValueError(f"{class_name} has {len(row) - 1} values, but its field table has {len(names)} fields.")
+
+        plan = _plan(cls)
+        positional = self.positional.get(class_name)
+        if positional is None:
+            positional = self.positional[class_name] = (list(names) == [entry[0] for entry in plan])
+        if not positional:
+            return decode_object(cls, dict(zip(names, row[1:])))
+
+        values: dict[str, Any] = {}
+        for idx, (name, expected, _, _) in enumerate(plan, 1):
+            value = row[idx]
+            values[name] = value if type(value) is expected else check_field(cls, name, expected, value)
+        return cls(vars_dict=values)
+
+# Construct `cls` from an encoded object in either format; wire-format objects need a WireTable
+def decode_encoded(cls: type, data: Any, wire_table: (WireTable | None) = None) -> Any:
+    if isinstance(data, list):
+        if wire_table is None:
+            raise ValueError("Wire-format object without a field table.")
+        return wire_table.decode(cls, data)
+    return decode_object(cls, data)
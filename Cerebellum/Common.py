@@ -3,7 +3,9 @@ Common.py
 This file contains several initialization routines for Cerebellum's dynamic
 import system. The Device submodule and the Event subpackage are traversed
 to find valid constructors for use by EnvironmentConfig, TestConfig, and
-_init_device_list in Controller.py.
+_init_device_list in Controller.py. It also holds the field schema of each
+Event and DeviceConfig class, which the GUIs and the JSON readers use instead
+of inspecting a blank instance every time.
 """
 
 # Prevents TypeError on type hints for Python 3.7 to 3.9
@@ -12,8 +14,54 @@ from __future__ import annotations
 import Cerebellum.Device, Cerebellum.Event
 from Cerebellum.Device.Device import Device, DeviceConfig
 
-from typing import Any
-import logging, pkgutil, importlib, inspect
+from typing import Any, NamedTuple
+import copy, logging, pkgutil, importlib, inspect
+
+
+
+"""
+Field Schemas ==================================================================
+"""
+
+# --- FieldSchema: Description of one field of an Event or DeviceConfig class
+# name = attribute name, type = type of the default value, default = default value,
+# title = *_title class attribute (or the name), options = *_options class attribute as strings (or None)
+class FieldSchema(NamedTuple):
+    name    : str
+    type    : type
+    default : Any
+    title   : str
+    options : (tuple[str, ...] | None)
+
+# Schemas computed so far, by class; each class is only inspected once per process
+_SCHEMAS: dict[type, tuple[FieldSchema, ...]] = {}
+
+"""
+Returns the field schema of `cls` (an Event or DeviceConfig class), in field
+order. The first call instantiates a blank `cls` to read its fields and defaults;
+later calls are a dict lookup. Raises whatever the constructor raises (e.g.
+TypeError for an abstract class), in which case nothing is cached.
+"""
+def get_schema(cls: type) -> tuple[FieldSchema, ...]:
+    schema = _SCHEMAS.get(cls)
+    if schema is None:
+        blank = cls()
+        fields = []
+        for field_name, default in vars(blank).items():
+            options = getattr(cls, field_name + "_options", None)
+            fields.append(FieldSchema(
+                name=field_name,
+                type=type(default),
+                default=default,
+                title=str(getattr(cls, field_name + "_title", field_name)),
+                options=tuple(str(option) for option in options) if options is not None else None,
+            ))
+        schema = _SCHEMAS[cls] = tuple(fields)
+    return schema
+
+# Returns a fresh dict of the default field values of `cls`
+def get_defaults(cls: type) -> dict[str, Any]:
+    return {field.name: copy.copy(field.default) for field in get_schema(cls)}
 
 
 
@@ -35,7 +83,7 @@ for _, name, _ in pkgutil.walk_packages(Cerebellum.Device.__path__):
     
     try:
         constructor = getattr(module, name + "Config")
-        _ = constructor()
+        _ = get_schema(constructor) # Instantiates the constructor once to verify it
         DEVICE_CONFIGS[name] = constructor
     except Exception as e:
         if ("Can't instantiate abstract class" in str(e)): 
@@ -84,7 +132,7 @@ EVENTS: dict[str, Any] = {}
 for member_name, member in inspect.getmembers(Cerebellum.Event):
     if inspect.isclass(member) and issubclass(member, Cerebellum.Event.Event):
         try:
-            _ = member()
+            _ = get_schema(member) # Instantiates the constructor once to verify it
             EVENTS[member_name] = member
         except Exception as e:
             if ("Can't instantiate abstract class" in str(e)): 
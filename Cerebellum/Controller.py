@@ -9,17 +9,16 @@ object. This file also contains several helper functions for run_test.
 from __future__ import annotations
 
 from Cerebellum.Common import create_device
-from Cerebellum.InputProcessing import stdin_listener, stop_event, get_input
+from Cerebellum.InputProcessing import start_listener, stop_event, abort_event, get_input
 from Cerebellum.EnvironmentConfig import EnvironmentConfig
 from Cerebellum.TestConfig import TestConfig
 from Cerebellum.Event import Event, DeviceEvent, DeferredInit
 from Cerebellum.Device.Device import Device, DeviceConfig
+from Cerebellum.LogSystem import log_context, add_sink, remove_sink, file_sink
+from Cerebellum.Protocol import PROTOCOL_VERSION, emit
 
-import logging, threading, signal
-from contextlib import contextmanager
-
-# Start thread to listen for STOP message on stdin - see InputProcessing.py
-threading.Thread(target=stdin_listener, daemon=True).start()
+from typing import Any, Iterable
+import logging, signal, time
 
 
 
@@ -28,8 +27,9 @@ Main Function + Helpers ========================================================
 """
 
 """
-Runs the test specified by `test` on the environment specified by `env`.
-The procedure for running a test is as follows:
+Runs the test specified by `test` on the environment specified by `env`, with
+the test's parameters set to `parameters` (only those that differ from the
+defaults need to be given - see TestConfig.py). The procedure for running a test is as follows:
 1.  Verify the event list. Make sure every event in `test` points to the correct
     device type in `env` - catch the error now, instead of during runtime.
 2.  Initialize the devices. Connect to each device from `env` and store its
@@ -43,46 +43,83 @@ and skip to the shutdown phase. The shutdown phase cannot be interrupted by any
 means except a SIGKILL (or equivalent) signal - keyboard interrupts (Ctrl+C) and
 regular terminations are ignored.
 """
-def run_test(env: EnvironmentConfig, test: TestConfig) -> None:
+def run_test(env: EnvironmentConfig, test: TestConfig, parameters: (dict[str, Any] | None) = None) -> None:
+
+    # Listen for the STOP message on stdin - see InputProcessing.py
+    # A fault from a previous run is not carried over, but a STOP is
+    start_listener()
+    if not stop_event.is_set():
+        abort_event.clear()
+
+    # If requested, also write the whole log of this test to a file
+    log_file_sink = None
+    if env.log_file:
+        try:
+            log_file_sink = file_sink(env.log_file)
+            add_sink(log_file_sink)
+            logging.info(f"Writing test log to {env.log_file}")
+        except Exception as e:
+            logging.warning(f"Could not open log file {env.log_file}: {e}")
     
+    # Report the start of the run (for RunTestGUI - see Protocol.py)
+    run_start = time.monotonic()
+    run_error = ""
+    emit("run_start", version=PROTOCOL_VERSION, events=len(test.event_list), devices=len(env.device_config_list))
+
     # Attempt to run the regular program sequence
     try:
         
         # Before anything, check that each DeviceEvent will refer to a device that exists and matches the type (e.g. PowerSupplyEvent)
         # Also build a list of device idx that will defer their inits
+        # Events are streamed with bindings and macros expanded (see TestConfig.events), so a lazily opened test is read once here and again for execution
+        # This pass also checks that every parameter and macro resolves, and counts the expanded events
+        emit("phase", name="verify")
         logging.info("Verifying event list ==========")
+        if test.parameters:
+            logging.info(f"Test parameters: {test.resolve_parameters(parameters)}")
         deferred_devices: list[int] = []
-        for idx, event in enumerate(test.event_list):
+        event_count = 0
+        for idx, event in enumerate(test.events(parameters)):
+            event_count += 1
             if isinstance(event, DeviceEvent):
 
                 try:
-                    _ = env.device_config_list[event.device_idx]
-                except IndexError:
-                    raise IndexError(f"Event #{idx} failed to verify: device_idx ({event.device_idx}) is out of range of the device list.")
-                
-                try:
-                    event.verify(env.device_config_list[event.device_idx])
+                    device_indices = event.get_device_indices()
                 except Exception as e:
                     raise RuntimeError(f"Event #{idx} failed to verify: {e}")
 
+                for device_idx in device_indices:
+                    try:
+                        _ = env.device_config_list[device_idx]
+                    except IndexError:
+                        raise IndexError(f"Event #{idx} failed to verify: device_idx ({device_idx}) is out of range of the device list.")
+                    
+                    try:
+                        event.verify(env.device_config_list[device_idx])
+                    except Exception as e:
+                        raise RuntimeError(f"Event #{idx} failed to verify: {e}")
+
                 if isinstance(event, DeferredInit):
                     deferred_devices.append(event.device_idx)
                 
         logging.info("All events verified successfully.")
 
         # Initialize all devices
+        emit("phase", name="init")
         logging.info("Intializing devices ==========")
         device_list = _init_device_list(env.device_config_list, deferred_devices)
 
         # Report and wait for user input
         logging.info("All devices initialized successfully.")
         logging.info("Verify the credentials appear as expected before continuing to event execution.")
+        emit("phase", name="confirm")
         get_input("Press Enter to continue...")
 
         # Execute all events
         logging.info("")
+        emit("phase", name="exec", events=event_count)
         logging.info("Executing events ==========")
-        _exec_events(test.event_list, device_list, env.device_config_list)
+        _exec_events(test.events(parameters), device_list, env.device_config_list)
 
         # Report and end the test
         logging.info("")
@@ -98,9 +135,10 @@ def run_test(env: EnvironmentConfig, test: TestConfig) -> None:
         A BaseException (e.g. KeyboardInterrupt) will re-raise after run_test is
         complete
         """
-        print()
-        logging.basicConfig(format="%(levelname)s: %(message)s", force=True)
+        logging.info("")
         logging.error(f"During the testing routine, an exception was encountered: {e}")
+        run_error = str(e)
+        emit("error", message=run_error)
         logging.error(f"Aborting testing routine.")
         pass
 
@@ -111,9 +149,14 @@ def run_test(env: EnvironmentConfig, test: TestConfig) -> None:
             if "device_list" not in locals():
                 logging.info("Device list has not been initialized. Skipping shutdown sequence.")
             else:
+                emit("phase", name="shutdown")
                 logging.info("Shutting down devices ==========")
                 _shutdown(env.shutdown_order, device_list, env.device_config_list)
 
+            emit("run_end", ok=(not run_error), duration=time.monotonic() - run_start, error=run_error)
+            if log_file_sink:
+                remove_sink(log_file_sink)
+
 
 
 """
@@ -133,7 +176,7 @@ def _init_device_list(device_config_list: list[DeviceConfig], deferred_devices:
             device_list.append(None)
         else:
             logging.info(f"Initializing device #{idx} ({device_config.display_name}) ----------")
-            with tab_logging():
+            with log_context(device=f"#{idx}"):
                 device = create_device(device_config)
                 logging.info(device.get_id())
                 device_list.append(device)
@@ -143,36 +186,65 @@ def _init_device_list(device_config_list: list[DeviceConfig], deferred_devices:
 
 
 """
-Executes the events specified by `event_list`, using the devices in `device_list`.
-Check for the STOP command on stdin before each event - raise an error to abort
-the test if the command is received. 
+Executes the events produced by `events`, using the devices in `device_list`.
+Check for the STOP command on stdin and for device faults before each event and
+after the last one - raise an error to abort the test if either is found.
+A long-running event ends early on either (see InputProcessing.py), so the test
+is aborted as soon as that event returns.
 """
-def _exec_events(event_list: list[Event], device_list: list[Device], device_config_list: list[DeviceConfig]) -> None:
+def _exec_events(events: Iterable[Event], device_list: list[Device], device_config_list: list[DeviceConfig]) -> None:
 
-    for idx, event in enumerate(event_list):
+    for idx, event in enumerate(events):
 
-        # Check if the message "STOP" is sent on stdin before running the next event in the loop
-        # If so, throw a RuntimeError
-        if stop_event.is_set():
-            raise RuntimeError("Received message on stdin to abort the testing routine.")
+        _check_abort(device_list, device_config_list)
 
         logging.info(f"Executing event #{idx} ----------")
-        with tab_logging():
-            logging.info(f"{event.__class__.__name__}: {event.comment}")
+        emit("event_start", index=idx, name=event.__class__.__name__, comment=event.comment)
+        event_start = time.monotonic()
+        try:
+            with log_context(event=idx):
+                logging.info(f"{event.__class__.__name__}: {event.comment}")
 
-            if isinstance(event, DeferredInit):
-                logging.info(f"Initializing device #{event.device_idx} ({device_config_list[event.device_idx].display_name})")
-                device = create_device(device_config_list[event.device_idx])
-                logging.info(device.get_id())
-                device_list[event.device_idx] = device
-            elif isinstance(event, DeviceEvent):
-                device = device_list[event.device_idx]
-                if device:
-                    event.exec(device_list[event.device_idx])
+                if isinstance(event, DeferredInit):
+                    logging.info(f"Initializing device #{event.device_idx} ({device_config_list[event.device_idx].display_name})")
+                    device = create_device(device_config_list[event.device_idx])
+                    logging.info(device.get_id())
+                    device_list[event.device_idx] = device
+                elif isinstance(event, DeviceEvent):
+                    device_indices = event.get_device_indices()
+                    for device_idx in device_indices:
+                        if not device_list[device_idx]:
+                            raise RuntimeError(f"Device #{device_idx} ({device_config_list[device_idx].display_name}) was not initialized before use. Check if a DeferredInitEvent is called before this event.")
+                    if len(device_indices) == 1:
+                        event.exec(device_list[device_indices[0]])
+                    else:
+                        event.exec_multi([device_list[device_idx] for device_idx in device_indices])
                 else:
-                    raise RuntimeError(f"Device #{event.device_idx} ({device_config_list[event.device_idx].display_name}) was not initialized before use. Check if a DeferredInitEvent is called before this event.")
-            else:
-                event.exec()
+                    event.exec()
+        except Exception as e:
+            emit("event_end", index=idx, ok=False, duration=time.monotonic() - event_start, error=str(e))
+            raise
+        emit("event_end", index=idx, ok=True, duration=time.monotonic() - event_start, error="")
+
+    # The last event may have ended early on a STOP or a fault
+    _check_abort(device_list, device_config_list)
+
+
+
+"""
+Raises an error if the message "STOP" was sent on stdin, or if any device in
+`device_list` has reported a fault (e.g. a tripped PSU channel) since the last check.
+"""
+def _check_abort(device_list: list[Device], device_config_list: list[DeviceConfig]) -> None:
+
+    if stop_event.is_set():
+        raise RuntimeError("Received message on stdin to abort the testing routine.")
+
+    for dev_idx, device in enumerate(device_list):
+        if device:
+            faults = device.get_faults()
+            if faults:
+                raise RuntimeError(f"Device #{dev_idx} ({device_config_list[dev_idx].display_name}) reported a fault: {' '.join(faults)}")
 
 
 
@@ -201,20 +273,6 @@ def _shutdown(shutdown_order: list[int], device_list: list[Device], device_confi
 
 
 
-# Simple contextmanager to tab logging format during an event
-@contextmanager
-def tab_logging():
-
-    # Tab four spaces
-    logging.basicConfig(format="%(levelname)s:     %(message)s", force=True)
-
-    yield
-    
-    # Return formatting to default
-    logging.basicConfig(format="%(levelname)s: %(message)s", force=True)
-
-
-
 # Interrupt Delayer
 # Adapted from https://gist.github.com/tcwalther/ae058c64d5d9078a9f333913718bba95
 class _DelayedInterrupt(object):
@@ -9,19 +9,70 @@ Partially adapted from Tao Huang's implementation. https://gitlab.cern.ch/tahuan
 An individual CAEN system, a "crate", has a number of "slots" for individual
 PSUs. Each "slot" houses a "board", which has its own "channels" that power
 can be delivered from.
+
+Channel parameters are exposed in SI units (V, A); raw crate values are scaled
+by each parameter's exponent (e.g. I0Set is usually stored in uA). Parameter
+properties are fetched once per channel and cached for the session.
+
+Several CAENPowerSupply devices (one per board) in the same crate share a single
+login and crate map through the crate session pool below. The session is only
+closed once the last board using it is released.
+
+With event mode enabled, a board subscribes to VMon, IMon, Status and Pw of its
+channels. A monitor thread keeps an in-memory snapshot of these parameters up to
+date, which is used for reads as long as the crate has sent data recently, and
+reports channel trips the moment they arrive.
 """
 
 # Prevents TypeError on type hints for Python 3.7 to 3.9
 from __future__ import annotations
 
 from Cerebellum.Device.PowerSupply import PowerSupply, PowerSupplyConfig
+from Cerebellum.InputProcessing import abort_event
+from Cerebellum.CapabilityCache import store_capabilities
 
 from caen_libs import caenhvwrapper
 from typing import Any
-import time, logging
+import time, logging, threading
 
 CAEN_WRITE_DELAY = 0.1
 
+# Polling intervals (s) for wait_for_channels; the interval grows by CAEN_POLL_BACKOFF each poll
+CAEN_POLL_MIN = 0.1
+CAEN_POLL_MAX = 2.0
+CAEN_POLL_BACKOFF = 1.5
+
+# Maximum time (s) to wait for all channels to ramp down during shutdown
+CAEN_SHUTDOWN_TIMEOUT = 600.0
+
+# A channel is considered at its set-point when VMon is within this tolerance of V0Set
+# (whichever is larger of the absolute (V) and relative tolerances)
+CAEN_SETPOINT_ABS_TOL = 1.0
+CAEN_SETPOINT_REL_TOL = 0.01
+
+# Channel Status bits
+CAEN_STATUS_BITS: dict[int, str] = {
+    0:  "On",
+    1:  "Ramping Up",
+    2:  "Ramping Down",
+    3:  "Over-Current",
+    4:  "Over-Voltage",
+    5:  "Under-Voltage",
+    6:  "External Trip",
+    7:  "Max V",
+    8:  "External Disable",
+    9:  "Internal Trip",
+    10: "Calibration Error",
+    11: "Unplugged",
+}
+CAEN_STATUS_ON      = 1 << 0
+CAEN_STATUS_RAMPING = (1 << 1) | (1 << 2)
+CAEN_STATUS_TRIPPED = (1 << 6) | (1 << 8) | (1 << 9) | (1 << 11)
+
+# Channel parameters subscribed to in event mode, and how often (s) the monitor thread collects event data
+CAEN_MONITOR_PARAMS = ['VMon', 'IMon', 'Status', 'Pw']
+CAEN_MONITOR_INTERVAL = 0.05
+
 
 
 class CAENPowerSupplyConfig(PowerSupplyConfig):
@@ -34,6 +85,8 @@ class CAENPowerSupplyConfig(PowerSupplyConfig):
     username_title      = "Username"
     password_title      = "Password"
     board_slot_title    = "Board Slot #"
+    event_mode_title    = "Event Mode (Subscribe to Monitored Parameters)"
+    max_age_title       = "Event Mode Max Data Age (s)"
 
     # *_options = Options for field to provide in a dropdown menu
     # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
@@ -59,9 +112,169 @@ class CAENPowerSupplyConfig(PowerSupplyConfig):
             self.username       : str   = ""                        # Username for logging into CAEN crate
             self.password       : str   = ""                        # Password for logging into CAEN crate
             self.board_slot     : int   = 0                         # Board slot of PSU to initialize
+            self.event_mode     : bool  = False                     # Serve VMon/IMon/Status/Pw from crate subscriptions instead of polling
+            self.max_age        : float = 5.0                       # Subscribed data is only used if the crate has sent data within this time
+
+    # Return the key of this config's physical endpoint in the capability cache
+    def get_capability_key(self) -> (str | None):
+        return f"CAENPowerSupply:{self.system_type}:{self.link_type}:{self.ip}" if self.ip else None
+
+
+
+"""
+Crate Sessions =================================================================
+"""
+
+# --- _CAENCrateSession: A single login to a CAEN crate, shared by every board device in that crate
+# Holds the crate map, which is only fetched once per login. All crate access
+# should be made while holding the session lock.
+class _CAENCrateSession:
+
+    def __init__(self, config: CAENPowerSupplyConfig):
+
+        self.ip     : str   = config.ip
+        self.lock           = threading.RLock() # Reentrant, so a device can hold it across several crate calls
+        self.users  : int   = 0                 # Number of board devices using this session
+
+        # Event mode state, used once a board subscribes to its channel parameters
+        # snapshot: {(slot, channel, parameter): raw value}, kept up to date by the monitor thread
+        # faults: {slot: [fault messages]}, reported by the monitor thread and collected by the board devices
+        self.snapshot           : dict[tuple[int, int, str], Any]   = {}
+        self.faults             : dict[int, list[str]]              = {}
+        self.last_event_time    : float                             = float('-inf')
+        self.monitor_thread     : (threading.Thread | None)         = None
+        self.monitor_stop                                           = threading.Event()
+
+        try:
+            self.device = caenhvwrapper.Device.open(
+                caenhvwrapper.SystemType[config.system_type],
+                caenhvwrapper.LinkType[config.link_type],
+                config.ip,
+                config.username,
+                config.password)
+            self.crate_map = self.device.get_crate_map() # Also does some initialization
+            logging.info(f"Logged in to CAEN crate at address ({self.ip}).")
+        except Exception as e:
+            raise RuntimeError(f"Failed to open CAENPowerSupply at address ({self.ip}): {e}")
+
+        # Record the boards in the capability cache, so the GUI can show them next to the board slot field
+        # The crate map itself is always fetched on login, since it also initializes the crate, so this
+        # is only a hint for the GUI: it shows the boards found at the last login
+        # The identity is the slot:model layout of the crate, so the entry is only rewritten when it changes
+        key = config.get_capability_key()
+        if key:
+            boards = [board for board in self.crate_map if board is not None]
+            board_list = ", ".join(f"{board.slot}: {board.model} ({board.n_channel} channels)" for board in boards)
+            layout = ", ".join(f"{board.slot}:{board.model}" for board in boards)
+            store_capabilities(key, layout, {
+                "field_hints": {"board_slot": f"Boards found in this crate - {board_list}"}
+            })
+
+    # Start the thread that collects subscribed event data, if it isn't already running
+    def start_monitor(self) -> None:
+        with self.lock:
+            if self.monitor_thread is None:
+                self.monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+                self.monitor_thread.start()
+
+    # Check whether the subscribed data is recent enough to be trusted
+    # The crate only sends parameters when they change (plus keep-alives), so
+    # freshness is judged by the last event of any kind, not per value
+    def is_fresh(self, max_age: float) -> bool:
+        return (self.monitor_thread is not None) and (time.monotonic() - self.last_event_time <= max_age)
+
+    # Return and clear the faults reported for the given slot
+    def pop_faults(self, slot: int) -> list[str]:
+        with self.lock:
+            return self.faults.pop(slot, [])
+
+    # Monitor thread: collect event data from the crate, update the snapshot, and report trips as they arrive
+    def _monitor(self) -> None:
+        while not self.monitor_stop.is_set():
+
+            try:
+                with self.lock:
+                    if not self.device:
+                        break
+                    events, _ = self.device.get_event_data()
+            except Exception as e:
+                logging.warning(f"Failed to get CAEN event data at address ({self.ip}): {e}")
+                self.monitor_stop.wait(1.0)
+                continue
+
+            if events:
+                self.last_event_time = time.monotonic()
+            for event in events:
+                if (event.channel_index < 0) or (event.item_id not in CAEN_MONITOR_PARAMS):
+                    continue
+                key = (event.board_index, event.channel_index, event.item_id)
+                previous = self.snapshot.get(key)
+                self.snapshot[key] = event.value
+
+                # Report a trip as soon as the Status bits show one, once per trip
+                # abort_event ends any long-running event, so the controller acts on the trip right away
+                if (event.item_id == 'Status'):
+                    status = int(event.value)
+                    was_tripped = (previous is not None) and (int(previous) & CAEN_STATUS_TRIPPED)
+                    if (status & CAEN_STATUS_TRIPPED) and not was_tripped:
+                        message = f"CAEN HV slot {event.board_index}, channel {event.channel_index} tripped (Status: {CAENPowerSupply._describe_status(status)})."
+                        logging.error(message)
+                        with self.lock:
+                            self.faults.setdefault(event.board_index, []).append(message)
+                        abort_event.set()
+
+            self.monitor_stop.wait(CAEN_MONITOR_INTERVAL)
+
+    # Log out of the crate
+    def close(self) -> None:
+        self.monitor_stop.set()
+        if self.monitor_thread and (self.monitor_thread is not threading.current_thread()):
+            self.monitor_thread.join(timeout=5.0)
+        with self.lock:
+            if self.device:
+                self.device.close()
+                self.device = None
+                logging.info(f"Closed CAENPowerSupply at address ({self.ip}).")
 
 
 
+# Pool of open crate sessions, keyed by (system_type, link_type, ip, username)
+_CRATE_SESSIONS: dict[tuple[str, str, str, str], _CAENCrateSession] = {}
+_CRATE_SESSIONS_LOCK = threading.Lock()
+
+# Return the pool key of the crate login described by `config`
+def _crate_session_key(config: CAENPowerSupplyConfig) -> tuple[str, str, str, str]:
+    return (config.system_type, config.link_type, config.ip, config.username)
+
+# Get the shared crate session for `config`, logging in if no other board is using it
+def _acquire_crate_session(config: CAENPowerSupplyConfig) -> _CAENCrateSession:
+    key = _crate_session_key(config)
+    with _CRATE_SESSIONS_LOCK:
+        session = _CRATE_SESSIONS.get(key)
+        if session is None:
+            session = _CAENCrateSession(config)
+            _CRATE_SESSIONS[key] = session
+        else:
+            logging.info(f"Sharing existing CAEN crate session at address ({config.ip}).")
+        session.users += 1
+        return session
+
+# Release a session from `_acquire_crate_session`, logging out when the last board is done with it
+def _release_crate_session(session: _CAENCrateSession) -> None:
+    with _CRATE_SESSIONS_LOCK:
+        session.users -= 1
+        if session.users <= 0:
+            for key, pooled in list(_CRATE_SESSIONS.items()):
+                if pooled is session:
+                    del _CRATE_SESSIONS[key]
+            session.close()
+
+
+
+"""
+Device =========================================================================
+"""
+
 class CAENPowerSupply(PowerSupply):
 
     """
@@ -80,26 +293,62 @@ class CAENPowerSupply(PowerSupply):
         if self.config.link_type not in all_link_type:
             raise KeyError(f"Invalid link_type from CAEN HV config ({self.config.link_type}). Available choices: {all_link_type}")
         
+        # Cache of channel parameter properties, filled lazily by _get_param_prop
+        # {channel: {parameter: ParamProp, or None if not fetched yet}}
+        self._param_cache: dict[int, dict[str, Any]] = {}
+
+        # Set once this board has subscribed to its channel parameters (event mode)
+        self.subscribed: bool = False
+
+        # Log in to the crate (or share an existing login), then find this board in the shared crate map
+        self.session = _acquire_crate_session(self.config)
+        self.device = self.session.device
         try:
-            self.device = caenhvwrapper.Device.open(
-                caenhvwrapper.SystemType[self.config.system_type],
-                caenhvwrapper.LinkType[self.config.link_type],
-                self.config.ip,
-                self.config.username,
-                self.config.password)
-            all_slots = self.device.get_crate_map() # Also does some initialization
-            self.board = all_slots[self.config.board_slot]
+            all_slots = self.session.crate_map
+            self.board = all_slots[self.config.board_slot] if (0 <= self.config.board_slot < len(all_slots)) else None
             if (self.board is None):
                 raise IndexError(f"Invalid board_slot from CAEN HV config ({self.config.board_slot}). Available choices: {[board.slot for board in all_slots if board is not None]}")
-            logging.info(f"Opened CAENPowerSupply at address ({self.config.ip}).")
+            logging.info(f"Opened CAENPowerSupply at address ({self.config.ip}), slot {self.config.board_slot}.")
+
+            # In event mode, subscribe to the monitored parameters of every channel on this board
+            # If a subscription fails partway, the channels already subscribed are unsubscribed
+            # again, since the session may be shared with other boards and outlive this one
+            if self.config.event_mode:
+                with self.session.lock:
+                    subscribed_channels = []
+                    try:
+                        for channel in range(self.board.n_channel):
+                            self.device.subscribe_channel_params(self.board.slot, channel, CAEN_MONITOR_PARAMS)
+                            subscribed_channels.append(channel)
+                    except Exception:
+                        for channel in subscribed_channels:
+                            try:
+                                self.device.unsubscribe_channel_params(self.board.slot, channel, CAEN_MONITOR_PARAMS)
+                            except Exception as e:
+                                logging.warning(f"Failed to unsubscribe channel {channel} of slot {self.board.slot}: {e}")
+                        raise
+                self.subscribed = True
+                self.session.start_monitor()
+                logging.info(f"Subscribed to {CAEN_MONITOR_PARAMS} on all {self.board.n_channel} channels.")
         except Exception as e:
+            _release_crate_session(self.session)
+            self.session = None
             raise RuntimeError(f"Failed to open CAENPowerSupply at address ({self.config.ip}): {e}")
 
     # Attempt to close any open connections when deallocated
+    # The crate session is only closed once the last board using it is released
     def __del__(self):
-        if ("device" in vars(self)) and self.device:
-            self.device.close()
-            logging.info(f"Closed CAENPowerSupply at address ({self.config.ip}).")
+        if ("session" in vars(self)) and self.session:
+            if vars(self).get("subscribed"):
+                try:
+                    with self.session.lock:
+                        for channel in range(self.board.n_channel):
+                            self.device.unsubscribe_channel_params(self.board.slot, channel, CAEN_MONITOR_PARAMS)
+                except Exception as e:
+                    logging.warning(f"Failed to unsubscribe CAENPowerSupply at address ({self.config.ip}), slot {self.config.board_slot}: {e}")
+            _release_crate_session(self.session)
+            self.session = None
+            self.device = None
     
     # Get any identification data
     def get_id(self) -> str:
@@ -148,11 +397,107 @@ class CAENPowerSupply(PowerSupply):
     def get_channel_state(self, channel: int) -> bool:
         return bool(self._get_channel_parameter(channel, 'Pw'))
     
+    # Return (and clear) any channel trips reported by the event mode monitor
+    def get_faults(self) -> list[str]:
+        return self.session.pop_faults(self.board.slot) if self.session else []
+
     # Shutdown (i.e. disable, not disconnect) the device
+    # Wait for the channels to actually ramp down instead of sleeping for a fixed time
     def shutdown(self) -> None:
-        for channel in range(self.board.n_channel):
-            self.disable_channel(channel)
-        time.sleep(5)
+        channels = list(range(self.board.n_channel))
+        self.disable_channels(channels)
+        elapsed = self.wait_for_channels(channels, CAEN_SHUTDOWN_TIMEOUT, fail_on_trip=False, targets=[False] * len(channels))
+        logging.info(f"All channels off after {elapsed:.1f} s.")
+
+
+
+    """
+    Multi-Channel Methods ==================================================
+    """
+
+    # Set the voltage setting of the given channels
+    def set_voltages(self, channels: list[int], voltage: float) -> None:
+        self._set_channels_parameter(channels, 'V0Set', voltage)
+
+    # Set the current setting of the given channels
+    def set_currents(self, channels: list[int], current: float) -> None:
+        self._set_channels_parameter(channels, 'I0Set', current)
+
+    # Get the voltage settings of the given channels
+    def get_voltages(self, channels: list[int]) -> list[float]:
+        return [float(value) for value in self._get_channels_parameter(channels, 'V0Set')]
+
+    # Get the current settings of the given channels
+    def get_currents(self, channels: list[int]) -> list[float]:
+        return [float(value) for value in self._get_channels_parameter(channels, 'I0Set')]
+
+    # Measure the voltages at the given channels
+    def measure_voltages(self, channels: list[int]) -> list[float]:
+        return [float(value) for value in self._get_channels_parameter(channels, 'VMon')]
+
+    # Measure the currents at the given channels
+    def measure_currents(self, channels: list[int]) -> list[float]:
+        return [float(value) for value in self._get_channels_parameter(channels, 'IMon')]
+
+    # Measure the powers at the given channels
+    def measure_powers(self, channels: list[int]) -> list[float]:
+        voltages = self.measure_voltages(channels)
+        currents = self.measure_currents(channels)
+        return [voltage * current for voltage, current in zip(voltages, currents)]
+
+    # Disable the given channels
+    def disable_channels(self, channels: list[int]) -> None:
+        self._set_channels_parameter(channels, 'Pw', 0)
+
+    # Enable the given channels
+    def enable_channels(self, channels: list[int]) -> None:
+        self._set_channels_parameter(channels, 'Pw', 1)
+
+    # Return the enable/disable states of the given channels
+    def get_channel_states(self, channels: list[int]) -> list[bool]:
+        return [bool(value) for value in self._get_channels_parameter(channels, 'Pw')]
+
+
+    # Block until the given channels have finished ramping, polling the channel Status bits
+    # Each channel must have finished ramping and match its Pw setting; enabled
+    # channels must also have VMon within tolerance of V0Set. The polling interval
+    # starts short and backs off, so short ramps return quickly without flooding
+    # the crate during long ones. A tripped channel raises immediately, unless
+    # fail_on_trip is False (e.g. during shutdown, where a tripped channel is off anyway).
+    # The Pw setting of each channel is read from the crate, unless the caller gives the
+    # expected states as `targets` (e.g. right after writing them).
+    def wait_for_channels(self, channels: list[int], timeout: float, fail_on_trip: bool = True, targets: (list[bool] | None) = None) -> float:
+
+        start = time.monotonic()
+        interval = CAEN_POLL_MIN
+        if targets is None:
+            targets = self.get_channel_states(channels)
+        setpoints = self.get_voltages(channels)
+
+        while True:
+
+            statuses = [int(status) for status in self._get_channels_parameter(channels, 'Status')]
+            voltages = self.measure_voltages(channels) if any(targets) else [0.0] * len(channels)
+
+            pending: list[int] = []
+            for channel, target, setpoint, status, voltage in zip(channels, targets, setpoints, statuses, voltages):
+                if status & CAEN_STATUS_TRIPPED:
+                    if fail_on_trip:
+                        raise RuntimeError(f"CAEN HV channel {channel} tripped (Status: {self._describe_status(status)}).")
+                    continue
+                if (status & CAEN_STATUS_RAMPING) or (bool(status & CAEN_STATUS_ON) != target):
+                    pending.append(channel)
+                elif target and (abs(voltage - setpoint) > max(CAEN_SETPOINT_ABS_TOL, CAEN_SETPOINT_REL_TOL * abs(setpoint))):
+                    pending.append(channel)
+
+            elapsed = time.monotonic() - start
+            if not pending:
+                return elapsed
+            if elapsed >= timeout:
+                raise TimeoutError(f"CAEN HV channels {pending} did not reach their settings within {timeout} s.")
+
+            time.sleep(min(interval, timeout - elapsed))
+            interval = min(interval * CAEN_POLL_BACKOFF, CAEN_POLL_MAX)
 
 
 
@@ -160,25 +505,119 @@ class CAENPowerSupply(PowerSupply):
     Helper Methods =========================================================
     """
 
-    # NOTE: May need to convert exponent/decimal? See https://github.com/caenspa/py-caen-libs/blob/main/src/caen_libs/_caenhvwrappertypes.py#L257
+    # Convert a channel Status value into a readable list of the set bits
+    @staticmethod
+    def _describe_status(status: int) -> str:
+        names = [name for bit, name in CAEN_STATUS_BITS.items() if status & (1 << bit)]
+        return ", ".join(names) if names else "Off"
+
+    # Get the (cached) property of a channel parameter
+    # The parameter list of each channel is fetched once, and each parameter's
+    # properties (mode, type, unit, range, exponent) are fetched on first use,
+    # then kept for the rest of the session
+    def _get_param_prop(self, channel: int, parameter: str):
+
+        if channel not in self._param_cache:
+            if not (0 <= channel < self.board.n_channel):
+                raise IndexError(f"Invalid CAEN HV channel ({channel}). Board in slot {self.board.slot} has {self.board.n_channel} channels.")
+            with self.session.lock:
+                self._param_cache[channel] = {param: None for param in self.device.get_ch_param_info(self.board.slot, channel)}
+
+        channel_props = self._param_cache[channel]
+        if parameter not in channel_props:
+            raise KeyError(f"Invalid CAEN HV channel parameter ({parameter}). Available choices: {list(channel_props.keys())}")
+        if channel_props[parameter] is None:
+            with self.session.lock:
+                channel_props[parameter] = self.device.get_ch_param_prop(self.board.slot, channel, parameter)
+        return channel_props[parameter]
+
+    # Convert a raw value read from the crate into SI units (e.g. uA -> A), according to the parameter's exponent
+    # Non-numeric parameters (e.g. Pw, Status) are returned unchanged
+    @staticmethod
+    def _raw_to_si(param_prop, raw):
+        if (param_prop.type is not caenhvwrapper.ParamType.NUMERIC) or not param_prop.exp:
+            return raw
+        value = float(raw) * (10.0 ** param_prop.exp)
+        if param_prop.decimal is not None:
+            value = round(value, param_prop.decimal - param_prop.exp)
+        return value
+
+    # Convert a value in SI units into the raw value expected by the crate; inverse of _raw_to_si
+    @staticmethod
+    def _si_to_raw(param_prop, value):
+        if (param_prop.type is not caenhvwrapper.ParamType.NUMERIC) or not param_prop.exp:
+            return value
+        raw = float(value) * (10.0 ** -param_prop.exp)
+        if param_prop.decimal is not None:
+            raw = round(raw, param_prop.decimal)
+        return raw
+
+    # Check a raw value against the cached parameter properties before sending it to the crate
+    def _validate_write(self, param_prop, parameter: str, raw) -> None:
+        if param_prop.mode is caenhvwrapper.ParamMode.RDONLY:
+            raise KeyError(f"CAEN HV channel parameter ({parameter}) is read-only.")
+        if param_prop.type is caenhvwrapper.ParamType.NUMERIC:
+            low = param_prop.minval
+            high = param_prop.maxval
+            if ((low is not None) and (raw < low)) or ((high is not None) and (raw > high)):
+                raise ValueError(f"Value for CAEN HV channel parameter ({parameter}) is out of range: {self._raw_to_si(param_prop, raw)} is not within [{self._raw_to_si(param_prop, low)}, {self._raw_to_si(param_prop, high)}].")
+        elif param_prop.type is caenhvwrapper.ParamType.ONOFF:
+            if raw not in (0, 1):
+                raise ValueError(f"Value for CAEN HV channel parameter ({parameter}) must be 0 or 1, not {raw}.")
+
+    # Read a channel parameter, converted to SI units
+    # Return type could be str, float, or int; convert as necessary
     def _get_channel_parameter(self, channel: int, parameter: str):
-        
-        if parameter not in self.device.get_ch_param_info(self.board.slot, channel):
-            raise KeyError(f"Invalid CAEN HV channel parameter ({parameter}). Available choices: {self.device.get_ch_param_info(self.board.slot, channel)}")
-        param_prop = self.device.get_ch_param_prop(self.board.slot, channel, parameter)
-        if param_prop.mode is not caenhvwrapper.ParamMode.WRONLY:
-            # Return type could be str, float, or int; convert as necessary
-            return self.device.get_ch_param(self.board.slot, [channel], parameter)[0]
-        else:
-            raise KeyError(f"CAEN HV channel parameter ({parameter}) is write-only.")
+        return self._get_channels_parameter([channel], parameter)[0]
 
+    # Write a channel parameter, given in SI units
     def _set_channel_parameter(self, channel: int, parameter: str, value) -> None:
+        self._set_channels_parameter([channel], parameter, value)
 
-        if parameter not in self.device.get_ch_param_info(self.board.slot, channel):
-            raise KeyError(f"Invalid CAEN HV channel parameter ({parameter}). Available choices: {self.device.get_ch_param_info(self.board.slot, channel)}")
-        param_prop = self.device.get_ch_param_prop(self.board.slot, channel, parameter)
-        if param_prop.mode is not caenhvwrapper.ParamMode.RDONLY:
-            self.device.set_ch_param(self.board.slot, [channel], parameter, value)
-            time.sleep(CAEN_WRITE_DELAY)
-        else:
-            raise KeyError(f"CAEN HV channel parameter ({parameter}) is read-only.")
+    # Read a channel parameter from several channels with a single get_ch_param call, converted to SI units
+    def _get_channels_parameter(self, channels: list[int], parameter: str) -> list:
+
+        if not channels:
+            return []
+        param_props = [self._get_param_prop(channel, parameter) for channel in channels]
+        for param_prop in param_props:
+            if param_prop.mode is caenhvwrapper.ParamMode.WRONLY:
+                raise KeyError(f"CAEN HV channel parameter ({parameter}) is write-only.")
+        # In event mode, serve subscribed parameters from the snapshot if every value is available and fresh
+        # Otherwise, poll the crate, and seed the snapshot with the result
+        raw_values = None
+        if self.subscribed and (parameter in CAEN_MONITOR_PARAMS) and self.session.is_fresh(self.config.max_age):
+            keys = [(self.board.slot, channel, parameter) for channel in channels]
+            if all(key in self.session.snapshot for key in keys):
+                raw_values = [self.session.snapshot[key] for key in keys]
+        if raw_values is None:
+            with self.session.lock:
+                raw_values = self.device.get_ch_param(self.board.slot, list(channels), parameter)
+            if self.subscribed and (parameter in CAEN_MONITOR_PARAMS):
+                for channel, raw in zip(channels, raw_values):
+                    self.session.snapshot[(self.board.slot, channel, parameter)] = raw
+        return [self._raw_to_si(param_prop, raw) for param_prop, raw in zip(param_props, raw_values)]
+
+    # Write a channel parameter, given in SI units, to several channels with as few set_ch_param calls as possible
+    # Channels are grouped by raw value, since channels with different exponents need different raw values
+    def _set_channels_parameter(self, channels: list[int], parameter: str, value) -> None:
+
+        if not channels:
+            return
+        raw_groups: dict[Any, list[int]] = {}
+        for channel in channels:
+            param_prop = self._get_param_prop(channel, parameter)
+            raw = self._si_to_raw(param_prop, value)
+            self._validate_write(param_prop, parameter, raw)
+            raw_groups.setdefault(raw, []).append(channel)
+
+        with self.session.lock:
+            for raw, group in raw_groups.items():
+                self.device.set_ch_param(self.board.slot, group, parameter, raw)
+
+            # Drop the written values from the event mode snapshot, so the next read polls the crate
+            # instead of returning the old value before the crate's change event arrives
+            if parameter in CAEN_MONITOR_PARAMS:
+                for channel in channels:
+                    self.session.snapshot.pop((self.board.slot, channel, parameter), None)
+        time.sleep(CAEN_WRITE_DELAY)
@@ -41,6 +41,11 @@ class DeviceConfig(ABC):
         else:
             self.display_name: str = "Device"   # Display name of the device
 
+    # Return the key of this config's physical endpoint in the capability cache
+    # (see CapabilityCache.py), or None if the device doesn't cache any capabilities
+    def get_capability_key(self) -> (str | None):
+        return None
+
 
 
 """
@@ -76,3 +81,8 @@ class Device(ABC):
     @abstractmethod
     def shutdown(self) -> None:
         pass
+
+    # Return (and clear) any faults the device has reported asynchronously, e.g. a tripped channel
+    # Checked by the controller before each event; most devices never report any
+    def get_faults(self) -> list[str]:
+        return []
@@ -109,3 +109,65 @@ class PowerSupply(Device):
     @abstractmethod
     def shutdown(self) -> None:
         pass
+
+
+
+    """
+    Multi-Channel Methods ==================================================
+    """
+
+    # These methods act on a list of channels at once. By default, they simply
+    # loop over the single-channel methods above; implementations that can
+    # address several channels in one command (e.g. CAENPowerSupply) should
+    # override them to save round trips.
+
+    # Set the voltage setting of the given channels
+    def set_voltages(self, channels: list[int], voltage: float) -> None:
+        for channel in channels:
+            self.set_voltage(channel, voltage)
+
+    # Set the current setting of the given channels
+    def set_currents(self, channels: list[int], current: float) -> None:
+        for channel in channels:
+            self.set_current(channel, current)
+
+    # Get the voltage settings of the given channels
+    def get_voltages(self, channels: list[int]) -> list[float]:
+        return [self.get_voltage(channel) for channel in channels]
+
+    # Get the current settings of the given channels
+    def get_currents(self, channels: list[int]) -> list[float]:
+        return [self.get_current(channel) for channel in channels]
+
+    # Measure the voltages at the given channels
+    def measure_voltages(self, channels: list[int]) -> list[float]:
+        return [self.measure_voltage(channel) for channel in channels]
+
+    # Measure the currents at the given channels
+    def measure_currents(self, channels: list[int]) -> list[float]:
+        return [self.measure_current(channel) for channel in channels]
+
+    # Measure the powers at the given channels
+    def measure_powers(self, channels: list[int]) -> list[float]:
+        return [self.measure_power(channel) for channel in channels]
+
+    # Disable the given channels
+    def disable_channels(self, channels: list[int]) -> None:
+        for channel in channels:
+            self.disable_channel(channel)
+
+    # Enable the given channels
+    def enable_channels(self, channels: list[int]) -> None:
+        for channel in channels:
+            self.enable_channel(channel)
+
+    # Return the enable/disable states of the given channels
+    def get_channel_states(self, channels: list[int]) -> list[bool]:
+        return [self.get_channel_state(channel) for channel in channels]
+
+
+    # Block until the given channels have reached their settings (e.g. finished
+    # ramping), or raise an error if the timeout (s) expires first; return the
+    # time waited (s). Supplies without any ramp/settling status return immediately.
+    def wait_for_channels(self, channels: list[int], timeout: float) -> float:
+        return 0.0
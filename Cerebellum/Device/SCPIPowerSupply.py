@@ -3,15 +3,21 @@ SCPIPowerSupply.py
 This file contains the SCPIPowerSupply class, which is an implementation of the
 PowerSupply interface for an SCPI-programmable power supply. This implementation
 supports control over a serial/USB or IP connection.
+
+Several logical SCPIPowerSupply devices can point at the same physical
+instrument (same IP address or COM port), e.g. one device per output with its
+own display name and shutdown position. Their commands are multiplexed over a
+single shared connection from the connection registry below.
 """
 
 # Prevents TypeError on type hints for Python 3.7 to 3.9
 from __future__ import annotations
 
 from Cerebellum.Device.PowerSupply import PowerSupply, PowerSupplyConfig
+from Cerebellum.CapabilityCache import get_capabilities, store_capabilities
 
 from typing import Any
-import serial, socketscpi, time, re, logging
+import serial, socketscpi, time, re, logging, threading
 
 SCPI_WRITE_DELAY = 0.1
 
@@ -42,108 +48,293 @@ class SCPIPowerSupplyConfig(PowerSupplyConfig):
             self.com            : str   = ""                        # COM port (e.g. /dev/ttyACM0, COM1)
             self.baudrate       : int   = 115200                    # COM baudrate
 
+    # Return the key of this config's physical endpoint in the capability cache
+    def get_capability_key(self) -> (str | None):
+        address = self.com if (self.protocol == "Serial") else self.ip
+        return f"SCPIPowerSupply:{self.protocol}:{address}" if address else None
 
 
-class SCPIPowerSupply(PowerSupply):
 
-    """
-    Interface Methods ======================================================
-    """
 
-    # Initialize connection, possibly log ID
+
+
+"""
+Connection Registry ============================================================
+"""
+
+# --- _SCPIConnection: A single physical transport (serial port or IP socket) to an SCPI instrument
+# Several logical SCPIPowerSupply devices (e.g. one device per output) can share
+# one connection. All commands are serialised through the connection lock, and
+# the channel last selected with INST:SEL is remembered per connection so that
+# repeated commands on the same channel skip the select.
+class _SCPIConnection:
+
     def __init__(self, config: SCPIPowerSupplyConfig):
 
-        self.config = config
+        self.protocol           : str           = config.protocol
+        self.address            : str           = config.com if (config.protocol == "Serial") else config.ip
+        self.baudrate           : int           = config.baudrate
+        self.lock                               = threading.RLock() # Reentrant, so devices can hold it across select + command
+        self.users              : int           = 0                 # Number of logical devices using this connection
+        self.shut_down          : set[int]      = set()             # id() of the logical devices that have been shut down
+        self.selected_channel   : (int | None)  = None              # Last channel selected with INST:SEL, None if unknown
+        self.ser = None
+        self.socket = None
 
-        if (self.config.protocol == "Serial"):
+        if (self.protocol == "Serial"):
             try:
                 self.ser = serial.Serial(
-                    port=self.config.com,
-                    baudrate=self.config.baudrate
+                    port=self.address,
+                    baudrate=self.baudrate
                 )
                 self.ser.reset_input_buffer()
                 self.ser.reset_output_buffer()
-                logging.info(f"Opened SCPIPowerSupply at serial port ({self.config.com}).")
+                logging.info(f"Opened SCPIPowerSupply at serial port ({self.address}).")
             except Exception as e:
-                raise RuntimeError(f"Failed to open SCPIPowerSupply at serial port ({self.config.com}): {e}")
-        elif (self.config.protocol == "IP"):
+                raise RuntimeError(f"Failed to open SCPIPowerSupply at serial port ({self.address}): {e}")
+        elif (self.protocol == "IP"):
             try:
-                self.socket = socketscpi.SocketInstrument(self.config.ip)
-                logging.info(f"Opened SCPIPowerSupply at IP address ({self.config.ip}).")
+                self.socket = socketscpi.SocketInstrument(self.address)
+                logging.info(f"Opened SCPIPowerSupply at IP address ({self.address}).")
             except Exception as e:
-                raise RuntimeError(f"Failed to open SCPIPowerSupply at IP address ({self.config.ip}): {e}")
+                raise RuntimeError(f"Failed to open SCPIPowerSupply at IP address ({self.address}): {e}")
+        else:
+            raise ValueError(f"Invalid protocol value: {self.protocol}")
+
+    # Close the underlying transport
+    def close(self) -> None:
+        with self.lock:
+            if self.ser and self.ser.is_open:
+                self.ser.close()
+                logging.info(f"Closed SCPIPowerSupply at serial port ({self.address}).")
+            if self.socket:
+                self.socket.close()
+                logging.info(f"Closed SCPIPowerSupply at IP address ({self.address}).")
+            self.ser = None
+            self.socket = None
+            self.selected_channel = None
+
+    # Select the given channel, skipping the command if it is already selected
+    def select_channel(self, channel: int) -> None:
+        with self.lock:
+            if self.selected_channel != channel:
+                self.write(f"INST:SEL {channel}\n")
+                self.selected_channel = channel
+
+    # Send an SCPI command without reading a response
+    def write(self, cmd: str) -> None:
+        with self.lock:
+            try:
+                if (self.protocol == "Serial"):
+                    if not self.ser or not self.ser.is_open:
+                        raise RuntimeError(f"Serial port {self.address} is not open.")
+                    self.ser.reset_input_buffer()
+                    self.ser.write(cmd.encode())
+                    self.ser.flush()
+                elif (self.protocol == "IP"):
+                    if not self.socket:
+                        raise RuntimeError(f"IP address {self.address} is not open.")
+                    self.socket.write(cmd)
+                else:
+                    raise ValueError(f"Invalid protocol value: {self.protocol}")
+            except Exception:
+                # The instrument may or may not have seen the command, so the selection is unknown
+                self.selected_channel = None
+                raise
+
+            time.sleep(SCPI_WRITE_DELAY)
+
+    # Send an SCPI command and return the decoded response
+    def query(self, cmd: str) -> str:
+        with self.lock:
+            try:
+                if (self.protocol == "Serial"):
+                    if not self.ser or not self.ser.is_open:
+                        raise RuntimeError(f"Serial port {self.address} is not open.")
+                    self.ser.reset_input_buffer()
+                    self.ser.write(cmd.encode())
+                    self.ser.flush()
+                    time.sleep(SCPI_WRITE_DELAY)
+                    response = self.ser.readline()
+                    try:
+                        return response.decode().strip() if response else ""
+                    except UnicodeDecodeError:
+                        logging.warning(f"Unreadable response: {response}")
+                        return ""
+                elif (self.protocol == "IP"):
+                    if not self.socket:
+                        raise RuntimeError(f"IP address {self.address} is not open.")
+                    return self.socket.query(cmd)
+                else:
+                    raise ValueError(f"Invalid protocol value: {self.protocol}")
+            except Exception:
+                self.selected_channel = None
+                raise
+
+
+
+# Registry of open connections, keyed by (protocol, address)
+_CONNECTIONS: dict[tuple[str, str], _SCPIConnection] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+# Return the registry key of the physical instrument described by `config`
+def _connection_key(config: SCPIPowerSupplyConfig) -> tuple[str, str]:
+    if (config.protocol == "Serial"):
+        return ("Serial", config.com)
+    elif (config.protocol == "IP"):
+        return ("IP", config.ip)
+    else:
+        raise ValueError(f"Invalid protocol value: {config.protocol}")
+
+# Get the shared connection for `config`, opening it if no other device is using it
+def _acquire_connection(config: SCPIPowerSupplyConfig) -> _SCPIConnection:
+    key = _connection_key(config)
+    with _CONNECTIONS_LOCK:
+        connection = _CONNECTIONS.get(key)
+        if connection is None:
+            connection = _SCPIConnection(config)
+            _CONNECTIONS[key] = connection
+        elif (connection.protocol == "Serial") and (connection.baudrate != config.baudrate):
+            raise ValueError(f"Serial port ({config.com}) is already open with baudrate {connection.baudrate}, not {config.baudrate}.")
         else:
-            raise ValueError(f"Invalid protocol value: {self.config.protocol}")
+            logging.info(f"Sharing existing SCPIPowerSupply connection at {key[0]} address ({key[1]}).")
+        connection.users += 1
+        return connection
+
+# Release a connection from `_acquire_connection`, closing it when the last device is done with it
+def _release_connection(connection: _SCPIConnection) -> None:
+    with _CONNECTIONS_LOCK:
+        connection.users -= 1
+        if connection.users <= 0:
+            key = (connection.protocol, connection.address)
+            if _CONNECTIONS.get(key) is connection:
+                del _CONNECTIONS[key]
+            connection.close()
+
+
+
+"""
+Device =========================================================================
+"""
+
+class SCPIPowerSupply(PowerSupply):
+
+    """
+    Interface Methods ======================================================
+    """
+
+    # Initialize connection, possibly log ID
+    def __init__(self, config: SCPIPowerSupplyConfig):
+
+        self.config = config
+
+        # Channels this logical device has selected, used to limit shutdown on a shared instrument
+        self.used_channels: set[int] = set()
+
+        # Open (or share) the connection to the physical instrument
+        self.connection = _acquire_connection(self.config)
 
     # Attempt to close any open connections when deallocated
     def __del__(self):
-        if ("ser" in vars(self)) and self.ser and self.ser.is_open:
-            self.ser.close()
-            logging.info(f"Closed SCPIPowerSupply at serial port ({self.config.com}).")
-        if ("socket" in vars(self)) and self.socket:
-            self.socket.close()
-            logging.info(f"Closed SCPIPowerSupply at IP address ({self.config.ip}).")
+        if ("connection" in vars(self)) and self.connection:
+            self.connection.shut_down.discard(id(self))
+            _release_connection(self.connection)
+            self.connection = None
     
     # Get any identification data
+    # *IDN? doubles as the identity check for the capability cache; if the same
+    # instrument is still at this address, the SCPI version is taken from the cache
+    # Otherwise it is probed, and the cache entry is replaced
     def get_id(self) -> str:
-        idn = self._query_scpi("*IDN?\n")
-        vers = self._query_scpi("SYST:VERS?\n")
+        key = self.config.get_capability_key()
+        with self.connection.lock:
+            idn = self._query_scpi("*IDN?\n")
+            cached = get_capabilities(key, idn) if key else None
+            if cached and ("version" in cached):
+                return f"IDN: {idn}, SCPI Version: {cached['version']}"
+            vers = self._query_scpi("SYST:VERS?\n")
+        if key:
+            address_field = "com" if (self.config.protocol == "Serial") else "ip"
+            store_capabilities(key, idn, {
+                "version": vers,
+                "field_hints": {address_field: f"Last seen at this address: {idn}"}
+            })
         return f"IDN: {idn}, SCPI Version: {vers}"
 
     # Set the voltage setting of the given channel
     def set_voltage(self, channel: int, voltage: float) -> None:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        self._write_scpi(f"VOLT {voltage}\n")
+        with self.connection.lock:
+            self._select_channel(channel)
+            self._write_scpi(f"VOLT {voltage}\n")
 
     # Set the current setting of the given channel
     def set_current(self, channel: int, current: float) -> None:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        self._write_scpi(f"CURR {current}\n")
+        with self.connection.lock:
+            self._select_channel(channel)
+            self._write_scpi(f"CURR {current}\n")
 
     # Get the voltage setting of the given channel
     def get_voltage(self, channel: int) -> float:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        return self._parse_float_scpi(self._query_scpi("VOLT?\n"))
+        with self.connection.lock:
+            self._select_channel(channel)
+            return self._parse_float_scpi(self._query_scpi("VOLT?\n"))
 
     # Get the current setting of the given channel
     def get_current(self, channel: int) -> float:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        return self._parse_float_scpi(self._query_scpi("CURR?\n"))
+        with self.connection.lock:
+            self._select_channel(channel)
+            return self._parse_float_scpi(self._query_scpi("CURR?\n"))
     
     # Measure the voltage at the given channel
     def measure_voltage(self, channel: int) -> float:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        return self._parse_float_scpi(self._query_scpi("MEAS:VOLT?\n"))
+        with self.connection.lock:
+            self._select_channel(channel)
+            return self._parse_float_scpi(self._query_scpi("MEAS:VOLT?\n"))
     
     # Measure the current at the given channel
     def measure_current(self, channel: int) -> float:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        return self._parse_float_scpi(self._query_scpi("MEAS:CURR?\n"))
+        with self.connection.lock:
+            self._select_channel(channel)
+            return self._parse_float_scpi(self._query_scpi("MEAS:CURR?\n"))
     
     # Measure the power at the given channel
     def measure_power(self, channel: int) -> float:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        return self._parse_float_scpi(self._query_scpi("MEAS:POW?\n"))
+        with self.connection.lock:
+            self._select_channel(channel)
+            return self._parse_float_scpi(self._query_scpi("MEAS:POW?\n"))
     
     # Disable the given channel
     def disable_channel(self, channel: int) -> None:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        self._write_scpi(f"OUTP:STAT 0\n")
+        with self.connection.lock:
+            self._select_channel(channel)
+            self._write_scpi(f"OUTP:STAT 0\n")
     
     # Enable the given channel
     def enable_channel(self, channel: int) -> None:
-        self._write_scpi(f"INST:SEL {channel}\n")
-        self._write_scpi(f"OUTP:STAT 1\n")
+        with self.connection.lock:
+            self._select_channel(channel)
+            self._write_scpi(f"OUTP:STAT 1\n")
 
     # Return the enable/disable state of the given channel
     def get_channel_state(self, channel: int) -> bool:
         # Will return "0" or "1" as a _string_, so str -> int -> bool
-        self._write_scpi(f"INST:SEL {channel}\n")
-        return bool(int(self._query_scpi(f"OUTP:STAT?\n")))
+        with self.connection.lock:
+            self._select_channel(channel)
+            return bool(int(self._query_scpi(f"OUTP:STAT?\n")))
     
     # Shutdown (i.e. disable, not disconnect) the device
+    # If the instrument is shared with other logical devices, first disable the channels
+    # used by this device, so that the environment's shutdown order is respected; the last
+    # device on the instrument to shut down then disables every output, including any this
+    # program never touched (e.g. left on by a previous run)
     def shutdown(self) -> None:
-        self._write_scpi(f"OUTP:ALL 0\n")
+        with self.connection.lock:
+            self.connection.shut_down.add(id(self))
+            if len(self.connection.shut_down) < self.connection.users:
+                for channel in sorted(self.used_channels):
+                    self.disable_channel(channel)
+            else:
+                self._write_scpi(f"OUTP:ALL 0\n")
         time.sleep(5)
 
 
@@ -152,47 +343,23 @@ class SCPIPowerSupply(PowerSupply):
     Helper Methods =========================================================
     """
 
+    # Select a channel on the shared connection and remember it as used by this device
+    def _select_channel(self, channel: int) -> None:
+        self.used_channels.add(channel)
+        self.connection.select_channel(channel)
+
     # Send an SCPI command without reading a response
     def _write_scpi(self, cmd: str) -> None:
-
-        if (self.config.protocol == "Serial"):
-            if not self.ser or not self.ser.is_open:
-                raise RuntimeError(f"Serial port {self.config.com} is not open.")
-            self.ser.reset_input_buffer()
-            self.ser.write(cmd.encode())
-            self.ser.flush()
-        elif (self.config.protocol == "IP"):
-            if not self.socket:
-                raise RuntimeError(f"IP address {self.config.ip} is not open.")
-            self.socket.write(cmd)
-        else:
-            raise ValueError(f"Invalid protocol value: {self.config.protocol}")
-
-        time.sleep(SCPI_WRITE_DELAY)
+        if not self.connection:
+            raise RuntimeError(f"SCPIPowerSupply ({self.config.display_name}) has no open connection.")
+        self.connection.write(cmd)
 
     # Send an SCPI command and return the decoded response
     # Pass to _parse_float_scpi to extract float
     def _query_scpi(self, cmd: str) -> str:
-
-        if (self.config.protocol == "Serial"):
-            if not self.ser or not self.ser.is_open:
-                raise RuntimeError(f"Serial port {self.config.com} is not open.")
-            self.ser.reset_input_buffer()
-            self.ser.write(cmd.encode())
-            self.ser.flush()
-            time.sleep(SCPI_WRITE_DELAY)
-            response = self.ser.readline()
-            try:
-                return response.decode().strip() if response else ""
-            except UnicodeDecodeError:
-                logging.warning(f"Unreadable response: {response}")
-                return ""
-        elif (self.config.protocol == "IP"):
-            if not self.socket:
-                raise RuntimeError(f"IP address {self.config.ip} is not open.")
-            return self.socket.query(cmd)
-        else:
-            raise ValueError(f"Invalid protocol value: {self.config.protocol}")
+        if not self.connection:
+            raise RuntimeError(f"SCPIPowerSupply ({self.config.display_name}) has no open connection.")
+        return self.connection.query(cmd)
 
     # Extract a float (e.g. voltage) from a decoded SCPI response
     @staticmethod
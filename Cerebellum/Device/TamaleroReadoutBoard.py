@@ -2,18 +2,49 @@
 TamaleroReadoutBoard.py
 This file contains the TamaleroReadoutBoard class, which represents an ETL
 Readout Board controlled by the Tamalero libary.
+
+Several readout boards (different rb_index) can sit behind one KCU. Their devices
+share a single KCU connection from the session cache below, so the KCU is only
+set up and loopback-tested once.
 """
 
 # Prevents TypeError on type hints for Python 3.7 to 3.9
 from __future__ import annotations
 
 from Cerebellum.Device.Device import Device, DeviceConfig
+from Cerebellum.InputProcessing import abort_event
 
-import logging, time, random
+import logging, time, random, os, threading
+from datetime import datetime
 from typing import Any
+import numpy as np
 from tamalero.ReadoutBoard import ReadoutBoard
 from tamalero.utils import get_kcu
 
+# Deadline (s) and polling intervals (s) for waiting on RB/KCU status registers
+RB_READY_TIMEOUT = 2.0
+RB_POLL_MIN = 0.001
+RB_POLL_MAX = 0.05
+
+# Default pattern checker integration window (s)
+RB_PATTERN_CHECKER_WINDOW = 1.0
+
+# DAQ capture: largest single block read from the readout FIFO (words), how long (s) to
+# idle when the FIFO is empty, and the number of entries in the segment index
+RB_DAQ_MAX_BLOCK = 32768
+RB_DAQ_IDLE_WAIT = 0.001
+RB_DAQ_INDEX_CAPACITY = 1 << 20
+
+# Dtype of the segment index written next to a DAQ capture: one entry per block read
+# position = total words captured before this block (its ring offset is position % buffer size)
+RB_DAQ_INDEX_DTYPE = np.dtype([('position', np.uint64), ('words', np.uint32), ('time', np.float64)])
+
+# lpGBT eye opening monitor (EOM): the scan covers this many voltage and phase steps,
+# and counts over 2^(5 + 2 * RB_EOM_END_OF_COUNT_SEL) 40 MHz cycles per cell
+RB_EOM_VOLTAGE_STEPS = 31
+RB_EOM_PHASE_STEPS = 64
+RB_EOM_END_OF_COUNT_SEL = 7
+
 
 
 class TamaleroReadoutBoardConfig(DeviceConfig):
@@ -48,47 +79,149 @@ class TamaleroReadoutBoardConfig(DeviceConfig):
 
 
 
-class TamaleroReadoutBoard(Device):
+"""
+KCU Sessions ===================================================================
+"""
+
+# --- _KCUSession: A single connection to a KCU, shared by every readout board device behind it
+# The loopback test is only run once, when the connection is opened. Boards
+# sharing a session share one link, so their commands should not overlap;
+# hold the session lock for any operation that must not be interleaved.
+class _KCUSession:
 
-    """
-    Interface Methods ======================================================
-    """
-    
-    # Initialize connection, possibly log ID
     def __init__(self, config: TamaleroReadoutBoardConfig):
 
-        self.config = config
+        self.kcu_address    : str   = config.kcu_address
+        self.lock                   = threading.RLock()
+        self.users          : int   = 0     # Number of readout board devices using this session
 
         # Try to connect to KCU (FPGA board that communicates w/ RB)
-        self.kcu = get_kcu(self.config.kcu_address, control_hub=True, host=self.config.host, verbose=False)
+        self.kcu = get_kcu(config.kcu_address, control_hub=True, host=config.host, verbose=False)
         if self.kcu == 0:
-            raise RuntimeError(f"Failed to establish basic connection to KCU at {self.config.kcu_address}.")
+            raise RuntimeError(f"Failed to establish basic connection to KCU at {config.kcu_address}.")
 
         # Test KCU connection with loopback test
         data = 0xabcd1234
         self.kcu.write_node("LOOPBACK.LOOPBACK", data)
         if data != self.kcu.read_node("LOOPBACK.LOOPBACK"):
-            raise RuntimeError(f"KCU loopback communication failed at {self.config.kcu_address}.")
+            raise RuntimeError(f"KCU loopback communication failed at {config.kcu_address}.")
+
+
+
+# Cache of open KCU sessions, keyed by (kcu_address, host)
+_KCU_SESSIONS: dict[tuple[str, str], _KCUSession] = {}
+_KCU_SESSIONS_LOCK = threading.Lock()
+
+# Get the shared KCU session for `config`, connecting if no other board is using it
+def _acquire_kcu_session(config: TamaleroReadoutBoardConfig) -> _KCUSession:
+    key = (config.kcu_address, config.host)
+    with _KCU_SESSIONS_LOCK:
+        session = _KCU_SESSIONS.get(key)
+        if session is None:
+            session = _KCUSession(config)
+            _KCU_SESSIONS[key] = session
+        else:
+            logging.info(f"Sharing existing KCU connection at {config.kcu_address}.")
+        session.users += 1
+        return session
+
+# Release a session from `_acquire_kcu_session`, dropping it when the last board is done with it
+def _release_kcu_session(session: _KCUSession) -> None:
+    with _KCU_SESSIONS_LOCK:
+        session.users -= 1
+        if session.users <= 0:
+            for key, cached in list(_KCU_SESSIONS.items()):
+                if cached is session:
+                    del _KCU_SESSIONS[key]
+
+
+
+"""
+Helper Functions ===============================================================
+"""
+
+# Find the longest run of True values in each row of a 2D bool array, without looping over cells
+# Return (run lengths, run start columns), one entry per row
+def _longest_runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    n_rows, n_cols = mask.shape
+    lengths = np.zeros(n_rows, dtype=np.int64)
+    starts = np.zeros(n_rows, dtype=np.int64)
+    if n_cols == 0:
+        return lengths, starts
+
+    # Pad each row with False on both sides so every run has a rising and a falling edge in the same row
+    padded = np.zeros((n_rows, n_cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rise_rows, rise_cols = np.nonzero(edges == 1)
+    _, fall_cols = np.nonzero(edges == -1)
+    if not rise_rows.size:
+        return lengths, starts
+
+    # Edges come out in row-major order, so rises and falls pair up; keep the longest run per row
+    run_lengths = fall_cols - rise_cols
+    order = np.lexsort((-run_lengths, rise_rows))
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = rise_rows[order][1:] != rise_rows[order][:-1]
+    best = order[first]
+    lengths[rise_rows[best]] = run_lengths[best]
+    starts[rise_rows[best]] = rise_cols[best]
+    return lengths, starts
+
+
+
+# View a uHAL block read as a uint32 array
+# Use the buffer protocol when the binding offers it, so no Python object is created per word
+def _block_to_array(block) -> np.ndarray:
+    try:
+        return np.frombuffer(block, dtype=np.uint32)
+    except TypeError:
+        return np.fromiter(block, dtype=np.uint32, count=len(block))
+
+
+
+class TamaleroReadoutBoard(Device):
+
+    """
+    Interface Methods ======================================================
+    """
+    
+    # Initialize connection, possibly log ID
+    def __init__(self, config: TamaleroReadoutBoardConfig):
+
+        self.config = config
+
+        # Connect to the KCU (or share an existing connection to it)
+        self.kcu_session = _acquire_kcu_session(self.config)
+        self.kcu = self.kcu_session.kcu
 
         data_mode = self.config.etroc in ['ETROC1', 'ETROC2']
         
         # Init ReadoutBoard object (from tamalero)
-        self.rb = ReadoutBoard(
-            self.config.rb_index,
-            trigger=True,
-            kcu=self.kcu,
-            flavor=self.config.flavor,
-            config=self.config.configuration,
-            data_mode=data_mode,
-            etroc=self.config.etroc,
-            verbose=False
-        )
+        try:
+            with self.kcu_session.lock:
+                self.rb = ReadoutBoard(
+                    self.config.rb_index,
+                    trigger=True,
+                    kcu=self.kcu,
+                    flavor=self.config.flavor,
+                    config=self.config.configuration,
+                    data_mode=data_mode,
+                    etroc=self.config.etroc,
+                    verbose=False
+                )
+        except Exception:
+            _release_kcu_session(self.kcu_session)
+            self.kcu_session = None
+            raise
 
         logging.info(self.get_id())
 
     # Attempt to close any open connections when deallocated
     def __del__(self):
-        pass
+        if ("kcu_session" in vars(self)) and self.kcu_session:
+            _release_kcu_session(self.kcu_session)
+            self.kcu_session = None
     
     # Get any identification data
     def get_id(self) -> str:
@@ -155,17 +288,82 @@ class TamaleroReadoutBoard(Device):
         return results
 
     # Run built-in eyescan test on LPGBT ADCs
-    def run_eyescan(self) -> None:
-        self.rb.DAQ_LPGBT.eyescan()
+    # Return the eye diagram as a 2D array of error counts (rows: voltage steps, columns: phase steps)
+    # Only some tamalero versions return the eye image from eyescan() (others just print it), so if it
+    # doesn't return one, the scan is read out from the lpGBT eye opening monitor registers instead
+    def run_eyescan(self) -> np.ndarray:
+        result = self.rb.DAQ_LPGBT.eyescan()
+        if result is not None:
+            eye = np.asarray(result)
+            if eye.ndim == 2:
+                return eye
+            logging.warning(f"LPGBT eyescan returned data of unexpected shape {eye.shape}, reading the eye opening monitor instead.")
+        return self._scan_eye_registers()
+
+    # Scan the eye with the lpGBT eye opening monitor, one cell at a time
+    # Each cell is started with EOMSTART and read out once EOMEND is set
+    def _scan_eye_registers(self) -> np.ndarray:
+        lpgbt = self.rb.DAQ_LPGBT
+        eye = np.zeros((RB_EOM_VOLTAGE_STEPS, RB_EOM_PHASE_STEPS), dtype=np.uint32)
+        lpgbt.wr_reg("LPGBT.RW.EOM.EOMENDOFCOUNTSEL", RB_EOM_END_OF_COUNT_SEL)
+        lpgbt.wr_reg("LPGBT.RW.EOM.EOMENABLE", 1)
+        try:
+            for voltage in range(RB_EOM_VOLTAGE_STEPS):
+                lpgbt.wr_reg("LPGBT.RW.EOM.EOMVOFSEL", voltage)
+                for phase in range(RB_EOM_PHASE_STEPS):
+                    lpgbt.wr_reg("LPGBT.RW.EOM.EOMPHASESEL", phase)
+                    lpgbt.wr_reg("LPGBT.RW.EOM.EOMSTART", 1)
+                    self._poll_until(lambda: bool(lpgbt.rd_reg("LPGBT.RO.EOM.EOMEND")), RB_READY_TIMEOUT, "the lpGBT eye opening monitor")
+                    eye[voltage, phase] = (lpgbt.rd_reg("LPGBT.RO.EOM.EOMCOUNTERVALUEH") << 8) | lpgbt.rd_reg("LPGBT.RO.EOM.EOMCOUNTERVALUEL")
+                    lpgbt.wr_reg("LPGBT.RW.EOM.EOMSTART", 0)
+        finally:
+            lpgbt.wr_reg("LPGBT.RW.EOM.EOMSTART", 0)
+            lpgbt.wr_reg("LPGBT.RW.EOM.EOMENABLE", 0)
+        return eye
+
+    # Save an eye diagram as a compressed .npz file in `output_dir`, keyed by board ID and timestamp; return the file path
+    def save_eyescan(self, eye: np.ndarray, output_dir: str) -> str:
+        board_id = self.board_label()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(output_dir, exist_ok=True)
+        filepath = os.path.join(output_dir, f"eyescan_{board_id}_{timestamp}.npz")
+        np.savez_compressed(filepath, eye=eye, board_id=board_id, timestamp=timestamp, rb_index=self.config.rb_index)
+        return filepath
+
+    # Measure the eye opening of an eye diagram: the largest run of "open" cells along
+    # the phase axis (width) and the voltage axis (height), in steps
+    # A cell is open if its error count is <= `threshold` times the largest count in the diagram
+    # The height is measured through the middle of the widest row, so both are taken through the same eye
+    @staticmethod
+    def eye_opening(eye: np.ndarray, threshold: float) -> tuple[int, int]:
+        eye = np.asarray(eye, dtype=np.float64)
+        peak = eye.max() if eye.size else 0.0
+        open_cells = (eye <= threshold * peak) if peak > 0 else np.ones(eye.shape, dtype=bool)
+
+        row_runs, row_starts = _longest_runs(open_cells)
+        if not row_runs.size or row_runs.max() == 0:
+            return (0, 0)
+        centre_row = int(np.argmax(row_runs))
+        width = int(row_runs[centre_row])
+        centre_col = int(row_starts[centre_row] + width // 2)
+
+        col_runs, _ = _longest_runs(open_cells[:, centre_col][np.newaxis, :])
+        height = int(col_runs[0])
+        return (width, height)
 
     # Reset and read LPGBT pattern checkers
-    def read_pattern_checkers(self, data_src: str = 'prbs') -> dict[str, Any]:
+    # After switching the data source, wait only as long as the links actually take to report ready,
+    # then let the checkers run for `integration_time` seconds and read the error counters once
+    # A STOP message or a device fault cuts the window short; the actual window is returned
+    def read_pattern_checkers(self, data_src: str = 'prbs', integration_time: float = RB_PATTERN_CHECKER_WINDOW) -> dict[str, Any]:
         self.rb.DAQ_LPGBT.set_uplink_group_data_source("normal")
         self.rb.DAQ_LPGBT.set_downlink_data_src(data_src)
-        time.sleep(0.1)
+        self._poll_until(self._links_ready, RB_READY_TIMEOUT, "the DAQ LPGBT links to be ready")
         self.rb.DAQ_LPGBT.reset_pattern_checkers()
-        time.sleep(0.1)
-        return self.rb.DAQ_LPGBT.read_pattern_checkers()
+        start = time.monotonic()
+        abort_event.wait(integration_time)
+        counters = self.rb.DAQ_LPGBT.read_pattern_checkers()
+        return {'integration_time': time.monotonic() - start, 'counters': counters}
 
     # Test I2C port of SCA chip
     def test_sca_i2c(self, test_channel: int) -> dict[str, Any]:
@@ -186,3 +384,135 @@ class TamaleroReadoutBoard(Device):
             results['multi_byte'] = True
             
         return results
+
+
+
+    # Label for output files: the board ID if it can be read, the RB index otherwise
+    def board_label(self) -> str:
+        try:
+            return str(self.rb.DAQ_LPGBT.get_board_id())
+        except Exception:
+            return f"rb{self.config.rb_index}"
+
+    # Capture ETROC data from the KCU readout FIFO into a preallocated memory-mapped file
+    # A dedicated thread drains the FIFO in large block reads for `duration` seconds, copying each block
+    # straight from the read buffer into the file. With `ring`, the file is a ring buffer that keeps the
+    # latest data; otherwise, capture stops filling once the file is full. Every block is recorded in a
+    # segment index (<filepath>.index.npy). Return throughput and drop counters.
+    # A STOP message or a device fault ends the capture early; the data captured so far is kept.
+    def capture_data(self, filepath: str, duration: float, buffer_words: int, ring: bool = True) -> dict[str, Any]:
+
+        if buffer_words <= 0:
+            raise ValueError(f"DAQ capture buffer size must be positive, not {buffer_words}.")
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = np.memmap(filepath, dtype=np.uint32, mode='w+', shape=(buffer_words,))
+        index = np.lib.format.open_memmap(f"{filepath}.index.npy", mode='w+', dtype=RB_DAQ_INDEX_DTYPE, shape=(RB_DAQ_INDEX_CAPACITY,))
+        prefix = f"READOUT_BOARD_{self.config.rb_index}"
+        fifo = self.kcu.hw.getNode(f"DAQ_RB{self.config.rb_index}")
+
+        # Shared between the capture thread and this thread; only the capture thread writes to it
+        stats: dict[str, Any] = {'words': 0, 'segments': 0, 'ring_dropped_words': 0, 'file_dropped_words': 0, 'error': None}
+        stop = threading.Event()
+
+        def drain() -> None:
+            position = 0
+            try:
+                while not stop.is_set():
+                    with self.kcu_session.lock:
+                        occupancy = self._read_node(f"{prefix}.RX_FIFO_OCCUPANCY")
+                        if occupancy == 0:
+                            block = None
+                        else:
+                            block = fifo.readBlock(min(occupancy, RB_DAQ_MAX_BLOCK))
+                            self.kcu.hw.dispatch()
+                    if block is None:
+                        stop.wait(RB_DAQ_IDLE_WAIT)
+                        continue
+
+                    words = _block_to_array(block)
+                    n = words.size
+
+                    # Copy into the file, wrapping around in ring mode or truncating when full
+                    if ring:
+                        if n > buffer_words:
+                            stats['ring_dropped_words'] += n - buffer_words
+                            words = words[-buffer_words:]
+                        offset = position % buffer_words
+                        first = min(words.size, buffer_words - offset)
+                        data[offset:offset + first] = words[:first]
+                        data[:words.size - first] = words[first:]
+                        stats['ring_dropped_words'] += max(0, position + words.size - buffer_words) - max(0, position - buffer_words)
+                    else:
+                        space = buffer_words - position
+                        if n > space:
+                            stats['file_dropped_words'] += n - max(space, 0)
+                            words = words[:max(space, 0)]
+                        data[position:position + words.size] = words
+
+                    if stats['segments'] < RB_DAQ_INDEX_CAPACITY:
+                        index[stats['segments']] = (position, words.size, time.time())
+                    stats['segments'] += 1
+                    position += words.size
+                    stats['words'] += n
+            except Exception as e:
+                stats['error'] = e
+
+        lost_before = self._read_node(f"{prefix}.RX_FIFO_LOST_WORD_CNT")
+        thread = threading.Thread(target=drain, daemon=True)
+        start = time.monotonic()
+        thread.start()
+        abort_event.wait(duration)
+        stop.set()
+        thread.join()
+        elapsed = time.monotonic() - start
+        lost_after = self._read_node(f"{prefix}.RX_FIFO_LOST_WORD_CNT")
+
+        data.flush()
+        index.flush()
+        del data, index
+        if stats['error'] is not None:
+            raise RuntimeError(f"DAQ capture failed: {stats['error']}")
+
+        return {
+            'file': filepath,
+            'duration': elapsed,
+            'words': stats['words'],
+            'segments': stats['segments'],
+            'throughput_mbps': (stats['words'] * 4 / 1e6) / elapsed if elapsed > 0 else 0.0,
+            'fifo_lost_words': lost_after - lost_before,
+            'ring_dropped_words': stats['ring_dropped_words'],
+            'file_dropped_words': stats['file_dropped_words'],
+            'index_dropped_segments': max(0, stats['segments'] - RB_DAQ_INDEX_CAPACITY),
+        }
+
+
+
+    """
+    Register Helpers =======================================================
+    """
+
+    # Read a KCU node as an int
+    def _read_node(self, node: str) -> int:
+        value = self.kcu.read_node(node)
+        return int(value.value()) if hasattr(value, 'value') else int(value)
+
+    # Check if the DAQ LPGBT uplink and downlink report ready
+    def _links_ready(self) -> bool:
+        prefix = f"READOUT_BOARD_{self.config.rb_index}.LPGBT.DAQ"
+        return bool(self._read_node(f"{prefix}.UPLINK.READY")) and bool(self._read_node(f"{prefix}.DOWNLINK.READY"))
+
+    # Poll `condition` until it returns True, backing off from RB_POLL_MIN to RB_POLL_MAX
+    # Raise a TimeoutError if it doesn't become True within `timeout` seconds; return the time waited
+    def _poll_until(self, condition, timeout: float, description: str) -> float:
+        start = time.monotonic()
+        interval = RB_POLL_MIN
+        while not condition():
+            elapsed = time.monotonic() - start
+            if elapsed >= timeout:
+                raise TimeoutError(f"Timed out after {timeout} s waiting for {description}.")
+            time.sleep(min(interval, timeout - elapsed))
+            interval = min(interval * 2, RB_POLL_MAX)
+        return time.monotonic() - start
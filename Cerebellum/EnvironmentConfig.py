@@ -8,9 +8,11 @@ structure of a test environment.
 from __future__ import annotations
 
 from Cerebellum.Common import DEVICE_CONFIGS
+from Cerebellum.Codec import encode_object, encode_object_wire, object_class_name, decode_encoded, dumps_data, write_file, WireTable, WIRE_FIELDS_KEY
 from Cerebellum.Device.Device import DeviceConfig
 
-from json import dump, load
+from json import load, loads
+from typing import Any, Callable
 import logging
 
 
@@ -28,63 +30,114 @@ class EnvironmentConfig:
         self.device_config_list : list[DeviceConfig]    = []        # List of DeviceConfig objects to be constructed into device_list
         self.python_path        : str                   = "python3" # Python path or alias for running the test subprocess
         self.shutdown_order     : list[int]             = []        # List of Device indices specifying the shutdown order upon test termination
+        self.log_file           : str                   = ""        # If set, the test log is also written to this file (rotated and gzipped when large)
 
     """
-    Writes the current EnvironmentConfig to the given `filepath` as a JSON file.
+    Returns the current EnvironmentConfig as JSON-ready data, without modifying
+    any device config. With `wire`, uses the compact wire encoding (see Codec.py).
+    If given, `progress(done, total)` is called after each device config is
+    converted; it may raise to abort.
     """
-    def write_json(self, filepath: str) -> None:
-
-        # Convert all objects to dicts, add identifiers to each
-        json_dict = vars(self).copy()
-        json_dict["device_config_list"] = []
-        for config in self.device_config_list:
-            config_dict = vars(config)
-            config_dict["class_name"] = config.__class__.__name__
-            json_dict["device_config_list"].append(config_dict)
+    def to_dict(self, wire: bool = False, progress: (Callable[[int, int], None] | None) = None) -> dict[str, Any]:
+        config_list: list[Any] = []
+        field_table: dict[str, list[str]] = {}
+        total = len(self.device_config_list)
+        for done, config in enumerate(self.device_config_list, 1):
+            config_list.append(encode_object_wire(config, field_table) if wire else encode_object(config))
+            if progress:
+                progress(done, total)
+        json_dict: dict[str, Any] = {
+            "device_config_list": config_list,
+            "python_path": self.python_path,
+            "shutdown_order": list(self.shutdown_order),
+            "log_file": self.log_file,
+        }
+        if wire:
+            json_dict[WIRE_FIELDS_KEY] = field_table
 
         # Add identifier for the JSON itself
         json_dict["class_name"] = self.__class__.__name__
-        
-        # Open file and write JSON
-        with open(filepath, 'w') as f:
-            dump(json_dict, f, indent=4)
+        return json_dict
 
     """
-    Reads the given `filepath` for a JSON representation of an EnvironmentConfig;
-    populates the fields of the current EnvironmentConfig with the extracted values.
+    Populates the fields of the current EnvironmentConfig from data returned by
+    to_dict() (in either encoding). Device configs that fail to construct or
+    validate are skipped with a warning. If given, `progress(done, total)` is
+    called after each device config is constructed; it may raise to abort.
     """
-    def read_json(self, filepath: str) -> None:
-        
-        # Open file and read JSON
-        with open(filepath, 'r') as f:
-            json_dict = load(f)
+    def from_dict(self, json_dict: dict[str, Any], progress: (Callable[[int, int], None] | None) = None) -> None:
 
         # Check for identifier
-        json_class_name = json_dict.pop("class_name")
+        json_class_name = json_dict.get("class_name")
         if (json_class_name != self.__class__.__name__):
             raise ValueError(f"Invalid {self.__class__.__name__} JSON file: class_name field is {json_class_name}, not {self.__class__.__name__}.")
-        
-        # Assign fields to JSON data
-        self.python_path = json_dict["python_path"]
-        self.shutdown_order = json_dict["shutdown_order"]
 
-        # Convert object dicts to objects
+        # Assign fields to JSON data, checking their types
+        python_path = json_dict["python_path"]
+        shutdown_order = json_dict["shutdown_order"]
+        log_file = json_dict.get("log_file", "") # Not present in files written before this field was added
+        if not isinstance(python_path, str):
+            raise ValueError(f"python_path must be a string, not {python_path!r}.")
+        if not (isinstance(shutdown_order, list) and all((isinstance(idx, int) and not isinstance(idx, bool)) for idx in shutdown_order)):
+            raise ValueError(f"shutdown_order must be a list of device indices, not {shutdown_order!r}.")
+        if not isinstance(log_file, str):
+            raise ValueError(f"log_file must be a string, not {log_file!r}.")
+        self.python_path = python_path
+        self.shutdown_order = shutdown_order
+        self.log_file = log_file
+
+        # Convert encoded configs to objects
+        wire_table = WireTable(json_dict[WIRE_FIELDS_KEY]) if (WIRE_FIELDS_KEY in json_dict) else None
         self.device_config_list.clear()
-        for config in json_dict["device_config_list"]:
-            
-            # Look for config class_name field to inform what sort of Config to construct
-            # Also remove class_name from the dict so it doesn't end up in the instance
-            config_class_name = str(config.pop("class_name"))
-            device_class_name = config_class_name.replace("Config", "")
-            
-            # Use the corresponding constructor from DEVICE_CONFIGS
-            if (device_class_name in DEVICE_CONFIGS):
-                constructor = DEVICE_CONFIGS[device_class_name]
-                try:
-                    self.device_config_list.append(constructor(vars_dict=config))
-                except Exception as e:
-                    logging.warning(f"DeviceConfig constructor {config_class_name}() failed: {e}")
-                    logging.warning("Skipping config...")
-            else:
-                logging.warning(f"DeviceConfig constructor {config_class_name}() not in DEVICE_CONFIGS constructor list. Either the {device_class_name} module isn't installed, or the constructor previously failed to verify.")
+        total = len(json_dict["device_config_list"])
+        for done, config in enumerate(json_dict["device_config_list"], 1):
+            self._add_config(config, wire_table)
+            if progress:
+                progress(done, total)
+
+    # Construct one encoded device config and append it to device_config_list, or warn and skip it
+    def _add_config(self, config: Any, wire_table: (WireTable | None)) -> None:
+        try:
+            config_class_name = object_class_name(config)
+        except Exception as e:
+            logging.warning(f"Malformed device config: {e}")
+            logging.warning("Skipping config...")
+            return
+        device_class_name = config_class_name.replace("Config", "")
+
+        # Use the corresponding constructor from DEVICE_CONFIGS
+        if (device_class_name in DEVICE_CONFIGS):
+            try:
+                self.device_config_list.append(decode_encoded(DEVICE_CONFIGS[device_class_name], config, wire_table))
+            except Exception as e:
+                logging.warning(f"DeviceConfig constructor {config_class_name}() failed: {e}")
                 logging.warning("Skipping config...")
+        else:
+            logging.warning(f"DeviceConfig constructor {config_class_name}() not in DEVICE_CONFIGS constructor list. Either the {device_class_name} module isn't installed, or the constructor previously failed to verify.")
+            logging.warning("Skipping config...")
+
+    """
+    Writes the current EnvironmentConfig to the given `filepath` as a JSON file.
+    If given, `progress(done, total)` is called after each device config is converted; it may
+    raise to abort, in which case `filepath` is left untouched.
+    """
+    def write_json(self, filepath: str, progress: (Callable[[int, int], None] | None) = None) -> None:
+        write_file(filepath, self.to_dict(progress=progress))
+
+    """
+    Reads the given `filepath` for a JSON representation of an EnvironmentConfig;
+    populates the fields of the current EnvironmentConfig with the extracted values.
+    If given, `progress(done, total)` is called after each device config is constructed; it
+    may raise to abort the read.
+    """
+    def read_json(self, filepath: str, progress: (Callable[[int, int], None] | None) = None) -> None:
+        with open(filepath, 'r') as f:
+            self.from_dict(load(f), progress)
+
+    # Return the current EnvironmentConfig as a single line of wire-encoded JSON
+    def to_wire(self) -> str:
+        return dumps_data(self.to_dict(wire=True), wire=True)
+
+    # Populate the current EnvironmentConfig from the output of to_wire()
+    def from_wire(self, text: str) -> None:
+        self.from_dict(loads(text))
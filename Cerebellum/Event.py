@@ -14,10 +14,16 @@ from __future__ import annotations
 
 from Cerebellum.Device.Device import Device, DeviceConfig
 from Cerebellum.Device.PowerSupply import PowerSupply, PowerSupplyConfig
+from Cerebellum.LogSystem import log_context
+from Cerebellum.Protocol import emit_measurement, emit_sample
+from Cerebellum.InputProcessing import abort_event
 
 from abc import ABC, abstractmethod
 from typing import Any
-import logging, time, subprocess
+import logging, os, time, subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 
 TAMALERO_AVAIL = True
 try:
@@ -36,6 +42,7 @@ class Event(ABC):
     # *_title = String to show as field title in GUI (e.g. COM Port: _____)
     # Any field without a corresponding field_title will default to the field name
     comment_title: str = "Comment"
+    bindings_title: str = "Parameter Bindings"
     
     # *_options = Options for field to provide in a dropdown menu
     # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
@@ -47,6 +54,7 @@ class Event(ABC):
             vars(self).update(vars_dict) # Install input into __dict__
         else:
             self.comment: str = ""      # User-defined comment
+            self.bindings: str = ""     # Fields set from test parameters at run time, as "field=parameter, ..." (see TestConfig.py)
 
     # Execute the event
     @abstractmethod
@@ -84,6 +92,16 @@ class DeviceEvent(Event):
     def verify(self, config: DeviceConfig) -> None:
         pass
 
+    # Return the indices of every device this event acts on; most events only act on device_idx
+    # Each of these devices is verified, and all of them are passed to exec_multi if there is more than one
+    def get_device_indices(self) -> list[int]:
+        return [self.device_idx]
+
+    # Execute the event on several devices (in the order of get_device_indices); by default, one after another
+    def exec_multi(self, devices: list[Device]) -> None:
+        for device in devices:
+            self.exec(device)
+
 
 
 # --- DeferredInit: Initialize the device during this event, instead of the initialization phase
@@ -136,9 +154,11 @@ class Sleep(Event):
             self.seconds: float = 3.0   # Number of seconds to sleep for
 
     # Execute the event
+    # A STOP message or a device fault ends the sleep early (the test then aborts)
     def exec(self) -> None:
         logging.info(f"Sleeping for {self.seconds} seconds...")
-        time.sleep(self.seconds)
+        if abort_event.wait(self.seconds):
+            logging.info("Sleep ended early.")
 
 
 
@@ -187,6 +207,33 @@ class ConsoleCommand(Event):
 
 
 
+# --- CallMacro: Run a named sub-sequence (macro) of the TestConfig in place of this event
+# The Controller never executes this event; TestConfig.events() replaces it with the macro's events
+class CallMacro(Event):
+
+    # *_title = String to show as field title in GUI (e.g. COM Port: _____)
+    # Any field without a corresponding field_title will default to the field name
+    macro_title: str = "Macro Name"
+    arguments_title: str = "Arguments (name=value, ...)"
+    
+    # *_options = Options for field to provide in a dropdown menu
+    # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
+
+    # Either init with default values or init with input fields (read from JSON)
+    def __init__(self, vars_dict: dict[str, Any] = {}):
+        if vars_dict:
+            vars(self).update(vars_dict) # Install input into __dict__
+        else:
+            super().__init__()          # Inits comment
+            self.macro: str = ""        # Name of the macro to run
+            self.arguments: str = ""    # Parameters set for the macro's events, as "name=value, ..."; a value of $name refers to another parameter
+
+    # Execute the event
+    def exec(self) -> None:
+        raise RuntimeError(f"CallMacro ({self.macro}) was not expanded. Run tests with TestConfig.events() to expand macros.")
+
+
+
 """
 PowerSupply Events =============================================================
 """
@@ -196,7 +243,8 @@ class PowerSupplyEvent(DeviceEvent):
 
     # *_title = String to show as field title in GUI (e.g. COM Port: _____)
     # Any field without a corresponding field_title will default to the field name
-    channel_title: str = "PSU Channel"
+    channel_title           : str = "PSU Channel"
+    extra_channels_title    : str = "Additional PSU Channels"
     
     # *_options = Options for field to provide in a dropdown menu
     # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
@@ -207,8 +255,9 @@ class PowerSupplyEvent(DeviceEvent):
         if vars_dict:
             vars(self).update(vars_dict) # Install input into __dict__
         else:
-            super().__init__()          # Inits comment and device_idx
-            self.channel: int = 0       # PSU channel
+            super().__init__()              # Inits comment and device_idx
+            self.channel        : int = 0   # PSU channel
+            self.extra_channels : str = ""  # Comma-separated list of additional PSU channels (e.g. "1, 2, 3")
 
     # Execute the event
     @abstractmethod
@@ -219,6 +268,39 @@ class PowerSupplyEvent(DeviceEvent):
     def verify(self, config: DeviceConfig) -> None:
         if not isinstance(config, PowerSupplyConfig):
             raise TypeError(f"Cannot run a PowerSupply Event on a non-PowerSupply Device; this Event likely has a faulty device_idx.")
+        _ = self.get_channels() # Check that extra_channels can be parsed
+
+    # Return the list of all channels this event acts on: channel, then any extra_channels
+    def get_channels(self) -> list[int]:
+        channels = [self.channel]
+        for elem in self.extra_channels.split(","):
+            if elem.strip():
+                try:
+                    channel = int(elem)
+                except ValueError:
+                    raise ValueError(f"Invalid entry in additional PSU channels: {elem.strip()}")
+                if channel not in channels:
+                    channels.append(channel)
+        return channels
+
+    # Describe the channel(s) for log messages
+    def _describe_channels(self, channels: list[int]) -> str:
+        return f"channel {channels[0]}" if len(channels) == 1 else f"channels {channels}"
+
+    # Log the measured values against the valid range, one line per channel, then PASS/FAIL
+    def _evaluate(self, quantity: str, unit: str, channels: list[int], measured: list[float], low: float, high: float) -> None:
+        passed = True
+        for channel, value in zip(channels, measured):
+            if len(channels) == 1:
+                logging.info(f"Measured {quantity}: {value} {unit}")
+            else:
+                logging.info(f"Measured {quantity} (channel {channel}): {value} {unit}")
+            passed = passed and (value >= low) and (value <= high)
+            emit_measurement(self.device_idx, channel, quantity, unit, value, low, high)
+        if passed:
+            logging.info("PASS")
+        else:
+            logging.info("FAIL")
 
 # --- SetPSU: Change the settings of a PowerSupply at a particular channel
 class SetPSU(PowerSupplyEvent):
@@ -238,55 +320,89 @@ class SetPSU(PowerSupplyEvent):
         if vars_dict:
             vars(self).update(vars_dict) # Install input into __dict__
         else:
-            super().__init__()                  # Inits comment, device_idx, and channel
+            super().__init__()                  # Inits comment, device_idx, and channels
             self.enable     : bool  = True      # Should the channel be enabled or disabled?
             self.keep       : bool  = False     # Should the voltage/current settings be left alone?
             self.voltage    : float = 0.0       # Voltage setting
             self.current    : float = 0.0       # Current setting
 
     # Execute the event
+    # Each step reads/writes all channels at once, and only touches the channels that need changing
     def exec(self, psu: PowerSupply) -> None:
 
-        logging.info(f"Changing settings of PSU #{self.device_idx} ({psu.config.display_name}), channel {self.channel}.")
+        channels = self.get_channels()
+        logging.info(f"Changing settings of PSU #{self.device_idx} ({psu.config.display_name}), {self._describe_channels(channels)}.")
         
         # If disabling, disable BEFORE changing settings
         if not self.enable:
-            if psu.get_channel_state(self.channel):
-                logging.info(f"Disabling the channel.")
-                psu.disable_channel(self.channel)
+            to_disable = [channel for channel, state in zip(channels, psu.get_channel_states(channels)) if state]
+            if to_disable:
+                logging.info(f"Disabling {self._describe_channels(to_disable)}.")
+                psu.disable_channels(to_disable)
             else:
-                logging.info(f"The channel is already disabled, skipping disable command.")
+                logging.info(f"{self._describe_channels(channels).capitalize()} already disabled, skipping disable command.")
 
         # Change settings only if !keep
         if not self.keep:
 
             # Set voltage and verify that the setting succeeded
-            if (psu.get_voltage(self.channel) == self.voltage):
+            to_set = [channel for channel, voltage in zip(channels, psu.get_voltages(channels)) if voltage != self.voltage]
+            if not to_set:
                 logging.info(f"The existing voltage setting already matches the expected setting, skipping set command.")
             else:
                 logging.info(f"Setting voltage to {self.voltage} V.")
-                psu.set_voltage(self.channel, self.voltage)
-                actual_set_voltage = psu.get_voltage(self.channel)
-                if (actual_set_voltage != self.voltage):
-                    raise RuntimeError(f"The new voltage setting ({actual_set_voltage} V) does not match the expected setting ({self.voltage} V). The desired setting may be out of range for this PSU.")
+                psu.set_voltages(to_set, self.voltage)
+                for channel, actual_set_voltage in zip(to_set, psu.get_voltages(to_set)):
+                    if (actual_set_voltage != self.voltage):
+                        raise RuntimeError(f"The new voltage setting of channel {channel} ({actual_set_voltage} V) does not match the expected setting ({self.voltage} V). The desired setting may be out of range for this PSU.")
             
             # Set current and verify that the setting succeeded
-            if (psu.get_current(self.channel) == self.current):
+            to_set = [channel for channel, current in zip(channels, psu.get_currents(channels)) if current != self.current]
+            if not to_set:
                 logging.info(f"The existing current setting already matches the expected setting, skipping set command.")
             else:
                 logging.info(f"Setting current to {self.current} A.")
-                psu.set_current(self.channel, self.current)
-                actual_set_current = psu.get_current(self.channel)
-                if (actual_set_current != self.current):
-                    raise RuntimeError(f"The new current setting ({actual_set_current} A) does not match the expected setting ({self.current} A). The desired setting may be out of range for this PSU.")
+                psu.set_currents(to_set, self.current)
+                for channel, actual_set_current in zip(to_set, psu.get_currents(to_set)):
+                    if (actual_set_current != self.current):
+                        raise RuntimeError(f"The new current setting of channel {channel} ({actual_set_current} A) does not match the expected setting ({self.current} A). The desired setting may be out of range for this PSU.")
         
         # If enabling, enable AFTER changing settings
         if self.enable:
-            if psu.get_channel_state(self.channel):
-                logging.info(f"The channel is already enabled, skipping enable command.")
+            to_enable = [channel for channel, state in zip(channels, psu.get_channel_states(channels)) if not state]
+            if not to_enable:
+                logging.info(f"{self._describe_channels(channels).capitalize()} already enabled, skipping enable command.")
             else:
-                logging.info(f"Enabling the channel.")
-                psu.enable_channel(self.channel)
+                logging.info(f"Enabling {self._describe_channels(to_enable)}.")
+                psu.enable_channels(to_enable)
+
+
+
+# --- WaitPSU: Wait for a PowerSupply's channels to reach their settings (e.g. finish an HV ramp)
+class WaitPSU(PowerSupplyEvent):
+
+    # *_title = String to show as field title in GUI (e.g. COM Port: _____)
+    # Any field without a corresponding field_title will default to the field name
+    timeout_title   : str = "Timeout (s)"
+    
+    # *_options = Options for field to provide in a dropdown menu
+    # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
+
+    # Either init with default values or init with input fields (read from JSON)
+    def __init__(self, vars_dict: dict[str, Any] = {}):
+        if vars_dict:
+            vars(self).update(vars_dict) # Install input into __dict__
+        else:
+            super().__init__()                  # Inits comment, device_idx, and channels
+            self.timeout    : float = 300.0     # Maximum time to wait before failing the test
+
+    # Execute the event
+    def exec(self, psu: PowerSupply) -> None:
+
+        channels = self.get_channels()
+        logging.info(f"Waiting for PSU #{self.device_idx} ({psu.config.display_name}), {self._describe_channels(channels)}, to reach its settings (timeout {self.timeout} s).")
+        elapsed = psu.wait_for_channels(channels, self.timeout)
+        logging.info(f"Settled after {elapsed:.1f} s.")
 
 
 
@@ -306,22 +422,19 @@ class EvalPSUVoltage(PowerSupplyEvent):
         if vars_dict:
             vars(self).update(vars_dict) # Install input into __dict__
         else:
-            super().__init__()                              # Inits comment, device_idx, and channel
+            super().__init__()                              # Inits comment, device_idx, and channels
             self.voltage_low    : float = float('-inf')     # The measured voltage must be >= this voltage
             self.voltage_high   : float = float('inf')      # The measured voltage must be <= this voltage
     
     # Execute the event
     def exec(self, psu: PowerSupply) -> None:
 
-        logging.info(f"Measured voltage from PSU #{self.device_idx} ({psu.config.display_name}), channel {self.channel}, must be >= {self.voltage_low} V and <= {self.voltage_high} V.")
+        channels = self.get_channels()
+        logging.info(f"Measured voltage from PSU #{self.device_idx} ({psu.config.display_name}), {self._describe_channels(channels)}, must be >= {self.voltage_low} V and <= {self.voltage_high} V.")
 
         # Measure the voltage and compare against the valid range
-        measured = psu.measure_voltage(self.channel)
-        logging.info(f"Measured voltage: {measured} V")
-        if (measured >= self.voltage_low) and (measured <= self.voltage_high):
-            logging.info("PASS")
-        else:
-            logging.info("FAIL")
+        measured = psu.measure_voltages(channels)
+        self._evaluate("voltage", "V", channels, measured, self.voltage_low, self.voltage_high)
 
 
 
@@ -341,22 +454,19 @@ class EvalPSUCurrent(PowerSupplyEvent):
         if vars_dict:
             vars(self).update(vars_dict) # Install input into __dict__
         else:
-            super().__init__()                              # Inits comment, device_idx, and channel
+            super().__init__()                              # Inits comment, device_idx, and channels
             self.current_low    : float = float('-inf')     # The measured current must be >= this current
             self.current_high   : float = float('inf')      # The measured current must be <= this current
 
     # Execute the event
     def exec(self, psu: PowerSupply) -> None:
 
-        logging.info(f"Measured current from PSU #{self.device_idx} ({psu.config.display_name}), channel {self.channel}, must be >= {self.current_low} A and <= {self.current_high} A.")
+        channels = self.get_channels()
+        logging.info(f"Measured current from PSU #{self.device_idx} ({psu.config.display_name}), {self._describe_channels(channels)}, must be >= {self.current_low} A and <= {self.current_high} A.")
 
         # Measure the current and compare against the valid range
-        measured = psu.measure_current(self.channel)
-        logging.info(f"Measured current: {measured} A")
-        if (measured >= self.current_low) and (measured <= self.current_high):
-            logging.info("PASS")
-        else:
-            logging.info("FAIL")
+        measured = psu.measure_currents(channels)
+        self._evaluate("current", "A", channels, measured, self.current_low, self.current_high)
 
 
 
@@ -376,22 +486,78 @@ class EvalPSUPower(PowerSupplyEvent):
         if vars_dict:
             vars(self).update(vars_dict) # Install input into __dict__
         else:
-            super().__init__()                              # Inits comment, device_idx, and channel
+            super().__init__()                              # Inits comment, device_idx, and channels
             self.power_low      : float = float('-inf')     # The measured power must be >= this power
             self.power_high     : float = float('inf')      # The measured power must be <= this power
 
     # Execute the event
     def exec(self, psu: PowerSupply) -> None:
 
-        logging.info(f"Measured power from PSU #{self.device_idx} ({psu.config.display_name}), channel {self.channel}, must be >= {self.power_low} W and <= {self.power_high} W.")
+        channels = self.get_channels()
+        logging.info(f"Measured power from PSU #{self.device_idx} ({psu.config.display_name}), {self._describe_channels(channels)}, must be >= {self.power_low} W and <= {self.power_high} W.")
 
         # Measure the power and compare against the valid range
-        measured = psu.measure_power(self.channel)
-        logging.info(f"Measured power: {measured} W")
-        if (measured >= self.power_low) and (measured <= self.power_high):
-            logging.info("PASS")
+        measured = psu.measure_powers(channels)
+        self._evaluate("power", "W", channels, measured, self.power_low, self.power_high)
+
+
+
+# --- MonitorPSU: Sample a PowerSupply's measured voltage and current for a while (plotted live in RunTestGUI)
+class MonitorPSU(PowerSupplyEvent):
+
+    # *_title = String to show as field title in GUI (e.g. COM Port: _____)
+    # Any field without a corresponding field_title will default to the field name
+    duration_title  : str = "Duration (s)"
+    interval_title  : str = "Sample Interval (s)"
+    
+    # *_options = Options for field to provide in a dropdown menu
+    # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
+
+    # Either init with default values or init with input fields (read from JSON)
+    def __init__(self, vars_dict: dict[str, Any] = {}):
+        if vars_dict:
+            vars(self).update(vars_dict) # Install input into __dict__
         else:
-            logging.info("FAIL")
+            super().__init__()                  # Inits comment, device_idx, and channels
+            self.duration   : float = 60.0      # How long to monitor for
+            self.interval   : float = 1.0       # Time between samples
+
+    # Check that the given config is a PowerSupplyConfig and that the timing is valid
+    def verify(self, config: DeviceConfig) -> None:
+        super().verify(config)
+        if self.interval <= 0:
+            raise ValueError(f"Sample interval must be positive, not {self.interval} s.")
+
+    # Execute the event
+    # A STOP message or a device fault ends the monitoring early (the test then aborts)
+    def exec(self, psu: PowerSupply) -> None:
+
+        channels = self.get_channels()
+        logging.info(f"Monitoring PSU #{self.device_idx} ({psu.config.display_name}), {self._describe_channels(channels)}, for {self.duration} s every {self.interval} s.")
+
+        # Track the range of each channel's readings for the summary
+        ranges: dict[tuple[int, str], list[float]] = {}
+        samples = 0
+        end = time.monotonic() + self.duration
+        while True:
+            tick = time.monotonic()
+            for quantity, unit, measured in (("voltage", "V", psu.measure_voltages(channels)),
+                                             ("current", "A", psu.measure_currents(channels))):
+                for channel, value in zip(channels, measured):
+                    emit_sample(self.device_idx, channel, quantity, unit, value)
+                    low_high = ranges.setdefault((channel, unit), [value, value])
+                    low_high[0], low_high[1] = min(low_high[0], value), max(low_high[1], value)
+            samples += 1
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            if abort_event.wait(min(max(self.interval - (time.monotonic() - tick), 0.0), remaining)):
+                logging.info("Monitoring stopped early.")
+                break
+
+        logging.info(f"Took {samples} samples.")
+        for (channel, unit), (low, high) in ranges.items():
+            logging.info(f"Channel {channel}: {low} to {high} {unit}")
 
 
 
@@ -402,10 +568,15 @@ TamaleroReadoutBoard Events ====================================================
 if TAMALERO_AVAIL:
 
     # --- RBEvent: An Event that requires a TamaleroReadoutBoard device
+    # An RBEvent can also target a set of boards (device_idx plus extra_device_idx). Boards behind the
+    # same KCU share one link and always run one after another; with `concurrent` set, boards behind
+    # different KCUs run at the same time.
     class RBEvent(DeviceEvent):
 
         # *_title = String to show as field title in GUI (e.g. COM Port: _____)
         # Any field without a corresponding field_title will default to the field name
+        extra_device_idx_title  : str = "Additional RB Device Indices"
+        concurrent_title        : str = "Run Boards on Separate KCUs Concurrently"
         
         # *_options = Options for field to provide in a dropdown menu
         # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
@@ -416,7 +587,9 @@ if TAMALERO_AVAIL:
             if vars_dict:
                 vars(self).update(vars_dict) # Install input into __dict__
             else:
-                super().__init__() # Inits comment and device_idx
+                super().__init__()                  # Inits comment and device_idx
+                self.extra_device_idx   : str   = ""        # Comma-separated list of additional RB device indices (e.g. "3, 4")
+                self.concurrent         : bool  = False     # Run boards behind different KCUs concurrently
 
         # Execute the event
         @abstractmethod
@@ -428,6 +601,60 @@ if TAMALERO_AVAIL:
             if not isinstance(config, TamaleroReadoutBoardConfig):
                 raise TypeError(f"Cannot run a RBEvent on a non-RB Device; this Event likely has a faulty device_idx.")
 
+        # Return the indices of all boards this event acts on: device_idx, then any extra_device_idx
+        def get_device_indices(self) -> list[int]:
+            indices = [self.device_idx]
+            for elem in self.extra_device_idx.split(","):
+                if elem.strip():
+                    try:
+                        idx = int(elem)
+                    except ValueError:
+                        raise ValueError(f"Invalid entry in additional RB device indices: {elem.strip()}")
+                    if idx not in indices:
+                        indices.append(idx)
+            return indices
+
+        # Execute the event on a set of boards, recording a result for each board
+        # Every board runs even if another one fails; any failures are raised together at the end
+        def exec_multi(self, rbs: list[TamaleroReadoutBoard]) -> None:
+
+            # Group boards by KCU session; each group runs sequentially on its shared link
+            groups: dict[int, list[tuple[int, TamaleroReadoutBoard]]] = {}
+            for idx, rb in zip(self.get_device_indices(), rbs):
+                groups.setdefault(id(rb.kcu_session), []).append((idx, rb))
+
+            def run_group(group: list[tuple[int, TamaleroReadoutBoard]]) -> list[dict[str, Any]]:
+                records = []
+                for idx, rb in group:
+                    logging.info(f"RB device #{idx} ({rb.config.display_name}):")
+                    start = time.monotonic()
+                    try:
+                        with log_context(device=f"#{idx}"):
+                            self.exec(rb)
+                        records.append({'device_idx': idx, 'ok': True, 'duration': time.monotonic() - start, 'error': ""})
+                    except Exception as e:
+                        logging.error(f"RB device #{idx} ({rb.config.display_name}) failed: {e}")
+                        records.append({'device_idx': idx, 'ok': False, 'duration': time.monotonic() - start, 'error': str(e)})
+                return records
+
+            if self.concurrent and (len(groups) > 1):
+                logging.info(f"Running {len(rbs)} boards on {len(groups)} KCUs concurrently.")
+                # Each worker runs in a copy of this thread's log context, so its messages keep the event's indent and tags
+                with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                    futures = [executor.submit(copy_context().run, run_group, group) for group in groups.values()]
+                    results = [future.result() for future in futures]
+            else:
+                results = [run_group(group) for group in groups.values()]
+            records = sorted((record for group_records in results for record in group_records), key=lambda record: record['device_idx'])
+
+            # Report per-board results
+            for record in records:
+                status = "OK" if record['ok'] else f"ERROR ({record['error']})"
+                logging.info(f"RB device #{record['device_idx']}: {status} in {record['duration']:.2f} s")
+            failures = [record for record in records if not record['ok']]
+            if failures:
+                raise RuntimeError(f"{len(failures)} of {len(records)} boards failed: {[record['device_idx'] for record in failures]}")
+
 
 
     # --- RBReadADC: Read ADCs of all onboard chips
@@ -452,11 +679,15 @@ if TAMALERO_AVAIL:
 
 
 
-    # --- RBReadADC: Run built-in eyescan test on LPGBT ADCs
+    # --- RBRunEyescan: Run built-in eyescan test on LPGBT ADCs, save the eye diagram, and evaluate the eye opening
     class RBRunEyescan(RBEvent):
 
         # *_title = String to show as field title in GUI (e.g. COM Port: _____)
         # Any field without a corresponding field_title will default to the field name
+        output_dir_title    : str = "Output Directory"
+        threshold_title     : str = "Open Threshold (Fraction of Max Errors)"
+        min_width_title     : str = "Minimum Eye Width (Steps)"
+        min_height_title    : str = "Minimum Eye Height (Steps)"
         
         # *_options = Options for field to provide in a dropdown menu
         # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
@@ -466,12 +697,28 @@ if TAMALERO_AVAIL:
             if vars_dict:
                 vars(self).update(vars_dict) # Install input into __dict__
             else:
-                super().__init__() # Inits comment and device_idx
+                super().__init__()                      # Inits comment and device_idx
+                self.output_dir : str   = "eyescans"    # Directory to save eye diagrams to (.npz); leave empty to skip saving
+                self.threshold  : float = 0.01          # A cell is "open" if its errors are <= this fraction of the maximum
+                self.min_width  : int   = 0             # The eye must be at least this wide to pass
+                self.min_height : int   = 0             # The eye must be at least this high to pass
         
         # Execute the event
         def exec(self, rb: TamaleroReadoutBoard) -> None:
-            rb.run_eyescan()
-            logging.info(f"RB LPGBT ADC eyescan test complete.")
+            eye = rb.run_eyescan()
+            logging.info(f"RB LPGBT ADC eyescan test complete ({eye.shape[0]} x {eye.shape[1]}).")
+            if self.output_dir:
+                logging.info(f"Eye diagram saved to {rb.save_eyescan(eye, self.output_dir)}")
+
+            width, height = rb.eye_opening(eye, self.threshold)
+            logging.info(f"Eye opening must be >= {self.min_width} steps wide and >= {self.min_height} steps high.")
+            logging.info(f"Eye width: {width} steps, eye height: {height} steps")
+            emit_measurement(self.device_idx, None, "eye width", "steps", width, self.min_width, float('inf'))
+            emit_measurement(self.device_idx, None, "eye height", "steps", height, self.min_height, float('inf'))
+            if (width >= self.min_width) and (height >= self.min_height):
+                logging.info("PASS")
+            else:
+                logging.info("FAIL")
 
 
 
@@ -480,6 +727,7 @@ if TAMALERO_AVAIL:
         
         # *_title = String to show as field title in GUI (e.g. COM Port: _____)
         # Any field without a corresponding field_title will default to the field name
+        integration_time_title: str = "Integration Window (s)"
         
         # *_options = Options for field to provide in a dropdown menu
         # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
@@ -489,11 +737,56 @@ if TAMALERO_AVAIL:
             if vars_dict:
                 vars(self).update(vars_dict) # Install input into __dict__
             else:
-                super().__init__() # Inits comment and device_idx
+                super().__init__()                      # Inits comment and device_idx
+                self.integration_time: float = 1.0      # Time to let the pattern checkers count errors before reading them
+        
+        # Execute the event
+        def exec(self, rb: TamaleroReadoutBoard) -> None:
+            logging.info(f"RB LPGBT pattern checker readings: {rb.read_pattern_checkers(integration_time=self.integration_time)}")
+
+
+
+    # --- RBCaptureData: Stream ETROC data from the KCU readout FIFO into a memory-mapped file
+    class RBCaptureData(RBEvent):
+
+        # *_title = String to show as field title in GUI (e.g. COM Port: _____)
+        # Any field without a corresponding field_title will default to the field name
+        output_dir_title    : str = "Output Directory"
+        duration_title      : str = "Capture Duration (s)"
+        buffer_mb_title     : str = "Capture File Size (MB)"
+        ring_title          : str = "Ring Buffer (Keep Latest Data)"
+        
+        # *_options = Options for field to provide in a dropdown menu
+        # Any field without a corresponding field_options will default to a text box/spin box/toggle, depending on the type
+
+        # Either init with default values or init with input fields (read from JSON)
+        def __init__(self, vars_dict: dict[str, Any] = {}):
+            if vars_dict:
+                vars(self).update(vars_dict) # Install input into __dict__
+            else:
+                super().__init__()                  # Inits comment and device_idx
+                self.output_dir : str   = "daq"     # Directory to write capture files to (daq_<board>_<timestamp>.dat + .index.npy)
+                self.duration   : float = 10.0      # How long to capture for
+                self.buffer_mb  : int   = 256       # Size of the preallocated capture file
+                self.ring       : bool  = True      # Wrap around and keep the latest data, or stop filling when full
         
+        # Check that the given config is a TamaleroReadoutBoardConfig and that the capture settings are valid
+        def verify(self, config: DeviceConfig) -> None:
+            super().verify(config)
+            if self.duration <= 0:
+                raise ValueError(f"Capture duration must be positive, not {self.duration} s.")
+            if self.buffer_mb <= 0:
+                raise ValueError(f"Capture file size must be positive, not {self.buffer_mb} MB.")
+
         # Execute the event
         def exec(self, rb: TamaleroReadoutBoard) -> None:
-            logging.info(f"RB LPGBT pattern checker readings: {rb.read_pattern_checkers()}")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = os.path.join(self.output_dir, f"daq_{rb.board_label()}_{timestamp}.dat")
+            result = rb.capture_data(filepath, self.duration, self.buffer_mb * 1024 * 1024 // 4, self.ring)
+            logging.info(f"RB DAQ capture saved to {result['file']}: {result['words']} words in {result['segments']} blocks over {result['duration']:.2f} s ({result['throughput_mbps']:.1f} MB/s)")
+            dropped = {name: result[name] for name in ('fifo_lost_words', 'ring_dropped_words', 'file_dropped_words', 'index_dropped_segments') if result[name]}
+            if dropped:
+                logging.warning(f"RB DAQ capture dropped data: {dropped}")
 
 
 
@@ -2,15 +2,27 @@
 Common.py
 This file contains a system that can capture all logging messages during an
 operation. This is used during JSON load/saves in order to display any Cerebellum
-warnings or errors to the user.
+warnings or errors to the user. It also contains small helpers shared by the
+config GUIs, including FileTask, which runs a load/save on a worker thread behind
+a cancellable progress dialog.
 """
 
 # Prevents TypeError on type hints for Python 3.7 to 3.9
 from __future__ import annotations
 
-import logging
+from PySide6.QtWidgets import QWidget, QComboBox, QCheckBox, QSpinBox, QDoubleSpinBox, QLineEdit, QProgressDialog, QMessageBox
+from PySide6.QtCore import Qt, QObject, Signal
+
+from typing import Any, Callable
+import logging, threading, time
 from contextlib import contextmanager
 
+# Minimum interval (s) between progress updates / partial results sent from a FileTask to the GUI thread
+FILE_TASK_UPDATE_INTERVAL = 0.05
+
+# Time (ms) a FileTask must run before its progress dialog is shown
+FILE_TASK_DIALOG_DELAY = 300
+
 # Logging handler and context manager to capture all logging messages during an operation
 
 class BufferedLogHandler(logging.Handler):
@@ -33,3 +45,126 @@ def capture_warnings():
         yield handler.buffer
     finally:
         logging.getLogger().removeHandler(handler)
+
+
+
+# Connect the "value changed" signal of a field edit (as built by the config widgets) to `slot`
+# Used to track which parts of a config have been edited since they were last read
+def connect_edit_changed(edit: QWidget, slot: Callable[..., None]) -> None:
+    if isinstance(edit, QComboBox):
+        edit.currentTextChanged.connect(slot)
+    elif isinstance(edit, QCheckBox):
+        edit.toggled.connect(slot)
+    elif isinstance(edit, (QSpinBox, QDoubleSpinBox)):
+        edit.valueChanged.connect(slot)
+    elif isinstance(edit, QLineEdit):
+        edit.textChanged.connect(slot)
+
+
+
+# Raised inside a FileTask's work function when the user cancels it
+class OperationCancelled(Exception):
+    pass
+
+
+
+"""
+FileTask
+Runs `work(task)` on a worker thread, so loading or saving a large config does not
+freeze the window. The work function reports its progress with task.report(done,
+total), which also raises OperationCancelled once the user has pressed Cancel, and
+may hand partial results to the GUI thread with task.deliver(items). When the work
+is done, `finished` fires on the GUI thread with the result (None if it failed),
+the exception (None if it succeeded) and the warnings logged meanwhile.
+"""
+class FileTask(QObject):
+
+    progress_changed = Signal(int, int)
+    partial_result = Signal(object)
+    finished = Signal(object, object, list)
+
+    def __init__(self, work: Callable[[FileTask], Any], parent = None):
+        super().__init__(parent)
+        self.work = work
+        self.cancel_event = threading.Event()
+        self.last_update = 0.0
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    # Called by the work function; throttled, so it can be called for every item
+    # Returns True if an update was sent, which is a good moment to deliver() partial results too
+    def report(self, done: int, total: int) -> bool:
+        if self.cancel_event.is_set():
+            raise OperationCancelled("Cancelled by user.")
+        now = time.monotonic()
+        if (now - self.last_update >= FILE_TASK_UPDATE_INTERVAL) or (done >= total):
+            self.last_update = now
+            self.progress_changed.emit(done, total)
+            return True
+        return False
+
+    # Hand a batch of partial results to the GUI thread
+    def deliver(self, items: Any) -> None:
+        self.partial_result.emit(items)
+
+    def _run(self) -> None:
+        result, error = None, None
+        with capture_warnings() as warnings:
+            try:
+                result = self.work(self)
+            except Exception as e:
+                error = e
+        self.finished.emit(result, error, list(warnings))
+
+"""
+Starts a FileTask for `work`, showing a window-modal progress dialog labelled
+`label` with a Cancel button. `on_finished(result, error, warnings)` is called on
+the GUI thread when the work ends, and `on_partial(items)` for each delivered batch.
+"""
+def start_file_task(parent: QWidget, label: str, work: Callable[[FileTask], Any],
+                    on_finished: Callable[[Any, (Exception | None), list[str]], None],
+                    on_partial: (Callable[[Any], None] | None) = None) -> FileTask:
+
+    task = FileTask(work, parent)
+    dialog = QProgressDialog(label, "Cancel", 0, 0, parent.window())
+    dialog.setWindowModality(Qt.WindowModality.WindowModal)
+    dialog.setMinimumDuration(FILE_TASK_DIALOG_DELAY)
+    dialog.setAutoReset(False)
+    dialog.setAutoClose(False)
+
+    def update_progress(done: int, total: int) -> None:
+        dialog.setMaximum(total)
+        dialog.setValue(done)
+
+    def finish(result: Any, error: (Exception | None), warnings: list[str]) -> None:
+        dialog.close()
+        dialog.deleteLater()
+        task.deleteLater()
+        on_finished(result, error, warnings)
+
+    task.progress_changed.connect(update_progress)
+    if on_partial:
+        task.partial_result.connect(on_partial)
+    task.finished.connect(finish)
+    dialog.canceled.connect(task.cancel)
+    task.start()
+    return task
+
+# Show the outcome of a load/save (`action` = "load" or "save"): an error, the collected warnings, or success
+def show_file_result(parent: QWidget, action: str, error: (Exception | None), warnings: list[str]) -> None:
+    gerund, past = {"load": ("loading", "loaded"), "save": ("saving", "saved")}[action]
+    if isinstance(error, OperationCancelled):
+        QMessageBox.information(parent, "Cancelled", f"Cancelled {gerund} configuration file.")
+    elif error is not None:
+        QMessageBox.critical(parent, "Error", f"Failed to {action} configuration file:\n{error}")
+    elif warnings:
+        string = f"Warnings encountered while {gerund} configuration file:"
+        for warning in warnings:
+            string += f"\n{warning}"
+        QMessageBox.warning(parent, "Warning", string)
+    else:
+        QMessageBox.information(parent, "Success", f"Successfully {past} configuration file.")
@@ -0,0 +1,67 @@
+"""
+ConfigModel.py
+This file contains the ConfigModel, which holds the EnvironmentConfig and
+TestConfig shared between the tabs of MainGUI. Tabs that edit a config only mark
+it dirty; the config is read back from the editing tab when the user switches
+tabs, and only if it was edited. Tabs that use a config listen for the change
+signals, so each update only reaches the tabs that depend on the changed part.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from Cerebellum.EnvironmentConfig import EnvironmentConfig
+from Cerebellum.TestConfig import TestConfig
+
+from PySide6.QtCore import QObject, Signal
+
+
+
+class ConfigModel(QObject):
+
+    # Emitted with the new EnvironmentConfig whenever it is replaced
+    env_changed = Signal(object)
+
+    # Emitted with the new EnvironmentConfig only if its device list (classes, names, order) changed
+    # This is what device_idx options depend on
+    devices_changed = Signal(object)
+
+    # Emitted with the new TestConfig whenever it is replaced
+    test_changed = Signal(object)
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.env: (EnvironmentConfig | None) = None
+        self.test: (TestConfig | None) = None
+        self.device_signature: (list[tuple[str, str]] | None) = None
+
+        # Whether the editing tabs have changed a config since it was last read
+        self.env_dirty = True
+        self.test_dirty = True
+
+
+
+    # Mark a config as edited; it will be read back on the next sync
+    def mark_env_dirty(self) -> None:
+        self.env_dirty = True
+
+    def mark_test_dirty(self) -> None:
+        self.test_dirty = True
+
+
+
+    # Replace the EnvironmentConfig, notifying devices_changed only if the device list is different
+    def set_env(self, env: EnvironmentConfig) -> None:
+        self.env = env
+        self.env_dirty = False
+        self.env_changed.emit(env)
+        signature = [(config.__class__.__name__, config.display_name) for config in env.device_config_list]
+        if signature != self.device_signature:
+            self.device_signature = signature
+            self.devices_changed.emit(env)
+
+    # Replace the TestConfig
+    def set_test(self, test: TestConfig) -> None:
+        self.test = test
+        self.test_dirty = False
+        self.test_changed.emit(test)
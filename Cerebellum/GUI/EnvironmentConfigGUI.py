@@ -15,29 +15,28 @@ ABS_DIR = os.path.dirname(os.path.abspath(__file__))
 if __name__ == "__main__":
     sys.path.append(f"{ABS_DIR}/../../") # Cerebellum parent directory
 
-from Cerebellum.Common import DEVICE_CONFIGS
+from Cerebellum.Common import DEVICE_CONFIGS, get_schema
 from Cerebellum.EnvironmentConfig import EnvironmentConfig
 from Cerebellum.Device.Device import DeviceConfig
-from Cerebellum.GUI.Common import capture_warnings
+from Cerebellum.GUI.Common import capture_warnings, connect_edit_changed, start_file_task, show_file_result, FileTask
+from Cerebellum.CapabilityCache import peek_capabilities
+from Cerebellum.GUI.PortDiscovery import PortDiscovery, PortInfo, SERIAL_AVAIL
 
 from PySide6.QtWidgets import  (QApplication, QMainWindow,
                                 QWidget, QScrollArea, QGroupBox, QVBoxLayout, QHBoxLayout,
-                                QPushButton, QFileDialog, QMessageBox, QLabel,
+                                QPushButton, QFileDialog, QLabel,
                                 QComboBox, QCheckBox, QSpinBox, QDoubleSpinBox, QLineEdit)
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
 
 from typing import Any
 
-SERIAL_AVAIL = True
-try:
-    import serial.tools.list_ports
-except:
-    SERIAL_AVAIL = False
-
 
 
 class DeviceConfigWidget(QGroupBox):
 
+    # Emitted whenever the device class or any field is edited
+    changed = Signal()
+
     def __init__(self, device_config: (DeviceConfig | None) = None, parent = None):
 
         super().__init__("Device Config", parent)
@@ -73,6 +72,10 @@ class DeviceConfigWidget(QGroupBox):
         # Also re-run this update any time the device selection changes
         self._update_device_select()
         self.device_class_edit.currentTextChanged.connect(self._update_device_select)
+        self.device_class_edit.currentTextChanged.connect(self.changed)
+
+        # Keep any com field up to date as serial ports are plugged in/removed or probed
+        PortDiscovery.instance().ports_changed.connect(self._update_ports)
 
         # Populate with data if provided
         # Type conversions should only be necessary for QComboBox
@@ -90,6 +93,9 @@ class DeviceConfigWidget(QGroupBox):
                 elif isinstance(field_edit, QLineEdit):
                     field_edit.setText(str(field_value))
 
+        # Show any cached capability hints for the current config (e.g. boards found in a crate)
+        self._update_hints()
+
         
 
     # Convert device widget into a DeviceConfig object
@@ -98,7 +104,7 @@ class DeviceConfigWidget(QGroupBox):
         # First, retrieve a DeviceConfig instance from the current selected device class
         device_class_name = self.device_class_edit.currentText()
         constructor = DEVICE_CONFIGS[device_class_name]
-        blank_config = constructor()
+        field_types = {field.name: field.type for field in get_schema(constructor)}
 
         # Make a dict for the config based on the current values from edits
         config_dict: dict[str, Any] = {}
@@ -116,9 +122,8 @@ class DeviceConfigWidget(QGroupBox):
             else:
                 field_value = 0
             
-            # Convert the field value according to the type in the blank_config
-            field_type = type(getattr(blank_config, field_name))
-            config_dict[field_name] = field_type(field_value)
+            # Convert the field value according to the type of the field's default
+            config_dict[field_name] = field_types[field_name](field_value)
         
         # Return a DeviceConfig corresponding to the selected class, populated
         # with the data extracted from the edits
@@ -141,13 +146,26 @@ class DeviceConfigWidget(QGroupBox):
 
 
 
+    # Set field tooltips from the capability cache entry of the current config, if there is one
+    # The entry is looked up by the config's endpoint (e.g. IP address), so re-run this when text fields are edited
+    def _update_hints(self) -> None:
+        try:
+            key = self.get_device_config().get_capability_key()
+        except Exception:
+            key = None
+        capabilities = peek_capabilities(key) if key else None
+        field_hints = capabilities.get("field_hints", {}) if capabilities else {}
+        for field_name, field_edit in self.field_edits.items():
+            field_edit.setToolTip(str(field_hints.get(field_name, "")))
+
+
+
     # Update the device widget with the fields corresponding to the selected device
     def _update_device_select(self) -> None:
 
         # First, retrieve a DeviceConfig instance from the current selected device class
         device_class_name = self.device_class_edit.currentText()
         constructor = DEVICE_CONFIGS[device_class_name]
-        blank_config = constructor()
 
         # Delete the widgets (label + edit) of the current fields
         for field_widget in self.field_widgets:
@@ -162,15 +180,17 @@ class DeviceConfigWidget(QGroupBox):
         self.field_widgets.clear()
         
         # Replace them with new fields/widgets corresponding to instance attributes
-        for field_name, field_value in vars(blank_config).items():
+        # The fields, titles and options come from the class's cached schema (see Common.py)
+        for field in get_schema(constructor):
+            field_name, field_value = field.name, field.default
             # First check if the field has a corresponding _options class attribute
             # If so, construct the field_edit as a ComboBox, and set the options as such
             # Otherwise, construct according to the field's type (e.g. LineEdit, SpinBox, etc.)
             # Also set the current text/value to the default text/value
-            if (field_name + "_options") in dir(blank_config.__class__):
+            if field.options is not None:
                 field_edit = QComboBox()
                 field_edit.setEditable(False)
-                items = [str(item) for item in getattr(blank_config, field_name + "_options")]
+                items = list(field.options)
                 field_edit.addItems(items)
                 field_edit.setMinimumContentsLength(len(max(items, key=len)) + 3)
                 field_edit.setCurrentText(str(field_value))
@@ -193,25 +213,26 @@ class DeviceConfigWidget(QGroupBox):
                 field_edit.setText(str(field_value))
                 
             # Special case
-            # If a field is called "com", overwrite the widget with a ComboBox that retrieves all COM ports of the computer
+            # If a field is called "com", overwrite the widget with a ComboBox of the COM ports of the computer
+            # The ports come from the PortDiscovery cache, and are refreshed whenever it finds a change
             if SERIAL_AVAIL and (field_name == "com"):
                 field_edit = QComboBox()
                 field_edit.setEditable(True) # Set editable so that the field won't ignore a loaded value
-                items = [port.name for port in serial.tools.list_ports.comports()]
-                field_edit.addItems(items)
-                field_edit.setMinimumContentsLength(len(max(items, key=len)) + 3)
                 field_edit.setCurrentText(str(field_value))
 
             # Ignore wheelEvents so that scrolling will only ever scroll the list of configs
             field_edit.wheelEvent = (lambda event: event.ignore())
 
+            # Refresh capability hints when a text field (e.g. IP address) is edited
+            if isinstance(field_edit, QLineEdit):
+                field_edit.editingFinished.connect(self._update_hints)
+
+            # Report edits, so the config is only read back when it has changed
+            connect_edit_changed(field_edit, self.changed)
+
             # Update the layout with the new field
-            # If the field has a corresponding _title class attribute, use that as the label
-            # Otherwise, just use the field name
-            if (field_name + "_title") in dir(blank_config.__class__):
-                self._add_field(getattr(blank_config, field_name + "_title"), field_edit)
-            else:
-                self._add_field(field_name, field_edit)
+            # The schema's title is the field's _title class attribute if it has one, otherwise the field name
+            self._add_field(field.title, field_edit)
 
             # Update the dict of field edits
             self.field_edits[field_name] = field_edit
@@ -219,10 +240,39 @@ class DeviceConfigWidget(QGroupBox):
         # Add the remove button back to the layout
         self.main_layout.addWidget(self.remove_button)
 
+        # Fill in the COM port options, if there is a com field
+        self._update_ports(PortDiscovery.instance().ports())
+
+        # Show any cached capability hints for the new fields
+        self._update_hints()
+
+
+
+    # Update the options of the com field (if it exists) from the discovered ports, keeping the current text
+    def _update_ports(self, ports: list[PortInfo]) -> None:
+        field_edit = self.field_edits.get("com")
+        if not isinstance(field_edit, QComboBox):
+            return
+        current = field_edit.currentText()
+        field_edit.blockSignals(True)
+        field_edit.clear()
+        for idx, port in enumerate(ports):
+            field_edit.addItem(port.device)
+            field_edit.setItemData(idx, port.label(), Qt.ItemDataRole.ToolTipRole)
+        if ports:
+            field_edit.setMinimumContentsLength(max(len(port.device) for port in ports) + 3)
+        field_edit.setCurrentText(current)
+        field_edit.blockSignals(False)
+        match = next((port for port in ports if port.device == current), None)
+        field_edit.setToolTip(match.label() if match else "")
+
 
 
 class EnvironmentConfigGUI(QWidget):
 
+    # Emitted whenever any part of the config is edited (or a new config is loaded)
+    changed = Signal()
+
     def __init__(self):
         
         super().__init__()
@@ -239,6 +289,13 @@ class EnvironmentConfigGUI(QWidget):
         self.file_buttons_layout.addWidget(self.save_button)
         self.main_layout.addLayout(self.file_buttons_layout)
 
+        # Serial port probe button - asks each serial port for *IDN? in the background, to label the COM port options
+        if SERIAL_AVAIL:
+            self.probe_ports_button = QPushButton("Identify Serial Instruments (*IDN?)")
+            self.probe_ports_button.setToolTip("Sends *IDN? to every serial port and shows the responses in the COM port options.")
+            self.probe_ports_button.clicked.connect(PortDiscovery.instance().probe_ports)
+            self.main_layout.addWidget(self.probe_ports_button)
+
         # Python path
         self.python_path_layout = QHBoxLayout()
         self.python_path_label = QLabel("Python Path/Alias:")
@@ -256,6 +313,19 @@ class EnvironmentConfigGUI(QWidget):
         self.shutdown_order_layout.addWidget(self.shutdown_order_edit)
         self.main_layout.addLayout(self.shutdown_order_layout)
 
+        # Log file
+        self.log_file_layout = QHBoxLayout()
+        self.log_file_label = QLabel("Log File (Optional):")
+        self.log_file_edit = QLineEdit()
+        self.log_file_edit.setPlaceholderText("e.g. logs/test.log")
+        self.log_file_layout.addWidget(self.log_file_label)
+        self.log_file_layout.addWidget(self.log_file_edit)
+        self.main_layout.addLayout(self.log_file_layout)
+
+        # Report edits to the top-level fields
+        for field_edit in (self.python_path_edit, self.shutdown_order_edit, self.log_file_edit):
+            connect_edit_changed(field_edit, self.changed)
+
         # DeviceConfig scrollable list area
         self.device_scroll_area = QScrollArea()
         self.device_scroll_area.setWidgetResizable(True)
@@ -282,6 +352,7 @@ class EnvironmentConfigGUI(QWidget):
         # Clear current UI
         self.python_path_edit.clear()
         self.shutdown_order_edit.clear()
+        self.log_file_edit.clear()
         for widget in self.device_widgets:
             self._remove_device_widget(widget, False)
         self.device_widgets.clear()
@@ -289,8 +360,10 @@ class EnvironmentConfigGUI(QWidget):
         # Populate UI
         self.python_path_edit.setText(config.python_path)
         self.shutdown_order_edit.setText(str(config.shutdown_order)[1:-1])
+        self.log_file_edit.setText(config.log_file)
         for device in config.device_config_list:
             self._add_device_widget(device)
+        self.changed.emit()
 
 
 
@@ -302,6 +375,7 @@ class EnvironmentConfigGUI(QWidget):
             config.shutdown_order = [int(elem) for elem in self.shutdown_order_edit.text().split(",")]
         except:
             config.shutdown_order = []
+        config.log_file = self.log_file_edit.text().strip()
         for widget in self.device_widgets:
             config.device_config_list.append(widget.get_device_config())
         return config
@@ -314,6 +388,8 @@ class EnvironmentConfigGUI(QWidget):
         self.device_layout.addWidget(widget)
         self.device_widgets.append(widget)
         widget.remove_button.clicked.connect(lambda: self._remove_device_widget(widget, True))
+        widget.changed.connect(self.changed)
+        self.changed.emit()
 
 
 
@@ -323,6 +399,7 @@ class EnvironmentConfigGUI(QWidget):
         widget.deleteLater()
         if update:
             self.device_widgets.remove(widget)
+            self.changed.emit()
 
 
 
@@ -332,38 +409,43 @@ class EnvironmentConfigGUI(QWidget):
         if not filepath:
             return
 
-        try:
-
-            with capture_warnings() as warnings:
+        self.setEnabled(False)
 
-                config = EnvironmentConfig()
-                config.read_json(filepath)
-                self.set_env(config)
+        # Read and construct the configs on a worker thread; only the widgets are built on the GUI thread
+        def work(task: FileTask) -> EnvironmentConfig:
+            config = EnvironmentConfig()
+            config.read_json(filepath, task.report)
+            return config
 
-            if warnings:
-                string = "Warnings encountered while loading configuration file:"
-                for warning in warnings:
-                    string += f"\n{warning}"
-                QMessageBox.warning(self, "Warning", string)
-            else:
-                QMessageBox.information(self, "Success", f"Successfully loaded configuration file.")
+        def finished(config: (EnvironmentConfig | None), error: (Exception | None), warnings: list[str]) -> None:
+            self.setEnabled(True)
+            if error is None:
+                with capture_warnings() as widget_warnings:
+                    self.set_env(config)
+                warnings += widget_warnings
+            show_file_result(self, "load", error, warnings)
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to load configuration file:\n{e}")
+        start_file_task(self, "Loading environment config...", work, finished)
 
 
 
-    # Save the current config into a JSON file
+    # Save the current config into a JSON file, on a worker thread
     def _save_json(self) -> None:
         filepath, _ = QFileDialog.getSaveFileName(self, "Save Environment Config JSON", "", "JSON Files (*.json)")
         if not filepath:
             return
 
-        try:
-            self.get_env().write_json(filepath)
-            QMessageBox.information(self, "Success", f"Successfully saved configuration file.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save configuration file:\n{e}")
+        config = self.get_env()
+        self.setEnabled(False)
+
+        def work(task: FileTask) -> None:
+            config.write_json(filepath, task.report)
+
+        def finished(result: None, error: (Exception | None), warnings: list[str]) -> None:
+            self.setEnabled(True)
+            show_file_result(self, "save", error, warnings)
+
+        start_file_task(self, "Saving environment config...", work, finished)
 
 
 
@@ -0,0 +1,285 @@
+"""
+LivePlot.py
+This file contains the LivePlot panel, which plots monitored values (e.g. PSU
+voltages and currents from MonitorPSU) while a test runs in RunTestGUI. It is fed
+the "sample" and "measurement" messages of the test's protocol output (see
+Protocol.py).
+
+Each series keeps its raw samples in flat arrays, along with a pyramid of
+per-block minima and maxima that is updated as samples arrive. To draw, each
+pixel column of the chart is reduced to the min and max of the samples that fall
+in it, read from the coarsest pyramid level that still resolves the column. A
+redraw therefore costs about the same for a minute of data as for a multi-hour
+run, and spikes are never lost to the decimation.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton
+from PySide6.QtGui import QPainter, QPen, QColor
+from PySide6.QtCore import Qt, QTimer, QLineF, QRectF
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any
+import time
+
+# Number of samples per block at each level of the min/max pyramid
+PLOT_BLOCK_FACTOR = 8
+
+# Interval (ms) between redraws, if new samples have arrived
+PLOT_REDRAW_INTERVAL = 100
+
+# Visible time windows (s); None shows the whole run
+PLOT_WINDOWS = {
+    "Last 1 min": 60.0,
+    "Last 10 min": 600.0,
+    "Last 1 h": 3600.0,
+    "Whole Run": None,
+}
+
+# Colors assigned to series in order of appearance
+PLOT_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+
+
+
+# --- SeriesStore: Array-backed time series with a min/max pyramid for decimation
+class SeriesStore:
+    def __init__(self):
+        self.times = array('d')
+        self.values = array('d')
+
+        # levels[k] = (mins, maxs) over blocks of PLOT_BLOCK_FACTOR ** (k + 1) samples
+        self.levels: list[tuple[array, array]] = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    # Add a sample; times must not decrease
+    def append(self, t: float, value: float) -> None:
+        if self.times and (t < self.times[-1]):
+            t = self.times[-1]
+        self.times.append(t)
+        self.values.append(value)
+
+        # Update the last block of each level, adding a level when the data outgrows the top one
+        n = len(self.values)
+        size = PLOT_BLOCK_FACTOR
+        k = 0
+        while size < n * PLOT_BLOCK_FACTOR:
+            if k == len(self.levels):
+                self.levels.append((array('d'), array('d')))
+                self._rebuild_level(k)
+            else:
+                mins, maxs = self.levels[k]
+                block = (n - 1) // size
+                if block == len(mins):
+                    mins.append(value)
+                    maxs.append(value)
+                else:
+                    mins[block] = min(mins[block], value)
+                    maxs[block] = max(maxs[block], value)
+            size *= PLOT_BLOCK_FACTOR
+            k += 1
+
+    # Fill level k from the level below it (or the raw samples)
+    def _rebuild_level(self, k: int) -> None:
+        below_mins, below_maxs = self.levels[k - 1] if k > 0 else (self.values, self.values)
+        mins, maxs = self.levels[k]
+        for start in range(0, len(below_mins), PLOT_BLOCK_FACTOR):
+            mins.append(min(below_mins[start:start + PLOT_BLOCK_FACTOR]))
+            maxs.append(max(below_maxs[start:start + PLOT_BLOCK_FACTOR]))
+
+    # Min and max of samples [i0, i1), using the coarsest level whose blocks fit in the range
+    # Blocks that straddle the range edges are included whole, which can only widen the band slightly
+    def min_max(self, i0: int, i1: int) -> tuple[float, float]:
+        count = i1 - i0
+        k = -1
+        size = 1
+        while (k + 1 < len(self.levels)) and (size * PLOT_BLOCK_FACTOR <= count):
+            k += 1
+            size *= PLOT_BLOCK_FACTOR
+        if k < 0:
+            chunk = self.values[i0:i1]
+            return min(chunk), max(chunk)
+        mins, maxs = self.levels[k]
+        b0, b1 = i0 // size, (i1 - 1) // size + 1
+        return min(mins[b0:b1]), max(maxs[b0:b1])
+
+    # Reduce the samples in [t0, t1] to `columns` (min, max) pairs; None where a column has no samples
+    def decimate(self, t0: float, t1: float, columns: int) -> list[(tuple[float, float] | None)]:
+        result: list[(tuple[float, float] | None)] = []
+        width = (t1 - t0) / columns
+        i0 = bisect_left(self.times, t0)
+        for column in range(columns):
+            i1 = bisect_left(self.times, t0 + (column + 1) * width, i0) if column < columns - 1 else bisect_right(self.times, t1, i0)
+            result.append(self.min_max(i0, i1) if i1 > i0 else None)
+            i0 = i1
+        return result
+
+
+
+# --- PlotCanvas: Draws the decimated series of one quantity
+class PlotCanvas(QWidget):
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.setMinimumHeight(200)
+        self.series: dict[str, SeriesStore] = {}
+        self.colors: dict[str, QColor] = {}
+        self.unit = ""
+        self.window: (float | None) = 60.0
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        margin_left, margin_right, margin_top, margin_bottom = 70, 10, 10, 25
+        plot = QRectF(margin_left, margin_top, self.width() - margin_left - margin_right, self.height() - margin_top - margin_bottom)
+        columns = int(plot.width())
+        painter.setPen(QPen(Qt.gray))
+        painter.drawRect(plot)
+        if (columns < 2) or (not any(len(store) for store in self.series.values())):
+            painter.drawText(plot, Qt.AlignCenter, "No samples yet.")
+            return
+
+        # Time range: the chosen window up to the latest sample
+        t1 = max(store.times[-1] for store in self.series.values() if len(store))
+        t0 = min(store.times[0] for store in self.series.values() if len(store))
+        if self.window is not None:
+            t0 = max(t0, t1 - self.window)
+        if t1 <= t0:
+            t0 = t1 - 1.0
+
+        # Decimate every series, then scale the y axis to what is visible
+        decimated = {name: store.decimate(t0, t1, columns) for name, store in self.series.items()}
+        lows = [column[0] for columns_data in decimated.values() for column in columns_data if column]
+        highs = [column[1] for columns_data in decimated.values() for column in columns_data if column]
+        if not lows:
+            painter.drawText(plot, Qt.AlignCenter, "No samples in this window.")
+            return
+        y0, y1 = min(lows), max(highs)
+        if y1 <= y0:
+            y0, y1 = y0 - 0.5, y1 + 0.5
+        pad = (y1 - y0) * 0.05
+        y0, y1 = y0 - pad, y1 + pad
+
+        def to_y(value: float) -> float:
+            return plot.bottom() - (value - y0) / (y1 - y0) * plot.height()
+
+        # Axis labels
+        painter.drawText(QRectF(0, plot.top() - 5, margin_left - 5, 20), Qt.AlignRight, f"{y1:.4g} {self.unit}")
+        painter.drawText(QRectF(0, plot.bottom() - 15, margin_left - 5, 20), Qt.AlignRight, f"{y0:.4g} {self.unit}")
+        painter.drawText(QRectF(plot.left(), plot.bottom() + 5, plot.width(), 20), Qt.AlignLeft, f"-{t1 - t0:.0f} s")
+        painter.drawText(QRectF(plot.left(), plot.bottom() + 5, plot.width(), 20), Qt.AlignRight, time.strftime("%H:%M:%S", time.localtime(t1)))
+
+        # One vertical min-max line per column, joined to the next column
+        for idx, (name, columns_data) in enumerate(decimated.items()):
+            lines: list[QLineF] = []
+            previous: (tuple[float, float] | None) = None
+            for column, data in enumerate(columns_data):
+                if data is None:
+                    continue
+                x = plot.left() + column
+                low, high = to_y(data[0]), to_y(data[1])
+                lines.append(QLineF(x, low, x, high))
+                if previous:
+                    lines.append(QLineF(previous[0], previous[1], x, (low + high) / 2))
+                previous = (x, (low + high) / 2)
+            painter.setPen(QPen(self.colors[name], 1))
+            painter.drawLines(lines)
+            painter.drawText(QRectF(plot.left() + 5, plot.top() + 5 + 15 * idx, plot.width(), 15), Qt.AlignLeft, name)
+
+
+
+class LivePlot(QWidget):
+
+    def __init__(self, parent = None):
+
+        super().__init__(parent)
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(0, 0, 0, 0)
+
+        # All series, keyed by quantity, then by series name (e.g. "#0 ch1")
+        self.quantities: dict[str, dict[str, SeriesStore]] = {}
+        self.units: dict[str, str] = {}
+        self.colors: dict[str, QColor] = {}
+
+        # Controls: quantity, time window
+        self.controls_layout = QHBoxLayout()
+        self.quantity_select = QComboBox()
+        self.quantity_select.currentTextChanged.connect(self._update_canvas)
+        self.window_select = QComboBox()
+        self.window_select.addItems(list(PLOT_WINDOWS))
+        self.window_select.currentTextChanged.connect(self._update_canvas)
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.clicked.connect(self.clear)
+        self.controls_layout.addWidget(QLabel("Quantity:"))
+        self.controls_layout.addWidget(self.quantity_select, 1)
+        self.controls_layout.addWidget(QLabel("Window:"))
+        self.controls_layout.addWidget(self.window_select)
+        self.controls_layout.addWidget(self.clear_button)
+        self.main_layout.addLayout(self.controls_layout)
+
+        self.canvas = PlotCanvas()
+        self.main_layout.addWidget(self.canvas, 1)
+
+        # Redraw on a timer, and only if something changed
+        self.dirty = False
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setInterval(PLOT_REDRAW_INTERVAL)
+        self.redraw_timer.timeout.connect(self._redraw)
+        self.redraw_timer.start()
+
+
+
+    # Add the value of a "sample" or "measurement" protocol message
+    def add_message(self, message: dict[str, Any]) -> None:
+        try:
+            value = float(message["value"])
+        except (KeyError, TypeError, ValueError):
+            return
+        quantity = str(message.get("quantity", ""))
+        channel = message.get("channel")
+        name = f"{message.get('device', '')}" + (f" ch{channel}" if channel is not None else "")
+        self.add_sample(quantity, str(message.get("unit", "")), name, float(message.get("time", time.time())), value)
+
+    # Add a sample to series `name` of `quantity`
+    def add_sample(self, quantity: str, unit: str, name: str, t: float, value: float) -> None:
+        if quantity not in self.quantities:
+            self.quantities[quantity] = {}
+            self.units[quantity] = unit
+            self.quantity_select.addItem(quantity)
+        series = self.quantities[quantity]
+        if name not in series:
+            series[name] = SeriesStore()
+            key = f"{quantity}/{name}"
+            self.colors[key] = QColor(PLOT_COLORS[(len(series) - 1) % len(PLOT_COLORS)])
+            if quantity == self.quantity_select.currentText():
+                self._update_canvas()
+        series[name].append(t, value)
+        if quantity == self.quantity_select.currentText():
+            self.dirty = True
+
+    # Remove all series
+    def clear(self) -> None:
+        self.quantities.clear()
+        self.units.clear()
+        self.colors.clear()
+        self.quantity_select.clear()
+        self._update_canvas()
+
+
+
+    # Point the canvas at the selected quantity and window
+    def _update_canvas(self) -> None:
+        quantity = self.quantity_select.currentText()
+        self.canvas.series = self.quantities.get(quantity, {})
+        self.canvas.colors = {name: self.colors[f"{quantity}/{name}"] for name in self.canvas.series}
+        self.canvas.unit = self.units.get(quantity, "")
+        self.canvas.window = PLOT_WINDOWS.get(self.window_select.currentText())
+        self.dirty = True
+
+    def _redraw(self) -> None:
+        if self.dirty and self.isVisible():
+            self.dirty = False
+            self.canvas.update()
@@ -0,0 +1,253 @@
+"""
+LogView.py
+This file contains the LogView widget, which shows the log of a running test in
+RunTestGUI. Only the most recent lines are kept on screen (LOG_VIEW_MAX_LINES),
+and new lines are appended in batches on a timer rather than one at a time, so a
+verbose or very long test cannot make the GUI stall or grow without bound.
+
+Every line is also written to a spill file on disk, which holds the full log.
+The level filter and search box scan that file in small steps (so the GUI stays
+responsive) and show the most recent matching lines; the file can be saved with
+the Save Log button.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from PySide6.QtWidgets import  (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog,
+                                QMessageBox, QLabel, QPlainTextEdit, QLineEdit, QComboBox)
+from PySide6.QtCore import QTimer
+
+from collections import deque
+from typing import Callable, Iterator, TextIO
+import os, shutil, tempfile
+
+# Number of lines kept in the view; older lines are dropped from the top
+LOG_VIEW_MAX_LINES = 5000
+
+# Interval (ms) at which pending lines are appended to the view
+LOG_VIEW_FLUSH_INTERVAL = 50
+
+# Number of spill file lines scanned per step when re-filtering
+LOG_VIEW_SCAN_STEP = 20000
+
+# Level filter options, and the levels each one shows
+# Lines without a level prefix (e.g. raw output from device libraries) are always shown
+LOG_VIEW_LEVELS = {
+    "All Levels": None,
+    "INFO and above": {"INFO", "WARNING", "ERROR", "CRITICAL"},
+    "WARNING and above": {"WARNING", "ERROR", "CRITICAL"},
+    "ERROR and above": {"ERROR", "CRITICAL"},
+}
+KNOWN_LEVELS = {"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"}
+
+
+
+# Return the level of a log line ("INFO: ...") or None if it has no level prefix
+def _line_level(line: str) -> (str | None):
+    prefix, sep, _ = line.partition(":")
+    return prefix if (sep and prefix in KNOWN_LEVELS) else None
+
+
+
+class LogView(QWidget):
+
+    def __init__(self, max_lines: int = LOG_VIEW_MAX_LINES, parent = None):
+
+        super().__init__(parent)
+        self.main_layout = QVBoxLayout(self)
+        self.main_layout.setContentsMargins(0, 0, 0, 0)
+        self.max_lines = max_lines
+
+        # Filter bar: level, search, save
+        self.filter_layout = QHBoxLayout()
+        self.level_select = QComboBox()
+        self.level_select.addItems(list(LOG_VIEW_LEVELS))
+        self.level_select.currentIndexChanged.connect(self._refilter)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search full log (Enter)")
+        self.search_edit.returnPressed.connect(self._refilter)
+        self.save_button = QPushButton("Save Log")
+        self.save_button.clicked.connect(self._save_log)
+        self.filter_layout.addWidget(self.level_select)
+        self.filter_layout.addWidget(self.search_edit)
+        self.filter_layout.addWidget(self.save_button)
+        self.main_layout.addLayout(self.filter_layout)
+
+        # Text view, capped at max_lines
+        self.text_view = QPlainTextEdit()
+        self.text_view.setReadOnly(True)
+        self.text_view.setMaximumBlockCount(max_lines)
+        self.main_layout.addWidget(self.text_view)
+
+        # Status line for filter results
+        self.status_label = QLabel("")
+        self.main_layout.addWidget(self.status_label)
+
+        # Lines waiting to be appended/spilled on the next flush
+        self.pending: list[str] = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(LOG_VIEW_FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self._flush)
+
+        # Spill file holding the full log
+        # It is a temp file, removed when the application quits (use Save Log to keep it)
+        self.spill_path: (str | None) = None
+        self.spill_file: (TextIO | None) = None
+        QApplication.instance().aboutToQuit.connect(lambda: self._close_spill(delete=True))
+
+        # State of an in-progress re-filter scan
+        self.scan_lines: (Iterator[str] | None) = None
+        self.scan_file: (TextIO | None) = None
+        self.scan_matches: deque[str] = deque(maxlen=max_lines)
+        self.scan_count = 0
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setInterval(0)
+        self.scan_timer.timeout.connect(self._scan_step)
+
+
+
+    # Queue a line (or several, separated by newlines) for the view
+    def append(self, text: str) -> None:
+        self.pending.extend(text.split("\n"))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    # Clear the view and start a new spill file
+    def clear(self) -> None:
+        self._stop_scan()
+        self.pending.clear()
+        self.flush_timer.stop()
+        self.text_view.clear()
+        self.status_label.setText("")
+        self._close_spill(delete=True)
+
+
+
+    # Append pending lines in one batch and write them to the spill file
+    def _flush(self) -> None:
+        if not self.pending:
+            self.flush_timer.stop()
+            return
+        lines, self.pending = self.pending, []
+
+        self._open_spill()
+        if self.spill_file:
+            self.spill_file.write("\n".join(lines) + "\n")
+            self.spill_file.flush()
+
+        # While a re-filter scan is running, the scan will pick these lines up from the spill file
+        if self.scan_lines is not None:
+            return
+        matches = self._matcher()
+        shown = [line for line in lines if matches(line)]
+        if shown:
+            self.text_view.appendPlainText("\n".join(shown[-self.max_lines:]))
+
+
+
+    # Return a function telling whether a line passes the current level filter and search
+    def _matcher(self) -> Callable[[str], bool]:
+        levels = LOG_VIEW_LEVELS[self.level_select.currentText()]
+        search = self.search_edit.text().strip().lower()
+
+        def matches(line: str) -> bool:
+            if levels is not None:
+                level = _line_level(line)
+                if (level is not None) and (level not in levels):
+                    return False
+            return (not search) or (search in line.lower())
+
+        return matches
+
+    # Rebuild the view from the spill file with the current filter
+    # The file is scanned in steps on a timer, keeping only the last max_lines matches
+    def _refilter(self) -> None:
+        self._stop_scan()
+        self._flush()
+        self.text_view.clear()
+        if not self.spill_path:
+            return
+        try:
+            self.scan_file = open(self.spill_path, "r", encoding="utf-8", errors="replace")
+        except OSError as e:
+            self.status_label.setText(f"Could not read log file: {e}")
+            return
+        self.scan_lines = (line.rstrip("\n") for line in self.scan_file)
+        self.scan_matches.clear()
+        self.scan_count = 0
+        self.status_label.setText("Filtering...")
+        self.scan_timer.start()
+
+    # Scan the next part of the spill file
+    def _scan_step(self) -> None:
+        matches = self._matcher()
+        for _ in range(LOG_VIEW_SCAN_STEP):
+            line = next(self.scan_lines, None)
+            if line is None:
+                break
+            if matches(line):
+                self.scan_matches.append(line)
+                self.scan_count += 1
+        else:
+            return # More to scan on the next step
+
+        # Done: show the matches, then continue appending new lines as usual
+        found, count = list(self.scan_matches), self.scan_count
+        self._stop_scan()
+        if found:
+            self.text_view.appendPlainText("\n".join(found))
+        filtered = (self.level_select.currentIndex() != 0) or self.search_edit.text().strip()
+        if not filtered:
+            self.status_label.setText("")
+        elif count > len(found):
+            self.status_label.setText(f"{count} matching lines; showing the last {len(found)}.")
+        else:
+            self.status_label.setText(f"{count} matching lines.")
+
+    def _stop_scan(self) -> None:
+        self.scan_timer.stop()
+        if self.scan_file:
+            self.scan_file.close()
+        self.scan_file = None
+        self.scan_lines = None
+        self.scan_matches.clear()
+
+
+
+    # Open a new spill file if there is none
+    def _open_spill(self) -> None:
+        if self.spill_file:
+            return
+        try:
+            fd, self.spill_path = tempfile.mkstemp(prefix="cerebellum_log_", suffix=".log")
+            self.spill_file = os.fdopen(fd, "w", encoding="utf-8")
+        except OSError as e:
+            self.spill_path = None
+            self.spill_file = None
+            self.status_label.setText(f"Could not create log file; only the lines on screen are kept: {e}")
+
+    def _close_spill(self, delete: bool) -> None:
+        if self.spill_file:
+            self.spill_file.close()
+        if delete and self.spill_path:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+        self.spill_file = None
+        self.spill_path = None
+
+    # Copy the full log to a file chosen by the user
+    def _save_log(self) -> None:
+        self._flush()
+        if not self.spill_path:
+            QMessageBox.information(self, "Save Log", "The log is empty.")
+            return
+        filepath, _ = QFileDialog.getSaveFileName(self, "Save Log", "", "Log Files (*.log);;All Files (*)")
+        if not filepath:
+            return
+        try:
+            shutil.copyfile(self.spill_path, filepath)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save log:\n{e}")
@@ -15,6 +15,7 @@ if __name__ == "__main__":
 from Cerebellum.GUI.EnvironmentConfigGUI import EnvironmentConfigGUI
 from Cerebellum.GUI.TestConfigGUI import TestConfigGUI
 from Cerebellum.GUI.RunTestGUI import RunTestGUI
+from Cerebellum.GUI.ConfigModel import ConfigModel
 
 from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget
 
@@ -44,17 +45,25 @@ class MainGUI(QMainWindow):
         self.run_test_tab = RunTestGUI(False)
         self.tabs.addTab(self.run_test_tab, "Run Test")
 
+        # Shared configs: the editing tabs mark them dirty, and each tab listens for the parts it depends on
+        self.config_model = ConfigModel(self)
+        self.env_config_tab.changed.connect(self.config_model.mark_env_dirty)
+        self.test_config_tab.changed.connect(self.config_model.mark_test_dirty)
+        self.config_model.devices_changed.connect(self.test_config_tab.set_env)
+        self.config_model.env_changed.connect(self.run_test_tab.set_env)
+        self.config_model.test_changed.connect(self.run_test_tab.set_test)
+
         # Transfer configs between tabs when tab is changed
         self.tabs.currentChanged.connect(self._tab_changed)
 
 
     
-    # When the tab is changed, update all tabs with any changes
+    # When the tab is changed, read back any config that was edited and let the model propagate it
     def _tab_changed(self) -> None:
-        env = self.env_config_tab.get_env()
-        self.test_config_tab.set_env(env)
-        self.run_test_tab.set_env(env)
-        self.run_test_tab.set_test(self.test_config_tab.get_test())
+        if self.config_model.env_dirty:
+            self.config_model.set_env(self.env_config_tab.get_env())
+        if self.config_model.test_dirty:
+            self.config_model.set_test(self.test_config_tab.get_test())
 
 
 
@@ -0,0 +1,157 @@
+"""
+PortDiscovery.py
+This file contains the PortDiscovery service, which keeps a cached list of the
+serial ports on this computer for the "com" fields of device configs. Ports are
+enumerated on a background thread every PORT_SCAN_INTERVAL seconds, and the
+ports_changed signal fires only when a port appears or disappears (hotplug), so
+widgets never enumerate ports on the GUI thread.
+
+On request, probe_ports() opens every port in parallel and asks it for "*IDN?",
+so the port list can show which instrument sits on each port. Probing writes to
+the ports, so it is only ever started by the user.
+
+If pyserial is not installed, the service reports no ports.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from PySide6.QtCore import QObject, Signal
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+import logging, threading
+
+SERIAL_AVAIL = True
+try:
+    import serial, serial.tools.list_ports
+except:
+    SERIAL_AVAIL = False
+
+# Interval (s) between port enumerations
+PORT_SCAN_INTERVAL = 2.0
+
+# Serial settings used when probing a port with *IDN?
+PORT_PROBE_BAUDRATE = 115200
+PORT_PROBE_TIMEOUT = 0.5
+
+
+
+# --- PortInfo: A serial port and what is known about it
+# device = name to open the port with (e.g. /dev/ttyACM0, COM1), description = from the OS,
+# identity = *IDN? response from the last probe ("" if not probed or no response)
+class PortInfo(NamedTuple):
+    device      : str
+    description : str
+    identity    : str
+
+    # Label for menus and tooltips
+    def label(self) -> str:
+        return f"{self.device} - {self.identity or self.description}"
+
+
+
+class PortDiscovery(QObject):
+
+    # Emitted (on the GUI thread) with the new list of PortInfo whenever it changes
+    ports_changed = Signal(list)
+
+    _instance: (PortDiscovery | None) = None
+
+    # Shared instance; the scan thread is started on first use
+    @classmethod
+    def instance(cls) -> PortDiscovery:
+        if cls._instance is None:
+            cls._instance = PortDiscovery()
+            cls._instance.start()
+        return cls._instance
+
+    def __init__(self):
+        super().__init__()
+        self._ports: list[PortInfo] = []
+        self._identities: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._rescan = threading.Event()
+        self._thread: (threading.Thread | None) = None
+        self._probing = False
+
+
+
+    # Start the background scan thread
+    def start(self) -> None:
+        if SERIAL_AVAIL and (self._thread is None):
+            self._thread = threading.Thread(target=self._scan_loop, daemon=True)
+            self._thread.start()
+
+    # The most recently found ports (empty until the first scan completes)
+    def ports(self) -> list[PortInfo]:
+        with self._lock:
+            return list(self._ports)
+
+    # Ask the scan thread to enumerate again now, instead of at its next interval
+    def rescan(self) -> None:
+        self._rescan.set()
+
+    """
+    Probes every known port with *IDN? on a pool of worker threads, without
+    blocking the caller; ports_changed fires with the identities once all probes
+    are done. Does nothing if a probe is already running.
+    """
+    def probe_ports(self) -> None:
+        if not SERIAL_AVAIL:
+            return
+        with self._lock:
+            if self._probing:
+                return
+            self._probing = True
+            devices = [port.device for port in self._ports]
+        threading.Thread(target=self._probe_all, args=(devices,), daemon=True).start()
+
+
+
+    def _scan_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                found = sorted((port.device, port.description or "") for port in serial.tools.list_ports.comports())
+            except Exception as e:
+                logging.warning(f"Failed to enumerate serial ports: {e}")
+                found = []
+            self._update(found)
+            self._rescan.wait(PORT_SCAN_INTERVAL)
+            self._rescan.clear()
+
+    # Replace the port list if the set of ports changed; identities of ports that went away are dropped
+    def _update(self, found: list[tuple[str, str]]) -> None:
+        with self._lock:
+            if [(port.device, port.description) for port in self._ports] == found:
+                return
+            present = {device for device, _ in found}
+            self._identities = {device: identity for device, identity in self._identities.items() if device in present}
+            self._ports = [PortInfo(device, description, self._identities.get(device, "")) for device, description in found]
+            ports = list(self._ports)
+        self.ports_changed.emit(ports)
+
+    def _probe_all(self, devices: list[str]) -> None:
+        try:
+            with ThreadPoolExecutor(max_workers=max(len(devices), 1)) as executor:
+                identities = dict(zip(devices, executor.map(self._probe, devices)))
+            with self._lock:
+                self._identities.update(identities)
+                self._ports = [port._replace(identity=self._identities.get(port.device, "")) for port in self._ports]
+                ports = list(self._ports)
+        finally:
+            with self._lock:
+                self._probing = False
+        self.ports_changed.emit(ports)
+
+    # Return the *IDN? response of the instrument on `device`, or "" if there is none
+    @staticmethod
+    def _probe(device: str) -> str:
+        try:
+            with serial.Serial(port=device, baudrate=PORT_PROBE_BAUDRATE, timeout=PORT_PROBE_TIMEOUT, write_timeout=PORT_PROBE_TIMEOUT) as ser:
+                ser.reset_input_buffer()
+                ser.write(b"*IDN?\n")
+                return ser.readline().decode(errors="replace").strip()
+        except Exception:
+            return ""
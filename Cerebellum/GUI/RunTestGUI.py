@@ -15,14 +15,20 @@ if __name__ == "__main__":
     sys.path.append(f"{ABS_DIR}/../../") # Cerebellum parent directory
 
 from Cerebellum.GUI.Common import capture_warnings
+from Cerebellum.GUI.LogView import LogView
+from Cerebellum.GUI.LivePlot import LivePlot
 from Cerebellum.EnvironmentConfig import EnvironmentConfig
 from Cerebellum.TestConfig import TestConfig
+from Cerebellum.LogSystem import LOG_INDENT
+from Cerebellum.Protocol import MessageDecoder, encode_message
 
 from PySide6.QtWidgets import  (QApplication, QMainWindow,
                                 QWidget, QScrollArea, QGroupBox, QVBoxLayout, QHBoxLayout,
                                 QPushButton, QFileDialog, QMessageBox, QLabel,
-                                QPlainTextEdit, QLineEdit)
+                                QLineEdit, QComboBox, QProgressBar, QTabWidget,
+                                QTableWidget, QTableWidgetItem, QHeaderView)
 from PySide6.QtCore import QProcess
+from typing import Any
 
 
 
@@ -64,10 +70,34 @@ class RunTestGUI(QWidget):
         self.control_buttons_layout.addWidget(self.stop_test_button)
         self.main_layout.addLayout(self.control_buttons_layout)
 
-        # Log box
-        self.log_box_layout = QVBoxLayout()
-        self.log_box = QPlainTextEdit()
-        self.log_box.setReadOnly(True)
+        # Parameter set to run the test with, for tests that declare parameters (see TestConfig.py)
+        self.parameter_set_layout = QHBoxLayout()
+        self.parameter_set_select = QComboBox()
+        self.parameter_set_layout.addWidget(QLabel("Parameter Set:"))
+        self.parameter_set_layout.addWidget(self.parameter_set_select, 1)
+        self.main_layout.addLayout(self.parameter_set_layout)
+        self._update_parameter_sets()
+
+        # Progress bar and status line, updated from the test's protocol messages (see Protocol.py)
+        self.status_label = QLabel("No test running.")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFormat("%v / %m events")
+        self.progress_bar.setValue(0)
+        self.main_layout.addWidget(self.status_label)
+        self.main_layout.addWidget(self.progress_bar)
+
+        # Splits the subprocess output into messages; partial lines are held until complete
+        self.stdout_decoder = MessageDecoder()
+        self.stderr_decoder = MessageDecoder()
+
+        # Tabs for the log, per-event results and measurements
+        self.output_tabs = QTabWidget()
+
+        # Log box - bounded, batched view of the log; the full log is kept on disk (see LogView.py)
+        self.log_box_container = QWidget()
+        self.log_box_layout = QVBoxLayout(self.log_box_container)
+        self.log_box_layout.setContentsMargins(0, 0, 0, 0)
+        self.log_box = LogView()
         self.log_box_layout.addWidget(self.log_box)
         
         # Input field
@@ -75,7 +105,27 @@ class RunTestGUI(QWidget):
         self.input_line.returnPressed.connect(self._send_input)
         self.log_box_layout.addWidget(self.input_line)
 
-        self.main_layout.addLayout(self.log_box_layout)
+        self.output_tabs.addTab(self.log_box_container, "Log")
+
+        # Event results table: one row per event, filled in as events start and finish
+        self.event_table = QTableWidget(0, 4)
+        self.event_table.setHorizontalHeaderLabels(["Event", "Comment", "Status", "Duration (s)"])
+        self.event_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.event_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.output_tabs.addTab(self.event_table, "Events")
+
+        # Measurement table: one row per measurement record
+        self.measurement_table = QTableWidget(0, 7)
+        self.measurement_table.setHorizontalHeaderLabels(["Event", "Device", "Channel", "Quantity", "Value", "Range", "Result"])
+        self.measurement_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.measurement_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.output_tabs.addTab(self.measurement_table, "Measurements")
+
+        # Live plot of monitored values (e.g. from MonitorPSU) and measurements
+        self.live_plot = LivePlot()
+        self.output_tabs.addTab(self.live_plot, "Plot")
+
+        self.main_layout.addWidget(self.output_tabs)
 
 
 
@@ -88,11 +138,23 @@ class RunTestGUI(QWidget):
     # Set the current TestConfig the test will use
     def set_test(self, config: TestConfig) -> None:
         self.test_config = config
+        self._update_parameter_sets()
+
+    # Offer the parameter sets of the current test, keeping the selection if the set still exists
+    def _update_parameter_sets(self) -> None:
+        current = self.parameter_set_select.currentData()
+        self.parameter_set_select.clear()
+        self.parameter_set_select.addItem("Default Parameters", None)
+        for name in (self.test_config.parameter_sets if self.test_config else {}):
+            self.parameter_set_select.addItem(name, name)
+        idx = self.parameter_set_select.findData(current)
+        self.parameter_set_select.setCurrentIndex(max(idx, 0))
+        self.parameter_set_select.setEnabled(self.parameter_set_select.count() > 1)
 
 
 
     # Helper method for adding messages to the log box
-    def _log(self, string: str) -> None: self.log_box.appendPlainText(string)
+    def _log(self, string: str) -> None: self.log_box.append(string)
 
 
 
@@ -110,12 +172,24 @@ class RunTestGUI(QWidget):
             QMessageBox.critical(self, "Error", "A test process is already running. End the process to start another test.")
             return
         
-        # Write configs to temp JSONs
-        self.environment_config.write_json(f"{ABS_DIR}/../temp_env.json")
-        self.test_config.write_json(f"{ABS_DIR}/../temp_test.json")
+        # Encode the configs for the config message, sent to the process on stdin (see Protocol.py)
+        # Nothing is written to disk, so each test process has its own copy and several can run at once
+        try:
+            config_message = encode_message("config", env=self.environment_config.to_dict(wire=True), test=self.test_config.to_message())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not encode the configs for the test process:\n{e}")
+            return
         
-        # Clear log box
+        # Clear log box and results
         self.log_box.clear()
+        self.event_table.setRowCount(0)
+        self.measurement_table.setRowCount(0)
+        self.live_plot.clear()
+        self.progress_bar.setMaximum(max(len(self.test_config.event_list), 1))
+        self.progress_bar.setValue(0)
+        self.status_label.setText("Starting test...")
+        self.stdout_decoder = MessageDecoder()
+        self.stderr_decoder = MessageDecoder()
 
         # Start the test
         self._log("Initiating process.\n")
@@ -123,42 +197,117 @@ class RunTestGUI(QWidget):
         self.process.finished.connect(self._handle_finish)
         self.process.readyReadStandardOutput.connect(self._handle_stdout)
         self.process.readyReadStandardError.connect(self._handle_stderr)
-        self.process.start(self.environment_config.python_path, [f"{ABS_DIR}/../_run_test.py"])
+        arguments = [f"{ABS_DIR}/../_run_test.py", "--protocol", "--stdin-config"]
+        if self.parameter_set_select.currentData():
+            arguments += ["--parameter-set", self.parameter_set_select.currentData()]
+        self.process.start(self.environment_config.python_path, arguments)
+        self.process.write(config_message.encode())
 
 
 
     # Send message on stdin to stop the test
     def _stop_test(self) -> None:
         if self.process:
-            self.process.write(b"STOP\n")
+            self.process.write(encode_message("stop").encode())
 
-    # When a test completes, update the process reference and delete the temp JSONs
+    # When a test completes, update the process reference
     def _handle_finish(self) -> None:
+        if self.process:
+            self._handle_stdout()
+            self._handle_stderr()
+        for message in self.stdout_decoder.flush() + self.stderr_decoder.flush():
+            self._handle_message(message)
         self._log("\nProcess has exited.")
         self.process = None
-        try:
-            os.remove(f"{ABS_DIR}/../temp_env.json")
-            os.remove(f"{ABS_DIR}/../temp_test.json")
-        except:
-            pass
+        self.input_line.setPlaceholderText("")
 
-    # When stdout has a message, send it to the log box
+    # When stdout has data, handle each complete message in it
     def _handle_stdout(self) -> None:
         if self.process:
             data = self.process.readAllStandardOutput()
-            self._log(str(data.data(), "utf-8").strip())
+            for message in self.stdout_decoder.feed(data.data()):
+                self._handle_message(message)
 
-    # When stderr has a message, send it to the log box
+    # When stderr has data, handle each complete line in it (usually plain text, e.g. tracebacks)
     def _handle_stderr(self) -> None:
         if self.process:
             data = self.process.readAllStandardError()
-            self._log(str(data.data(), "utf-8").strip())
+            for message in self.stderr_decoder.feed(data.data()):
+                self._handle_message(message)
+
+    # Update the log, progress bar and result tables from a protocol message (see Protocol.py)
+    def _handle_message(self, message: dict[str, Any]) -> None:
+        msg_type = message.get("type")
+
+        if msg_type == "text":
+            self._log(message.get("text", ""))
+        elif msg_type == "log":
+            self._log(f"{message.get('level', 'INFO')}: {LOG_INDENT * int(message.get('indent', 0))}{message.get('message', '')}")
+        elif msg_type == "run_start":
+            self.progress_bar.setMaximum(max(int(message.get("events", 0)), 1))
+            self.progress_bar.setValue(0)
+        elif msg_type == "phase":
+            self.status_label.setText(f"Phase: {message.get('name', '')}")
+            if "events" in message: # Number of events after macros are expanded
+                self.progress_bar.setMaximum(max(int(message["events"]), 1))
+        elif msg_type == "event_start":
+            index = int(message.get("index", 0))
+            self._set_event_row(index, message.get("name", ""), message.get("comment", ""), "Running", "")
+            self.status_label.setText(f"Running event #{index} ({message.get('name', '')})")
+        elif msg_type == "event_end":
+            index = int(message.get("index", 0))
+            status = "OK" if message.get("ok") else f"ERROR: {message.get('error', '')}"
+            self._set_event_row(index, None, None, status, f"{float(message.get('duration', 0.0)):.3f}")
+            self.progress_bar.setValue(index + 1)
+        elif msg_type == "measurement":
+            self._add_measurement_row(message)
+            self.live_plot.add_message(message)
+        elif msg_type == "sample":
+            self.live_plot.add_message(message)
+        elif msg_type == "prompt":
+            self._log(message.get("text", ""))
+            self.input_line.setPlaceholderText(message.get("text", ""))
+            self.output_tabs.setCurrentWidget(self.log_box_container)
+            self.input_line.setFocus()
+        elif msg_type == "error":
+            self._log(f"ERROR: {message.get('message', '')}")
+        elif msg_type == "run_end":
+            result = "completed" if message.get("ok") else "aborted"
+            self.status_label.setText(f"Test {result} in {float(message.get('duration', 0.0)):.1f} s.")
+
+    # Fill in the row of the event table for event `index`, adding rows as needed; None leaves a cell as is
+    def _set_event_row(self, index: int, name: (str | None), comment: (str | None), status: str, duration: str) -> None:
+        if self.event_table.rowCount() <= index:
+            self.event_table.setRowCount(index + 1)
+        cells = [f"#{index} {name}" if name is not None else None, comment, status, duration]
+        for column, text in enumerate(cells):
+            if text is not None:
+                self.event_table.setItem(index, column, QTableWidgetItem(text))
+        self.event_table.scrollToItem(self.event_table.item(index, 2))
+
+    # Append a row to the measurement table
+    def _add_measurement_row(self, message: dict[str, Any]) -> None:
+        unit = message.get("unit", "")
+        channel = message.get("channel")
+        row = self.measurement_table.rowCount()
+        self.measurement_table.insertRow(row)
+        cells = [f"#{message.get('event')}",
+                 str(message.get("device", "")),
+                 "" if channel is None else str(channel),
+                 str(message.get("quantity", "")),
+                 f"{message.get('value')} {unit}",
+                 f"[{message.get('low')}, {message.get('high')}] {unit}",
+                 "PASS" if message.get("passed") else "FAIL"]
+        for column, text in enumerate(cells):
+            self.measurement_table.setItem(row, column, QTableWidgetItem(text))
+        self.measurement_table.scrollToBottom()
 
     # Send an input from the input box to the process
     def _send_input(self) -> None:
         if self.process:
-            data = (self.input_line.text() + "\n").encode()
+            data = encode_message("input", text=self.input_line.text()).encode()
             self.input_line.clear()
+            self.input_line.setPlaceholderText("")
             self.process.write(data)
 
 
@@ -194,7 +343,7 @@ class RunTestGUI(QWidget):
     # Open an existing JSON containing a TestConfig and set it as the current config
     # Only used when running standalone
     def _load_test_json(self) -> None:
-        filepath, _ = QFileDialog.getOpenFileName(self, "Open Test Config JSON", "", "JSON Files (*.json)")
+        filepath, _ = QFileDialog.getOpenFileName(self, "Open Test Config JSON", "", "Test Config Files (*.json *.jsonl)")
         if not filepath:
             return
 
@@ -203,7 +352,7 @@ class RunTestGUI(QWidget):
             with capture_warnings() as warnings:
 
                 config = TestConfig()
-                config.read_json(filepath)
+                config.read_json(filepath, lazy=True)
                 self.set_test(config)
                 
             if warnings:
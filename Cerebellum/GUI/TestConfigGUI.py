@@ -15,25 +15,29 @@ ABS_DIR = os.path.dirname(os.path.abspath(__file__))
 if __name__ == "__main__":
     sys.path.append(f"{ABS_DIR}/../../") # Cerebellum parent directory
 
-from Cerebellum.Common import EVENTS
+from Cerebellum.Common import EVENTS, get_schema
 from Cerebellum.EnvironmentConfig import EnvironmentConfig
-from Cerebellum.TestConfig import TestConfig
+from Cerebellum.TestConfig import TestConfig, LazyEventList, is_jsonl
 from Cerebellum.Event import Event
 from Cerebellum.Device.Device import DeviceConfig
-from Cerebellum.GUI.Common import capture_warnings
+from Cerebellum.GUI.Common import capture_warnings, connect_edit_changed, start_file_task, show_file_result, FileTask
 
 from PySide6.QtWidgets import  (QApplication, QMainWindow,
                                 QWidget, QScrollArea, QGroupBox, QVBoxLayout, QHBoxLayout,
                                 QPushButton, QFileDialog, QMessageBox, QLabel,
-                                QComboBox, QCheckBox, QSpinBox, QDoubleSpinBox, QLineEdit)
-from PySide6.QtCore import Qt
+                                QComboBox, QCheckBox, QSpinBox, QDoubleSpinBox, QLineEdit, QListView, QPlainTextEdit)
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, Signal
 
 from typing import Any
+import json
 
 
 
 class EventWidget(QGroupBox):
 
+    # Emitted whenever the event class or any field is edited
+    changed = Signal()
+
     def __init__(self, event: (Event | None) = None, device_config_list: (list[DeviceConfig] | None) = None, parent = None):
 
         super().__init__("Event", parent)
@@ -73,6 +77,7 @@ class EventWidget(QGroupBox):
         # Also re-run this update any time the event selection changes
         self._update_event_select()
         self.event_class_edit.currentTextChanged.connect(self._update_event_select)
+        self.event_class_edit.currentTextChanged.connect(self.changed)
 
         # Populate with data if provided
         # Type conversions should only be necessary for QComboBox
@@ -102,7 +107,7 @@ class EventWidget(QGroupBox):
         # First, retrieve an Event instance from the current selected event class
         event_class_name = self.event_class_edit.currentText()
         constructor = EVENTS[event_class_name]
-        blank_event = constructor()
+        field_types = {field.name: field.type for field in get_schema(constructor)}
 
         # Make a dict for the config based on the current values from edits
         config_dict: dict[str, Any] = {}
@@ -124,9 +129,8 @@ class EventWidget(QGroupBox):
             else:
                 field_value = 0
             
-            # Convert the field value according to the type in the blank_event
-            field_type = type(getattr(blank_event, field_name))
-            config_dict[field_name] = field_type(field_value)
+            # Convert the field value according to the type of the field's default
+            config_dict[field_name] = field_types[field_name](field_value)
         
         # Return an Event corresponding to the selected class, populated
         # with the data extracted from the edits
@@ -181,7 +185,6 @@ class EventWidget(QGroupBox):
         # First, retrieve an Event instance from the current selected event class
         event_class_name = self.event_class_edit.currentText()
         constructor = EVENTS[event_class_name]
-        blank_event = constructor()
 
         # Delete the widgets (label + edit) of the current fields
         for field_widget in self.field_widgets:
@@ -196,15 +199,17 @@ class EventWidget(QGroupBox):
         self.field_widgets.clear()
         
         # Replace them with new fields/widgets corresponding to instance attributes
-        for field_name, field_value in vars(blank_event).items():
+        # The fields, titles and options come from the class's cached schema (see Common.py)
+        for field in get_schema(constructor):
+            field_name, field_value = field.name, field.default
             # First check if the field has a corresponding _options class attribute
             # If so, construct the field_edit as a ComboBox, and set the options as such
             # Otherwise, construct according to the field's type (e.g. LineEdit, SpinBox, etc.)
             # Also set the current text/value to the default text/value
-            if (field_name + "_options") in dir(blank_event.__class__):
+            if field.options is not None:
                 field_edit = QComboBox()
                 field_edit.setEditable(False)
-                items = [str(item) for item in getattr(blank_event, field_name + "_options")]
+                items = list(field.options)
                 field_edit.addItems(items)
                 field_edit.setMinimumContentsLength(len(max(items, key=len)) + 3)
                 field_edit.setCurrentText(str(field_value))
@@ -236,13 +241,12 @@ class EventWidget(QGroupBox):
             # Ignore wheelEvents so that scrolling will only ever scroll the list of configs
             field_edit.wheelEvent = (lambda event: event.ignore())
 
+            # Report edits, so the test is only read back when it has changed
+            connect_edit_changed(field_edit, self.changed)
+
             # Update the layout with the new field
-            # If the field has a corresponding _title class attribute, use that as the label
-            # Otherwise, just use the field name
-            if (field_name + "_title") in dir(blank_event.__class__):
-                self._add_field(getattr(blank_event, field_name + "_title"), field_edit)
-            else:
-                self._add_field(field_name, field_edit)
+            # The schema's title is the field's _title class attribute if it has one, otherwise the field name
+            self._add_field(field.title, field_edit)
 
             # Update the dict of field edits
             self.field_edits[field_name] = field_edit
@@ -256,19 +260,84 @@ class EventWidget(QGroupBox):
 
 
 
+# --- EventListModel: List model backed directly by the events of a TestConfig
+# Rows are only rendered as text when the view asks for them, so loading a large test costs O(events), not O(widgets)
+# For a lazily opened JSON-lines test, `events` is a LazyEventList, so only the visible rows are ever read from disk
+class EventListModel(QAbstractListModel):
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.events: list[Event] = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.events)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if (not index.isValid()) or (role != Qt.ItemDataRole.DisplayRole):
+            return None
+        try:
+            event = self.events[index.row()]
+        except Exception as e:
+            return f"#{index.row()}  <unreadable: {e}>"
+        text = f"#{index.row()}  {event.__class__.__name__}"
+        if event.comment:
+            text += f": {event.comment}"
+        return text
+
+    # Replace all events
+    def set_events(self, events: list[Event]) -> None:
+        self.beginResetModel()
+        self.events = events
+        self.endResetModel()
+
+    # Add events to the end, e.g. as they arrive from a load in progress
+    def append_events(self, events: list[Event]) -> None:
+        if events:
+            self.beginInsertRows(QModelIndex(), len(self.events), len(self.events) + len(events) - 1)
+            self.events.extend(events)
+            self.endInsertRows()
+
+    def insert_event(self, row: int, event: Event) -> None:
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.events.insert(row, event)
+        self.endInsertRows()
+        self._renumber(row + 1)
+
+    def remove_event(self, row: int) -> None:
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.events[row]
+        self.endRemoveRows()
+        self._renumber(row)
+
+    def replace_event(self, row: int, event: Event) -> None:
+        self.events[row] = event
+        self.dataChanged.emit(self.index(row), self.index(row))
+
+    # Row labels include the event index, so rows after an insert/remove need repainting
+    def _renumber(self, first_row: int) -> None:
+        if first_row < len(self.events):
+            self.dataChanged.emit(self.index(first_row), self.index(len(self.events) - 1))
+
+
+
 class TestConfigGUI(QWidget):
 
+    # Emitted whenever the event list or the event being edited changes
+    changed = Signal()
+
     def __init__(self, standalone: bool):
 
         super().__init__()
         self.main_layout = QVBoxLayout(self)
 
+        # Current device list, for device_idx fields
+        self.device_config_list: (list[DeviceConfig] | None) = None
+
         # Load EnvironmentConfig button
         # This is a stopgap used when running TestConfigGUI on its own
         # When run as part of MainGUI, simply retrieve the current environment
         # from the environment tab
         if standalone:
-            self.device_config_list: (list[DeviceConfig] | None) = None
             self.env_layout = QHBoxLayout()
             self.load_env_button = QPushButton("Load EnvironmentConfig JSON")
             self.load_env_button.clicked.connect(self._load_env_json)
@@ -286,46 +355,97 @@ class TestConfigGUI(QWidget):
         self.file_buttons_layout.addWidget(self.save_button)
         self.main_layout.addLayout(self.file_buttons_layout)
 
-        # Event scrollable list area
-        self.event_scroll_area = QScrollArea()
-        self.event_scroll_area.setWidgetResizable(True)
-        self.event_container = QWidget()
-        self.event_layout = QVBoxLayout(self.event_container)
-        self.event_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.event_scroll_area.setWidget(self.event_container)
+        # Event list: a view over the event model; only visible rows are ever drawn
+        self.event_model = EventListModel(self)
+        self.event_view = QListView()
+        self.event_view.setModel(self.event_model)
+        self.event_view.setUniformItemSizes(True)
+        self.event_view.setSelectionMode(QListView.SelectionMode.SingleSelection)
+        self.event_view.selectionModel().currentRowChanged.connect(self._current_row_changed)
+        for signal in (self.event_model.modelReset, self.event_model.rowsInserted, self.event_model.rowsRemoved, self.event_model.dataChanged):
+            signal.connect(self.changed)
         self.main_layout.addWidget(QLabel("Events:"))
-        self.main_layout.addWidget(self.event_scroll_area)
+        self.main_layout.addWidget(self.event_view, 1)
 
-        # "Add Event" button
+        # "Add Event" button - inserts after the selected event
         self.add_event_button = QPushButton("Add Event")
-        self.add_event_button.clicked.connect(self._add_event_widget)
+        self.add_event_button.clicked.connect(self._add_event)
         self.main_layout.addWidget(self.add_event_button)
 
-        # Store all event widgets in a list that can be cleared
-        self.event_widgets: list[EventWidget] = []
+        # Editor for the selected event
+        # A single EventWidget is built for whichever row is selected; its values are written back
+        # to the model when another row is selected, or when the test is read with get_test()
+        self.editor_scroll_area = QScrollArea()
+        self.editor_scroll_area.setWidgetResizable(True)
+        self.main_layout.addWidget(self.editor_scroll_area, 1)
+        self.editor: (EventWidget | None) = None
+        self.editor_row: int = -1
+        self.editor_dirty: bool = False # Whether the editor was changed since it was opened or last committed
+
+        # Test parameters and parameter sets, edited as JSON: {"parameters": {...}, "parameter_sets": {...}}
+        # Macros are only listed; they are edited in the test file
+        self.template_group = QGroupBox("Test Parameters")
+        self.template_layout = QVBoxLayout(self.template_group)
+        self.parameters_edit = QPlainTextEdit()
+        self.parameters_edit.setMaximumHeight(120)
+        self.parameters_edit.textChanged.connect(self.changed)
+        self.macros_label = QLabel()
+        self.macros_label.setWordWrap(True)
+        self.template_layout.addWidget(self.parameters_edit)
+        self.template_layout.addWidget(self.macros_label)
+        self.main_layout.addWidget(self.template_group)
+        self.macros: dict[str, list[Event]] = {}
+        self._set_template(TestConfig())
 
 
 
     # Set the GUI to match the given TestConfig
     def set_test(self, config: TestConfig) -> None:
-
-        # Clear current UI
-        for widget in self.event_widgets:
-            self._remove_event_widget(widget, False)
-        self.event_widgets.clear()
-
-        # Populate UI
-        for event in config.event_list:
-            self._add_event_widget(event)
+        self._close_editor(commit=False)
+        self.event_model.set_events(config.event_list.copy())
+        self._set_template(config)
 
 
 
     # Convert the current config into a TestConfig object
     def get_test(self) -> TestConfig:
+        self._commit_editor()
         config = TestConfig()
-        for widget in self.event_widgets:
-            config.event_list.append(widget.get_event())
+        config.event_list = self.event_model.events.copy()
+        self._get_template(config)
         return config
+
+
+
+    # Show the parameters, parameter sets and macros of a TestConfig
+    def _set_template(self, config: TestConfig) -> None:
+        self.template = {"parameters": config.parameters, "parameter_sets": config.parameter_sets}
+        self.macros = config.macros
+        self.parameters_edit.setPlainText(json.dumps(self.template, indent=4))
+        listing = ", ".join(f"{name} ({len(events)} events)" for name, events in self.macros.items())
+        self.macros_label.setText(f"Macros: {listing or 'none'}")
+
+    # Copy the edited parameters into `config`
+    # If the JSON is invalid, a warning is shown and the last valid parameters are kept
+    def _get_template(self, config: TestConfig) -> None:
+        try:
+            template = json.loads(self.parameters_edit.toPlainText() or "{}")
+            if not isinstance(template, dict):
+                raise ValueError("Expected an object with \"parameters\" and \"parameter_sets\".")
+            parameters = template.get("parameters", {})
+            parameter_sets = template.get("parameter_sets", {})
+            if not (isinstance(parameters, dict) and isinstance(parameter_sets, dict) and all(isinstance(values, dict) for values in parameter_sets.values())):
+                raise ValueError("parameters must be an object, and parameter_sets an object of objects.")
+            for set_name, values in parameter_sets.items():
+                unknown = [name for name in values if name not in parameters]
+                if unknown:
+                    raise ValueError(f"Parameter set {set_name} sets undeclared parameter(s): {', '.join(unknown)}")
+            self.template = {"parameters": parameters, "parameter_sets": parameter_sets}
+        except ValueError as e:
+            QMessageBox.warning(self, "Warning", f"Invalid test parameters, keeping the previous ones:\n{e}")
+        config.parameters = dict(self.template["parameters"])
+        config.parameter_sets = {name: dict(values) for name, values in self.template["parameter_sets"].items()}
+        config.macros = self.macros
     
 
 
@@ -336,70 +456,151 @@ class TestConfigGUI(QWidget):
 
 
 
-    # Helper method for updating device_idx on all events
+    # Helper method for updating device_idx on the open editor
     def _update_devices(self) -> None:
-        for w in self.event_widgets:
-            w.set_device_list(self.device_config_list)
-            w.update_devices()
+        if self.editor:
+            self.editor.set_device_list(self.device_config_list)
+            self.editor.update_devices()
 
 
 
-    # Helper method for adding event widgets to the list of events
-    def _add_event_widget(self, event: (Event | None) = None) -> None:
-        widget = EventWidget(event, self.device_config_list)
-        self.event_layout.addWidget(widget)
-        self.event_widgets.append(widget)
-        widget.remove_button.clicked.connect(lambda: self._remove_event_widget(widget, True))
+    # Add a new event after the selected one (or at the end), and select it
+    def _add_event(self) -> None:
+        self._commit_editor()
+        current = self.event_view.currentIndex()
+        row = current.row() + 1 if current.isValid() else len(self.event_model.events)
+        self.event_model.insert_event(row, EVENTS[next(iter(EVENTS))]())
+        self.event_view.setCurrentIndex(self.event_model.index(row))
 
 
 
-    # Helper method for removing event widgets from the list of events
-    def _remove_event_widget(self, widget: EventWidget, update: bool) -> None:
-        self.event_layout.removeWidget(widget)
-        widget.deleteLater()
-        if update:
-            self.event_widgets.remove(widget)
+    # Remove the event being edited
+    def _remove_event(self) -> None:
+        row = self.editor_row
+        if row < 0:
+            return
+        self._close_editor(commit=False)
+        self.event_model.remove_event(row)
+        if self.event_model.events:
+            self.event_view.setCurrentIndex(self.event_model.index(min(row, len(self.event_model.events) - 1)))
+
+
+
+    # When the selection moves, save the old row's editor and open one for the new row
+    def _current_row_changed(self, current: QModelIndex, previous: QModelIndex) -> None:
+        self._close_editor(commit=True)
+        if current.isValid():
+            self._open_editor(current.row())
+
+    def _open_editor(self, row: int) -> None:
+        try:
+            event = self.event_model.events[row]
+        except Exception as e:
+            QMessageBox.warning(self, "Warning", f"Could not read event #{row}:\n{e}")
+            return
+        self.editor = EventWidget(event, self.device_config_list)
+        self.editor.setTitle(f"Event #{row}")
+        self.editor.remove_button.clicked.connect(self._remove_event)
+        self.editor.changed.connect(self.changed)
+        self.editor.changed.connect(self._mark_editor_dirty)
+        self.editor_row = row
+        self.editor_dirty = False
+        self.editor_scroll_area.setWidget(self.editor)
+
+    def _mark_editor_dirty(self) -> None:
+        self.editor_dirty = True
+
+    # Write the editor's values back to the model, if they were changed
+    # Unchanged events are left alone, so e.g. a lazily opened test stays unmodified (see LazyEventList)
+    def _commit_editor(self) -> None:
+        if self.editor and self.editor_dirty and (0 <= self.editor_row < len(self.event_model.events)):
+            try:
+                self.event_model.replace_event(self.editor_row, self.editor.get_event())
+                self.editor_dirty = False
+            except Exception as e:
+                QMessageBox.warning(self, "Warning", f"Could not apply changes to event #{self.editor_row}:\n{e}")
+
+    def _close_editor(self, commit: bool) -> None:
+        if commit:
+            self._commit_editor()
+        if self.editor:
+            self.editor_scroll_area.takeWidget()
+            self.editor.deleteLater()
+        self.editor = None
+        self.editor_row = -1
+        self.editor_dirty = False
 
 
 
     # Open an existing JSON containing a TestConfig and load it into the GUI
+    # The file is read on a worker thread; events appear in the list in batches as they are constructed
+    # JSON-lines files are only indexed, and their events are read from disk as they are viewed
     def _load_json(self) -> None:
-        filepath, _ = QFileDialog.getOpenFileName(self, "Open Test Config JSON", "", "JSON Files (*.json)")
+        filepath, _ = QFileDialog.getOpenFileName(self, "Open Test Config JSON", "", "Test Config Files (*.json *.jsonl)")
         if not filepath:
             return
 
-        try:
+        # Keep the current test, to restore it if the load fails or is cancelled
+        previous = self.get_test()
+        self._close_editor(commit=False)
+        self.event_model.set_events([])
+        self.setEnabled(False)
 
-            with capture_warnings() as warnings:
+        def work(task: FileTask) -> TestConfig:
+            config = TestConfig()
+            sent = 0
+            def progress(done: int, total: int) -> None:
+                nonlocal sent
+                if task.report(done, total):
+                    task.deliver(config.event_list[sent:])
+                    sent = len(config.event_list)
+            config.read_json(filepath, progress, lazy=True)
+            return config
 
-                config = TestConfig()
-                config.read_json(filepath)
-                self.set_test(config)
+        def finished(config: (TestConfig | None), error: (Exception | None), warnings: list[str]) -> None:
+            self.setEnabled(True)
+            self.set_test(config if error is None else previous)
+            show_file_result(self, "load", error, warnings)
 
-            if warnings:
-                string = "Warnings encountered while loading configuration file:"
-                for warning in warnings:
-                    string += f"\n{warning}"
-                QMessageBox.warning(self, "Warning", string)
-            else:
-                QMessageBox.information(self, "Success", f"Successfully loaded configuration file.")
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to load configuration file:\n{e}")
+        start_file_task(self, "Loading test config...", work, finished, self.event_model.append_events)
 
 
 
-    # Save the current config into a JSON file
+    # Save the current config into a JSON file, on a worker thread
     def _save_json(self) -> None:
-        filepath, _ = QFileDialog.getSaveFileName(self, "Save Test Config JSON", "", "JSON Files (*.json)")
+        filepath, _ = QFileDialog.getSaveFileName(self, "Save Test Config JSON", "", "JSON Files (*.json);;JSON Lines Files (*.jsonl)")
         if not filepath:
             return
 
-        try:
-            self.get_test().write_json(filepath)
-            QMessageBox.information(self, "Success", f"Successfully saved configuration file.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save configuration file:\n{e}")
+        # A lazily opened test reads its events from its file, so that file can only be overwritten in the same format
+        # Once it is, the events are re-indexed from the new file
+        events = self.event_model.events
+        reopen = isinstance(events, LazyEventList) and (os.path.abspath(events.filepath) == os.path.abspath(filepath))
+        if reopen and not is_jsonl(filepath):
+            QMessageBox.critical(self, "Error", "The open JSON-lines file can only be overwritten as JSON-lines. Choose another file name.")
+            return
+
+        config = self.get_test()
+        self.setEnabled(False)
+
+        def work(task: FileTask) -> (LazyEventList | None):
+            config.write_json(filepath, task.report)
+            return LazyEventList.open(filepath)[1] if reopen else None
+
+        def finished(reopened: (LazyEventList | None), error: (Exception | None), warnings: list[str]) -> None:
+            self.setEnabled(True)
+            if reopened is not None:
+                row = self.editor_row
+                self._close_editor(commit=False)
+                self.event_model.set_events(reopened)
+                if 0 <= row < len(reopened):
+                    self.event_view.setCurrentIndex(self.event_model.index(row))
+
+                # Other tabs may hold copies of the old list; have them read the re-opened one
+                self.changed.emit()
+            show_file_result(self, "save", error, warnings)
+
+        start_file_task(self, "Saving test config...", work, finished)
 
 
     
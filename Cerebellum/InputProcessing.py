@@ -1,27 +1,77 @@
 """
 InputProcessing.py
-This file implements a filter on stdin for the test subprocess. If the message
-"STOP" is received on stdin (sent by the Stop Test button in RunTestGUI), the
+This file implements a filter on stdin for the test subprocess. If a "stop"
+message is received on stdin (sent by the Stop Test button in RunTestGUI), the
 stop_event flag is set, which will abort the test before the next event runs.
+The abort_event flag is set along with it, and also by any device reporting a
+fault (e.g. a tripped PSU channel); long-running events wait on abort_event
+instead of sleeping, so they end as soon as either happens.
 Any other message is placed on a FIFO queue for the program to receive as usual,
 using get_input() to access the queue in place of input().
+Messages may be protocol messages (see Protocol.py) or plain lines; a plain
+"STOP" line is treated as a stop message.
+
+The listener thread is started by start_listener() when a test starts. Before
+that, read_message() reads stdin directly, e.g. for the config message that
+RunTestGUI sends ahead of everything else.
 """
 
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from Cerebellum.LogSystem import flush_logs
+from Cerebellum.Protocol import decode_line, emit, protocol_enabled
+
+from typing import Any
 import sys, threading, queue
 
 # Threading event to listen for STOP on stdin
+# Threading event to end long-running events early, on STOP or on a device fault
 # Queue to send other messages to input
 stop_event = threading.Event()
+abort_event = threading.Event()
 input_queue = queue.Queue()
 
+# Listener thread, once started
+_listener: (threading.Thread | None) = None
+_listener_lock = threading.Lock()
+
+# Start the thread listening for STOP on stdin, if it isn't running yet
+def start_listener() -> None:
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=stdin_listener, daemon=True)
+            _listener.start()
+
+# Read the next message from stdin; None at the end of stdin
+# Only for use before start_listener(), which takes over stdin
+def read_message() -> (dict[str, Any] | None):
+    line = sys.stdin.readline()
+    if not line:
+        return None
+    return decode_line(line.rstrip("\r\n"))
+
 def stdin_listener():
     for line in sys.stdin:
-        line = line.strip()
-        if line == "STOP":
+        message = decode_line(line.rstrip("\r\n"))
+        if message["type"] == "stop":
             stop_event.set()
-        else:
-            input_queue.put(line)
+            abort_event.set()
+        elif message["type"] == "input":
+            input_queue.put(str(message.get("text", "")).strip())
+        elif message["type"] == "text":
+            line = message["text"].strip()
+            if line == "STOP":
+                stop_event.set()
+                abort_event.set()
+            else:
+                input_queue.put(line)
 
 def get_input(prompt=""):
-    print(prompt, end="", flush=True)
+    if protocol_enabled():
+        emit("prompt", text=prompt)
+    else:
+        flush_logs() # Let any pending log messages print before the prompt
+        print(prompt, end="", flush=True)
     return input_queue.get()
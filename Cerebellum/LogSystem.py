@@ -0,0 +1,272 @@
+"""
+LogSystem.py
+This file implements Cerebellum's logging pipeline. Every logging call only
+stamps the record with the current log context and places it on a queue; a
+background listener thread formats the record and hands it to each sink. This
+keeps formatting and I/O (file writes, compression, pipes to the GUI) out of the
+event loop.
+
+The log context (indentation level, event index, device) is held in contextvars,
+so nested sections indent their messages without reconfiguring any handlers:
+
+    with log_context(event=3):
+        logging.info("...")     # "INFO:     ..." - tagged with event 3
+
+Sinks are ordinary logging.Handlers, added and removed at any time with
+add_sink()/remove_sink(). Three are provided: a console sink, a size-rotated file
+sink that gzips old files, and a JSON-lines sink for machine consumers.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from json import dumps
+from typing import Any, IO, Iterator
+import atexit, copy, gzip, logging, logging.handlers, os, queue, shutil, sys, threading
+
+# Format of human-readable log lines; %(indent)s is filled in from the log context
+LOG_FORMAT = "%(levelname)s: %(indent)s%(message)s"
+LOG_INDENT = "    "
+
+# Default rotation settings for file sinks
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+
+# Current log context; copied into every record by the ContextFilter
+_indent_var: ContextVar[int] = ContextVar("log_indent", default=0)
+_event_var: ContextVar[(int | None)] = ContextVar("log_event", default=None)
+_device_var: ContextVar[(str | None)] = ContextVar("log_device", default=None)
+
+# Pipeline state, created by setup_logging()
+_queue: (queue.Queue | None) = None
+_queue_handler: (logging.handlers.QueueHandler | None) = None
+_listener: (logging.handlers.QueueListener | None) = None
+_dispatcher: (_SinkDispatcher | None) = None
+_setup_lock = threading.Lock()
+
+
+
+"""
+Filters, Formatters and Sinks ==================================================
+"""
+
+# --- ContextFilter: Stamp each record with the log context of the thread that logged it
+# Runs in the calling thread (on the QueueHandler), since contextvars are not visible to the listener
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.indent = LOG_INDENT * _indent_var.get()
+        record.event_idx = _event_var.get()
+        record.device = _device_var.get()
+        return True
+
+
+
+# --- JSONLinesFormatter: Format each record as a single-line JSON object
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "indent": len(getattr(record, "indent", "")) // len(LOG_INDENT),
+            "event": getattr(record, "event_idx", None),
+            "device": getattr(record, "device", None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return dumps(entry)
+
+
+
+# --- _QueueHandler: QueueHandler that keeps the traceback of a record separate from its message
+# The default prepare() formats the traceback into the message and drops it, so every sink would get
+# it as part of the message; here it is kept as exc_text, which each sink's formatter adds in its own way
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+
+# --- CompressedRotatingFileHandler: Size-rotated log file that gzips each rotated file
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    def __init__(self, filename: str, max_bytes: int = LOG_FILE_MAX_BYTES, backup_count: int = LOG_FILE_BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
+
+# --- _SinkDispatcher: The listener's only handler; forwards each record to the current sinks
+# QueueListener's handler list is fixed on construction, so sinks are kept here instead
+class _SinkDispatcher(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.sinks: list[logging.Handler] = []
+        self.sinks_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        with self.sinks_lock:
+            sinks = list(self.sinks)
+        for sink in sinks:
+            if record.levelno >= sink.level:
+                sink.handle(record)
+
+
+
+# Human-readable sink on stderr (the default)
+def console_sink(stream: (IO[str] | None) = None) -> logging.Handler:
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+# Human-readable sink to `filepath`, rotated every `max_bytes`, keeping `backup_count` gzipped old files
+def file_sink(filepath: str, max_bytes: int = LOG_FILE_MAX_BYTES, backup_count: int = LOG_FILE_BACKUP_COUNT) -> logging.Handler:
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = CompressedRotatingFileHandler(filepath, max_bytes, backup_count)
+    handler.setFormatter(logging.Formatter(f"%(asctime)s {LOG_FORMAT}"))
+    return handler
+
+# Machine-readable sink: one JSON object per record on `stream`
+def json_sink(stream: IO[str]) -> logging.Handler:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONLinesFormatter())
+    return handler
+
+
+
+"""
+Setup + Context ================================================================
+"""
+
+"""
+Installs the logging pipeline on the root logger: a QueueHandler in front, and a
+listener thread that feeds the sinks. With no `sinks` given, logs go to the
+console only. Calling this again replaces the sinks and level, but keeps the
+pipeline running.
+"""
+def setup_logging(level: int = logging.INFO, sinks: (list[logging.Handler] | None) = None) -> None:
+    global _queue, _queue_handler, _listener, _dispatcher
+
+    with _setup_lock:
+        if _listener is None:
+            _queue = queue.Queue()
+            _queue_handler = _QueueHandler(_queue)
+            _queue_handler.addFilter(ContextFilter())
+            _dispatcher = _SinkDispatcher()
+            _listener = logging.handlers.QueueListener(_queue, _dispatcher)
+            _listener.start()
+            atexit.register(shutdown_logging)
+
+        # Replace any handlers installed by other means (e.g. logging.basicConfig)
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if handler is not _queue_handler:
+                root.removeHandler(handler)
+        if _queue_handler not in root.handlers:
+            root.addHandler(_queue_handler)
+        root.setLevel(level)
+
+        with _dispatcher.sinks_lock:
+            old_sinks = _dispatcher.sinks
+            _dispatcher.sinks = list(sinks) if sinks is not None else [console_sink()]
+        for sink in old_sinks:
+            if sink not in _dispatcher.sinks:
+                sink.close()
+
+"""
+Adds `sink` to the running pipeline.
+"""
+def add_sink(sink: logging.Handler) -> None:
+    if _dispatcher is None:
+        setup_logging()
+    with _dispatcher.sinks_lock:
+        _dispatcher.sinks.append(sink)
+
+"""
+Removes `sink` from the running pipeline once all records queued before this call
+have reached it, then closes it.
+"""
+def remove_sink(sink: logging.Handler) -> None:
+    if _dispatcher is None:
+        return
+    flush_logs()
+    with _dispatcher.sinks_lock:
+        if sink in _dispatcher.sinks:
+            _dispatcher.sinks.remove(sink)
+    sink.close()
+
+"""
+Blocks until every record logged so far has been handed to the sinks. Use before
+writing to the terminal directly (e.g. an input prompt), so the output stays in order.
+"""
+def flush_logs() -> None:
+    if (_queue is None) or (_listener is None) or (threading.current_thread() is getattr(_listener, "_thread", None)):
+        return
+    _queue.join()
+    with _dispatcher.sinks_lock:
+        sinks = list(_dispatcher.sinks)
+    for sink in sinks:
+        sink.flush()
+
+"""
+Stops the listener thread after it has drained the queue, and restores a plain
+stderr handler so that any later logging (e.g. during interpreter exit) is not lost.
+"""
+def shutdown_logging() -> None:
+    global _queue, _queue_handler, _listener, _dispatcher
+
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        for sink in _dispatcher.sinks:
+            sink.close()
+        root.addHandler(console_sink())
+        _queue = _queue_handler = _listener = _dispatcher = None
+
+"""
+Context manager for a nested section of the log. Messages logged inside are
+indented one level further, and tagged with `event` and/or `device` if given
+(otherwise the enclosing values are kept). Only affects the current thread/task;
+use contextvars.copy_context() to carry the context into worker threads.
+"""
+@contextmanager
+def log_context(event: (int | None) = None, device: (str | None) = None, indent: int = 1) -> Iterator[None]:
+    tokens = [(_indent_var, _indent_var.set(_indent_var.get() + indent))]
+    if event is not None:
+        tokens.append((_event_var, _event_var.set(event)))
+    if device is not None:
+        tokens.append((_device_var, _device_var.set(device)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+# Return the event index and device of the current log context (None where unset)
+def get_log_context() -> dict[str, Any]:
+    return {"event": _event_var.get(), "device": _device_var.get()}
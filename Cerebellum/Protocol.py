@@ -0,0 +1,176 @@
+"""
+Protocol.py
+This file defines the message protocol between a test subprocess (_run_test.py)
+and RunTestGUI. Each message is one line of JSON on the pipe, with a "type" field
+and a type-specific set of other fields, prefixed by a record separator character
+(MESSAGE_PREFIX) so it cannot be confused with anything else a library prints.
+
+Runner -> GUI (on stdout), in the order they usually appear:
+    run_start       {version, events, devices}
+    phase           {name}          - "verify", "init", "confirm", "exec", "shutdown"
+    event_start     {index, name, comment}
+    measurement     {event, device, channel, quantity, unit, value, low, high, passed}
+    sample          {event, device, channel, quantity, unit, value, time}   - a monitored value, for plotting
+    event_end       {index, ok, duration, error}
+    prompt          {text}          - the runner is waiting for an input message
+    error           {message}
+    log             {level, message, indent, event, device, time}
+    run_end         {ok, duration, error}
+
+GUI -> runner (on stdin):
+    config          {env, test}     - sent first, with --stdin-config: the EnvironmentConfig and TestConfig to run
+                                      (see EnvironmentConfig.to_dict and TestConfig.to_message)
+    stop            {}              - abort before the next event
+    input           {text}          - answer to a prompt
+
+Lines without the prefix are passed through as raw text (e.g. output from device
+libraries), and a plain "STOP" line is still accepted on stdin.
+
+Messages are only emitted once enable_protocol() is called, so running a test in
+a terminal prints the usual human-readable log.
+"""
+
+# Prevents TypeError on type hints for Python 3.7 to 3.9
+from __future__ import annotations
+
+from Cerebellum.LogSystem import LOG_INDENT, setup_logging, flush_logs, get_log_context
+
+from json import dumps, loads
+from typing import Any, IO
+import logging, threading, time
+
+PROTOCOL_VERSION = 1
+
+# Marks a line as a protocol message (ASCII record separator)
+MESSAGE_PREFIX = "\x1e"
+
+# Stream that messages are written to, or None if the protocol is disabled
+_stream: (IO[str] | None) = None
+_stream_lock = threading.Lock()
+
+
+
+"""
+Encoding + Decoding ============================================================
+"""
+
+# Encode a message as a single framed line (including the trailing newline)
+def encode_message(msg_type: str, **fields: Any) -> str:
+    return f"{MESSAGE_PREFIX}{dumps({'type': msg_type, **fields}, separators=(',', ':'))}\n"
+
+# Decode a single line (without the trailing newline)
+# Unframed or malformed lines become {"type": "text", "text": line}
+def decode_line(line: str) -> dict[str, Any]:
+    if line.startswith(MESSAGE_PREFIX):
+        try:
+            message = loads(line[len(MESSAGE_PREFIX):])
+            if isinstance(message, dict) and ("type" in message):
+                return message
+        except ValueError:
+            pass
+        line = line[len(MESSAGE_PREFIX):]
+    return {"type": "text", "text": line}
+
+
+
+# --- MessageDecoder: Incrementally split a byte stream into messages
+# Pipes deliver data in arbitrary chunks, so partial lines are held until their newline arrives
+class MessageDecoder:
+    def __init__(self):
+        self.pending = b""
+
+    # Add a chunk of data; return the messages of every line it completed
+    def feed(self, data: bytes) -> list[dict[str, Any]]:
+        self.pending += data
+        lines = self.pending.split(b"\n")
+        self.pending = lines.pop()
+        messages = []
+        for line in lines:
+            messages.extend(self._decode(line))
+        return messages
+
+    # Return whatever is left once the stream has ended
+    def flush(self) -> list[dict[str, Any]]:
+        if not self.pending:
+            return []
+        line, self.pending = self.pending, b""
+        return self._decode(line)
+
+    # Decode one line; a message may follow unterminated text that something else printed (e.g. print(..., end=""))
+    def _decode(self, line: bytes) -> list[dict[str, Any]]:
+        text = line.decode("utf-8", errors="replace").rstrip("\r")
+        split = text.find(MESSAGE_PREFIX)
+        if split > 0:
+            return [decode_line(text[:split]), decode_line(text[split:])]
+        return [decode_line(text)]
+
+
+
+"""
+Runner Side ====================================================================
+"""
+
+"""
+Starts emitting protocol messages on `stream`, and routes the log through it as
+"log" messages instead of human-readable lines.
+"""
+def enable_protocol(stream: IO[str]) -> None:
+    global _stream
+    with _stream_lock:
+        _stream = stream
+    setup_logging(level=logging.getLogger().level, sinks=[ProtocolLogHandler()])
+
+# Whether messages are currently being emitted
+def protocol_enabled() -> bool:
+    return _stream is not None
+
+# Emit a message, if the protocol is enabled
+# Log messages pass through the logging queue, so let it drain first to keep everything in order
+def emit(msg_type: str, **fields: Any) -> None:
+    if _stream is None:
+        return
+    if msg_type != "log":
+        flush_logs()
+    line = encode_message(msg_type, **fields)
+    with _stream_lock:
+        _stream.write(line)
+        _stream.flush()
+
+
+# Emit a measurement record for the event currently running
+# `device_idx` is the event's device, unless a per-device log context (e.g. in RBEvent.exec_multi) names another one
+# `channel` may be None for measurements that are not per-channel
+def emit_measurement(device_idx: int, channel: (int | None), quantity: str, unit: str, value: float, low: float, high: float) -> None:
+    context = get_log_context()
+    emit("measurement", event=context["event"], device=context["device"] or f"#{device_idx}", channel=channel, quantity=quantity, unit=unit,
+         value=value, low=low, high=high, passed=bool(low <= value <= high))
+
+
+
+# Emit a monitored sample (e.g. from MonitorPSU) for live plotting; same conventions as emit_measurement
+def emit_sample(device_idx: int, channel: (int | None), quantity: str, unit: str, value: float) -> None:
+    if _stream is None:
+        return
+    context = get_log_context()
+    emit("sample", event=context["event"], device=context["device"] or f"#{device_idx}", channel=channel, quantity=quantity, unit=unit,
+         value=value, time=time.time())
+
+
+# --- ProtocolLogHandler: Log sink that sends each record as a "log" message
+# A traceback (kept as exc_text by the logging pipeline) is sent as part of the message
+class ProtocolLogHandler(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            message = record.getMessage()
+            if record.exc_text:
+                message = f"{message}\n{record.exc_text}"
+            emit("log",
+                 level=record.levelname,
+                 message=message,
+                 indent=len(getattr(record, "indent", "")) // len(LOG_INDENT),
+                 event=getattr(record, "event_idx", None),
+                 device=getattr(record, "device", None),
+                 time=record.created)
+        except Exception:
+            self.handleError(record)
+
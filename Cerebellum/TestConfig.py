@@ -2,16 +2,442 @@
 TestConfig.py
 This file contains the TestConfig class, which is used to specify the sequence
 of commands to execute during a test.
+
+Test programs can also be stored in a JSON-lines variant of the format (files
+ending in .jsonl): a header line holding the class_name (and the parameters and
+macros described below), then one event per line.
+Such a file can be opened lazily, in which case the events are not constructed
+up front but read from disk when needed (see LazyEventList). This lets the
+Controller run, and the GUI page through, programs far larger than memory.
+Tests that are read in full hold their events column-wise instead (see
+EventTable), which takes a fraction of the memory of one object per event.
+
+A TestConfig can also be a template: it declares named parameters with default
+values, and any event can set its fields from them at run time through its
+`bindings` field ("voltage=lv_voltage, device_idx=lvps"). Named parameter sets
+override the defaults (e.g. one set per board flavour), and named macros hold
+sub-sequences of events that CallMacro events run in place, optionally with
+their own parameter values. Bindings and macros are expanded lazily, one event
+at a time, by TestConfig.events().
 """
 
 # Prevents TypeError on type hints for Python 3.7 to 3.9
 from __future__ import annotations
 
-from Cerebellum.Common import EVENTS
-from Cerebellum.Event import Event
+from Cerebellum.Common import EVENTS, get_schema
+from Cerebellum.Codec import encode_object, encode_object_wire, object_class_name, decode_encoded, check_field, dumps_data, write_file, WireTable, WIRE_FIELDS_KEY
+from Cerebellum.Event import Event, CallMacro
+
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSequence
+from json import dumps, load, loads
+from typing import Any, Callable, Iterable, Iterator
+import copy, logging, os, threading
+
+# Suffix of the JSON-lines variant of the test format
+JSONL_SUFFIX = ".jsonl"
+
+# Number of decoded events a LazyEventList keeps for random access (e.g. the rows visible in the GUI)
+LAZY_CACHE_SIZE = 256
+
+# Number of lines between progress reports while indexing a JSON-lines file
+LAZY_INDEX_REPORT_LINES = 10000
+
+# Number of unused rows an EventTable may hold before it is compacted, regardless of its length
+EVENT_TABLE_COMPACT_ROWS = 1024
+
+# Maximum nesting depth of macro calls, to catch macros that call themselves
+MAX_MACRO_DEPTH = 16
+
+
+
+# Whether `filepath` uses the JSON-lines variant of the test format
+def is_jsonl(filepath: str) -> bool:
+    return filepath.lower().endswith(JSONL_SUFFIX)
+
+"""
+Constructs one encoded event (in either encoding, see Codec.py). Returns None if
+the event is malformed, its class is not installed, or its fields fail to
+validate; the reason is logged as a warning.
+"""
+def decode_event(data: Any, wire_table: (WireTable | None) = None) -> (Event | None):
+    try:
+        event_class_name = object_class_name(data)
+    except Exception as e:
+        logging.warning(f"Malformed event: {e}")
+        logging.warning("Skipping event...")
+        return None
+
+    # Use the corresponding constructor from EVENTS
+    if (event_class_name in EVENTS):
+        try:
+            return decode_encoded(EVENTS[event_class_name], data, wire_table)
+        except Exception as e:
+            logging.warning(f"Event constructor {event_class_name}() failed: {e}")
+            logging.warning("Skipping event...")
+    else:
+        logging.warning(f"Event constructor {event_class_name}() not in EVENTS constructor list. Either the {event_class_name} class isn't installed, or the constructor previously failed to verify.")
+        logging.warning("Skipping event...")
+    return None
+
+
+
+"""
+Parameters + Macros ============================================================
+"""
+
+# Parse "name=value, name=value" into [(name, value), ...]
+def parse_assignments(text: str) -> list[tuple[str, str]]:
+    pairs = []
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition("=")
+        if (not sep) or (not name.strip()) or (not value.strip()):
+            raise ValueError(f"Malformed assignment {item.strip()!r} (expected name=value).")
+        pairs.append((name.strip(), value.strip()))
+    return pairs
+
+# Return the value of a macro argument: $name refers to a parameter, anything else is read as JSON (or else taken as a string)
+def _argument_value(text: str, parameters: dict[str, Any]) -> Any:
+    if text.startswith("$"):
+        if text[1:] not in parameters:
+            raise ValueError(f"Parameter {text[1:]} is not defined.")
+        return parameters[text[1:]]
+    try:
+        return loads(text)
+    except ValueError:
+        return text
+
+"""
+Returns `event` with its bindings applied from `parameters`: a copy of the event
+with each bound field set to its parameter's value (type-checked against the
+field), or the event itself if it has no bindings.
+"""
+def bind_event(event: Event, parameters: dict[str, Any]) -> Event:
+    if not event.bindings:
+        return event
+    fields = {field.name: field for field in get_schema(event.__class__)}
+    bound = copy.copy(event)
+    for field_name, parameter in parse_assignments(event.bindings):
+        field = fields.get(field_name)
+        if (field is None) or (field_name == "bindings"):
+            raise ValueError(f"{event.__class__.__name__} has no field {field_name} to bind.")
+        if parameter not in parameters:
+            raise ValueError(f"Parameter {parameter} (bound to {field_name} of {event.__class__.__name__}) is not defined.")
+        setattr(bound, field_name, check_field(event.__class__, field_name, field.type, parameters[parameter]))
+    return bound
+
+"""
+Yields the events of `events` with their bindings applied, replacing each
+CallMacro with the (recursively expanded) events of its macro. A macro's events
+see the caller's parameters, overridden by the CallMacro's arguments. Raises
+ValueError for undefined macros or parameters, and for macros nested deeper than
+MAX_MACRO_DEPTH.
+"""
+def expand_events(events: Iterable[Event], macros: dict[str, list[Event]], parameters: dict[str, Any], depth: int = 0) -> Iterator[Event]:
+    for event in events:
+        event = bind_event(event, parameters)
+        if not isinstance(event, CallMacro):
+            yield event
+            continue
+        if event.macro not in macros:
+            raise ValueError(f"Macro {event.macro} is not defined.")
+        if depth >= MAX_MACRO_DEPTH:
+            raise ValueError(f"Macros are nested more than {MAX_MACRO_DEPTH} deep at macro {event.macro}. Does it call itself?")
+        scope = dict(parameters)
+        for name, value in parse_assignments(event.arguments):
+            scope[name] = _argument_value(value, parameters)
+        yield from expand_events(macros[event.macro], macros, scope, depth + 1)
+
+
+
+# Decode one line of a JSON-lines test file into an event, or None (with a warning) if it is not valid
+def _decode_line(line: bytes) -> (Event | None):
+    try:
+        data = loads(line)
+    except ValueError as e:
+        logging.warning(f"Malformed event line: {e}")
+        logging.warning("Skipping event...")
+        return None
+    return decode_event(data)
+
+"""
+LazyEventList
+A list of events backed by a JSON-lines test file. Only the byte offset of each
+event's line is held in memory; events are decoded when accessed, and the most
+recently accessed ones are cached. Events that are inserted or assigned are kept
+as objects, so the list can be edited like any other. Iterating reads the file
+sequentially and skips events that fail to decode (as read_json does), while
+indexing such an event raises ValueError.
+
+The file is opened once, by open(), and the list (and its copies) keep reading
+from that handle. Files are only ever written by replacing them (see
+Codec.write_file), so saving over the path leaves the list reading the file it
+indexed. Writing into the file in place would invalidate the list.
+"""
+class LazyEventList(MutableSequence):
+
+    def __init__(self, filepath: str, file: Any):
+        self.filepath = filepath
+        self.file = file                    # Handle of the indexed file, shared with copies
+        self.file_lock = threading.Lock()   # Serializes seek + read on the shared handle, shared with copies
+        self.entries = array('q')           # Per event: byte offset of its line (>= 0), or -(k + 1) for objects[k]
+        self.objects: list[Event] = []      # Events inserted or assigned since the file was opened
+        self.cache: OrderedDict[int, Event] = OrderedDict() # Decoded events, by offset
+        self.modified = False               # Whether the list differs from the file
+
+    """
+    Indexes the JSON-lines file at `filepath`; returns its header (the first line)
+    and a LazyEventList of its events. If given, `progress(done, total)` is called
+    with the number of bytes indexed; it may raise to abort.
+    """
+    @classmethod
+    def open(cls, filepath: str, progress: (Callable[[int, int], None] | None) = None) -> tuple[dict[str, Any], LazyEventList]:
+        f = open(filepath, 'rb')
+        try:
+            events = cls(filepath, f)
+            header = loads(f.readline())
+            total = os.fstat(f.fileno()).st_size
+            offset = f.tell()
+            for line_count, line in enumerate(f, 1):
+                if line.strip():
+                    events.entries.append(offset)
+                offset += len(line)
+                if progress and (line_count % LAZY_INDEX_REPORT_LINES == 0):
+                    progress(offset, total)
+        except BaseException:
+            f.close()
+            raise
+        if progress:
+            progress(total, total)
+        return header, events
+
+    # Close the file; the events still on disk can no longer be read, by this list or its copies
+    def close(self) -> None:
+        with self.file_lock:
+            self.file.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, idx: (int | slice)) -> Any:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        entry = self.entries[idx]
+        if entry < 0:
+            return self.objects[-entry - 1]
+        event = self.cache.get(entry)
+        if event is None:
+            event = _decode_line(self._read_line(entry))
+            if event is None:
+                raise ValueError(f"Event #{idx % len(self)} in {self.filepath} could not be read.")
+            self.cache[entry] = event
+            if len(self.cache) > LAZY_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(entry)
+        return event
+
+    def __setitem__(self, idx: int, event: Event) -> None:
+        entry = self.entries[idx]
+        if entry < 0:
+            self.objects[-entry - 1] = event
+        else:
+            self.entries[idx] = self._store(event)
+        self.modified = True
+
+    def __delitem__(self, idx: (int | slice)) -> None:
+        del self.entries[idx]
+        self.modified = True
+
+    def insert(self, idx: int, event: Event) -> None:
+        self.entries.insert(idx, self._store(event))
+        self.modified = True
+
+    def __iter__(self) -> Iterator[Event]:
+        for entry, line in self.raw():
+            if line is None:
+                yield entry
+            else:
+                event = _decode_line(line)
+                if event is not None:
+                    yield event
+
+    """
+    Iterates over the list in order, reading the file sequentially. Yields (event,
+    None) for events held as objects, and (offset, line) for events still on disk,
+    with `line` the undecoded bytes of the line (ending in a newline).
+    """
+    def raw(self) -> Iterator[tuple[Any, (bytes | None)]]:
+        for entry in self.entries:
+            if entry < 0:
+                yield self.objects[-entry - 1], None
+                continue
+            line = self._read_line(entry)
+            yield entry, (line if line.endswith(b"\n") else line + b"\n")
+
+    # Shallow copy: the copy reads the same file handle and holds the same event objects
+    def copy(self) -> LazyEventList:
+        events = LazyEventList(self.filepath, self.file)
+        events.file_lock = self.file_lock
+        events.entries = array('q', self.entries)
+        events.objects = list(self.objects)
+        events.modified = self.modified
+        return events
 
-from json import dump, load
-import logging
+    def _store(self, event: Event) -> int:
+        self.objects.append(event)
+        return -len(self.objects)
+
+    # Read the line at byte `offset` of the file (seeking within the read buffer is cheap, so sequential reads stay fast)
+    def _read_line(self, offset: int) -> bytes:
+        with self.file_lock:
+            if self.file.closed:
+                raise ValueError(f"{self.filepath} was closed, so its events can no longer be read.")
+            self.file.seek(offset)
+            return self.file.readline()
+
+
+
+"""
+EventTable
+A list of events held column-wise instead of as Event objects. Each event class
+in the table gets one column per field of its schema (see Common.get_schema),
+and each event is a class id plus a row in its class's columns. float and int
+columns are packed arrays; other fields are plain lists of values. An Event
+object costs a __dict__ and a boxed value per field, so a table of a long sweep
+takes a fraction of the memory of the same events as objects.
+
+Events are constructed from their row when accessed, so changing an event read
+from the table does not change the table; assign it back to do that. Only the
+schema fields of an event are stored. Rows of events that are deleted or
+replaced stay in the columns until the table is compacted, which happens once
+they outnumber the events.
+"""
+class EventTable(MutableSequence):
+
+    def __init__(self, events: Iterable[Event] = ()):
+        self.classes: list[type] = []               # Event class of each class id
+        self.class_ids: dict[type, int] = {}        # Class id of each event class
+        self.names: list[tuple[str, ...]] = []      # Per class id: field names, in schema order
+        self.columns: list[list[Any]] = []          # Per class id: one column (array or list) per field
+        self.kinds: list[list[(type | None)]] = []  # Per class id: per column, the type a packed column holds (None for lists)
+        self.event_classes = array('H')             # Per event: class id
+        self.event_rows = array('q')                # Per event: row in its class's columns
+        self.dead = 0                               # Rows no longer used by any event
+        self.extend(events)
+
+    def __len__(self) -> int:
+        return len(self.event_rows)
+
+    def __getitem__(self, idx: (int | slice)) -> Any:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        return self._event(self.event_classes[idx], self.event_rows[idx])
+
+    def __setitem__(self, idx: int, event: Event) -> None:
+        class_id, row = self._store(event)
+        self.event_classes[idx] = class_id
+        self.event_rows[idx] = row
+        self._release(1)
+
+    def __delitem__(self, idx: (int | slice)) -> None:
+        count = len(self.event_rows)
+        del self.event_classes[idx]
+        del self.event_rows[idx]
+        self._release(count - len(self.event_rows))
+
+    def insert(self, idx: int, event: Event) -> None:
+        class_id, row = self._store(event)
+        self.event_classes.insert(idx, class_id)
+        self.event_rows.insert(idx, row)
+
+    def append(self, event: Event) -> None:
+        class_id, row = self._store(event)
+        self.event_classes.append(class_id)
+        self.event_rows.append(row)
+
+    def __iter__(self) -> Iterator[Event]:
+        for class_id, row in zip(self.event_classes, self.event_rows):
+            yield self._event(class_id, row)
+
+    # Copy of the table; events read from either are independent objects, so the columns are copied as well
+    def copy(self) -> EventTable:
+        events = EventTable()
+        events.classes = list(self.classes)
+        events.class_ids = dict(self.class_ids)
+        events.names = list(self.names)
+        events.columns = [[copy.copy(column) for column in columns] for columns in self.columns]
+        events.kinds = [list(kinds) for kinds in self.kinds]
+        events.event_classes = array('H', self.event_classes)
+        events.event_rows = array('q', self.event_rows)
+        events.dead = self.dead
+        return events
+
+    # Construct the event in `row` of the columns of `class_id`
+    def _event(self, class_id: int, row: int) -> Event:
+        values = {}
+        for name, column in zip(self.names[class_id], self.columns[class_id]):
+            value = column[row]
+            values[name] = copy.copy(value) if isinstance(value, (list, dict)) else value
+        return self.classes[class_id](vars_dict=values)
+
+    # Add the fields of `event` as a new row of its class's columns; returns (class id, row)
+    def _store(self, event: Event) -> tuple[int, int]:
+        cls = event.__class__
+        class_id = self.class_ids.get(cls)
+        if class_id is None:
+            class_id = self._add_class(cls)
+        values = [getattr(event, name) for name in self.names[class_id]] # Read every field before touching the columns
+        columns = self.columns[class_id]
+        kinds = self.kinds[class_id]
+        for idx, (column, kind, value) in enumerate(zip(columns, kinds, values)):
+            if kind is None:
+                column.append(copy.copy(value) if type(value) in (list, dict) else value)
+                continue
+            # Values a packed column can't hold exactly (e.g. an int in a float field) turn it back into a list
+            if type(value) is kind:
+                try:
+                    column.append(value)
+                    continue
+                except OverflowError:
+                    pass
+            columns[idx] = list(column)
+            columns[idx].append(value)
+            kinds[idx] = None
+        return class_id, len(columns[0]) - 1
+
+    def _add_class(self, cls: type) -> int:
+        if len(self.classes) > 0xFFFF:
+            raise ValueError(f"An EventTable holds at most {0xFFFF + 1} event classes.") # Class ids are unsigned shorts
+        schema = get_schema(cls)
+        self.class_ids[cls] = len(self.classes)
+        self.classes.append(cls)
+        self.names.append(tuple(field.name for field in schema))
+        self.kinds.append([field.type if field.type in (float, int) else None for field in schema])
+        self.columns.append([array('d' if kind is float else 'q') if kind else [] for kind in self.kinds[-1]])
+        return len(self.classes) - 1
+
+    # Account for `count` rows that no event uses anymore, compacting the columns once they outnumber the events
+    def _release(self, count: int) -> None:
+        self.dead += count
+        if self.dead > max(len(self), EVENT_TABLE_COMPACT_ROWS):
+            self._compact()
+
+    # Rebuild the columns from the rows still in use, in event order
+    def _compact(self) -> None:
+        events = list(zip(self.event_classes, self.event_rows))
+        columns = [[column[:0] for column in class_columns] for class_columns in self.columns]
+        counts = [0] * len(self.classes)
+        for idx, (class_id, row) in enumerate(events):
+            for new_column, column in zip(columns[class_id], self.columns[class_id]):
+                new_column.append(column[row])
+            self.event_rows[idx] = counts[class_id]
+            counts[class_id] += 1
+        self.columns = columns
+        self.dead = 0
 
 
 
@@ -24,60 +450,238 @@ configuration can be written as a JSON file and later read back into a config ob
 class TestConfig:
 
     def __init__(self):
-        self.event_list: list[Event] = [] # List of Event objects to be executed during the test
+        self.event_list: (list[Event] | LazyEventList | EventTable) = [] # List of Event objects to be executed during the test
+        self.parameters: dict[str, Any] = {}                # Default value of each test parameter, by name
+        self.parameter_sets: dict[str, dict[str, Any]] = {} # Named sets of parameter values that override the defaults
+        self.macros: dict[str, list[Event]] = {}            # Named sub-sequences of events, run by CallMacro events
 
     """
-    Writes the current TestConfig to the given `filepath` as a JSON file.
+    Iterates over the events to execute, in order. Bindings are applied from the
+    default parameters, overridden by `parameters`, and CallMacro events are
+    replaced by their macro's events. This is done one event at a time, and for a
+    lazily opened file the events are read from disk one at a time as well.
     """
-    def write_json(self, filepath: str):
+    def events(self, parameters: (dict[str, Any] | None) = None) -> Iterator[Event]:
+        return expand_events(self.event_list, self.macros, self.resolve_parameters(parameters))
 
-        # Convert all objects to dicts, add identifiers to each
-        json_dict = vars(self).copy()
-        json_dict["event_list"] = []
-        for event in self.event_list:
-            event_dict = vars(event)
-            event_dict["class_name"] = event.__class__.__name__
-            json_dict["event_list"].append(event_dict)
+    # Return the default parameters overridden by `parameters`; raises ValueError for undeclared parameters
+    def resolve_parameters(self, parameters: (dict[str, Any] | None) = None) -> dict[str, Any]:
+        unknown = [name for name in (parameters or {}) if name not in self.parameters]
+        if unknown:
+            raise ValueError(f"Unknown test parameter(s): {', '.join(unknown)}. Declared parameters: {', '.join(self.parameters) or 'none'}.")
+        return {**self.parameters, **(parameters or {})}
+
+    # Return the parameter values of the named parameter set
+    def parameter_set(self, name: str) -> dict[str, Any]:
+        if name not in self.parameter_sets:
+            raise ValueError(f"Parameter set {name} is not defined. Defined sets: {', '.join(self.parameter_sets) or 'none'}.")
+        return dict(self.parameter_sets[name])
+
+    """
+    Returns the current TestConfig as JSON-ready data, without modifying any event.
+    With `wire`, uses the compact wire encoding (see Codec.py). If given,
+    `progress(done, total)` is called after each event is converted; it may raise
+    to abort.
+    """
+    def to_dict(self, wire: bool = False, progress: (Callable[[int, int], None] | None) = None) -> dict[str, Any]:
+        field_table: dict[str, list[str]] = {}
+        encode = (lambda event: encode_object_wire(event, field_table)) if wire else encode_object
+        event_list: list[Any] = []
+        total = len(self.event_list)
+        for done, event in enumerate(self.event_list, 1):
+            event_list.append(encode(event))
+            if progress:
+                progress(done, total)
+        json_dict: dict[str, Any] = {"event_list": event_list}
+        json_dict.update(self._template_dict(encode))
+        if wire:
+            json_dict[WIRE_FIELDS_KEY] = field_table
 
         # Add identifier for the JSON itself
         json_dict["class_name"] = self.__class__.__name__
-        
-        # Open file and write JSON
-        with open(filepath, 'w') as f:
-            dump(json_dict, f, indent=4)
+        return json_dict
+
+    # Parameters, parameter sets and macros, with each macro event encoded by `encode`
+    def _template_dict(self, encode: Callable[[Event], Any]) -> dict[str, Any]:
+        return {
+            "parameters": self.parameters,
+            "parameter_sets": self.parameter_sets,
+            "macros": {name: [encode(event) for event in events] for name, events in self.macros.items()},
+        }
 
     """
-    Reads the given `filepath` for a JSON representation of a TestConfig;
-    populates the fields of the current TestConfig with the extracted values.
+    Populates the fields of the current TestConfig from data returned by to_dict()
+    (in either encoding). The events are held in an EventTable. Events that fail to
+    construct or validate are skipped with a warning. If given, `progress(done, total)` is called after each event is
+    constructed; it may raise to abort.
     """
-    def read_json(self, filepath: str):
-        
-        # Open file and read JSON
-        with open(filepath, 'r') as f:
-            json_dict = load(f)
-        
-        # Check for identifier
-        json_class_name = json_dict.pop("class_name")
+    def from_dict(self, json_dict: dict[str, Any], progress: (Callable[[int, int], None] | None) = None) -> None:
+        self._check_header(json_dict)
+
+        # Convert encoded events to objects
+        wire_table = WireTable(json_dict[WIRE_FIELDS_KEY]) if (WIRE_FIELDS_KEY in json_dict) else None
+        self._read_template(json_dict, wire_table)
+        self.event_list = EventTable()
+        total = len(json_dict["event_list"])
+        for done, data in enumerate(json_dict["event_list"], 1):
+            event = decode_event(data, wire_table)
+            if event is not None:
+                self.event_list.append(event)
+            if progress:
+                progress(done, total)
+
+    # Check for identifier
+    def _check_header(self, json_dict: dict[str, Any]) -> None:
+        json_class_name = json_dict.get("class_name")
         if (json_class_name != self.__class__.__name__):
             raise ValueError(f"Invalid {self.__class__.__name__} JSON file (class_name field is {json_class_name}, not {self.__class__.__name__}).")
-        
-        # Assign fields to JSON data
-        # Convert object dicts to objects
-        self.event_list.clear()
-        for event in json_dict["event_list"]:
-
-            # Look for event class_name field to inform what sort of Event to construct
-            # Also remove class_name from the dict so it doesn't end up in the instance
-            event_class_name = event.pop("class_name")
-
-            # Use the corresponding constructor from EVENTS
-            if (event_class_name in EVENTS):
-                constructor = EVENTS[event_class_name]
-                try:
-                    self.event_list.append(constructor(vars_dict=event))
-                except Exception as e:
-                    logging.warning(f"Event constructor {event_class_name}() failed: {e}")
-                    logging.warning("Skipping event...")
-            else: 
-                logging.warning(f"Event constructor {event_class_name}() not in EVENTS constructor list. Either the {event_class_name} class isn't installed, or the constructor previously failed to verify.")
-                logging.warning("Skipping event...")
+
+    # Read and check the parameters, parameter sets and macros (absent from files written before they were added)
+    def _read_template(self, json_dict: dict[str, Any], wire_table: (WireTable | None)) -> None:
+        parameters = json_dict.get("parameters", {})
+        parameter_sets = json_dict.get("parameter_sets", {})
+        macros = json_dict.get("macros", {})
+        if not isinstance(parameters, dict):
+            raise ValueError(f"parameters must be an object of parameter values, not {parameters!r}.")
+        if not (isinstance(parameter_sets, dict) and all(isinstance(values, dict) for values in parameter_sets.values())):
+            raise ValueError(f"parameter_sets must be an object of parameter value objects, not {parameter_sets!r}.")
+        if not (isinstance(macros, dict) and all(isinstance(events, list) for events in macros.values())):
+            raise ValueError(f"macros must be an object of event lists, not {macros!r}.")
+        for set_name, values in parameter_sets.items():
+            unknown = [name for name in values if name not in parameters]
+            if unknown:
+                raise ValueError(f"Parameter set {set_name} sets undeclared parameter(s): {', '.join(unknown)}.")
+
+        self.parameters = parameters
+        self.parameter_sets = parameter_sets
+        self.macros = {}
+        for name, events in macros.items():
+            self.macros[name] = [event for event in (decode_event(data, wire_table) for data in events) if event is not None]
+
+    """
+    Writes the current TestConfig to the given `filepath` as a JSON file, or as a
+    JSON-lines file if `filepath` ends in .jsonl. If given, `progress(done, total)`
+    is called after each event is converted; it may raise to abort, in which case
+    `filepath` is left untouched.
+    """
+    def write_json(self, filepath: str, progress: (Callable[[int, int], None] | None) = None) -> None:
+        if is_jsonl(filepath):
+            self._write_jsonl(filepath, progress)
+        else:
+            write_file(filepath, self.to_dict(progress=progress))
+
+    """
+    Reads the given `filepath` for a JSON representation of a TestConfig;
+    populates the fields of the current TestConfig with the extracted values.
+    If `lazy` is set and `filepath` is a JSON-lines file, the events are only
+    indexed and are read from disk when used (see LazyEventList); until then,
+    invalid events go unnoticed. Otherwise they are held in an EventTable. If given, `progress(done, total)` is called as the
+    read proceeds; it may raise to abort the read.
+    """
+    def read_json(self, filepath: str, progress: (Callable[[int, int], None] | None) = None, lazy: bool = False) -> None:
+        if is_jsonl(filepath) and lazy:
+            header, events = LazyEventList.open(filepath, progress)
+            try:
+                self._check_header(header)
+                self._read_template(header, None)
+            except BaseException:
+                events.close()
+                raise
+            self.event_list = events
+        elif is_jsonl(filepath):
+            # The file is only read through once, so it is closed as soon as its events are copied
+            header, events = LazyEventList.open(filepath)
+            try:
+                self._check_header(header)
+                self._read_template(header, None)
+                self.event_list = EventTable()
+                total = len(events)
+                for done, event in enumerate(events, 1):
+                    self.event_list.append(event)
+                    if progress:
+                        progress(done, total)
+            finally:
+                events.close()
+        else:
+            with open(filepath, 'r') as f:
+                self.from_dict(load(f), progress)
+
+    # Write the header line (class_name, parameters, parameter sets and macros), then one line per event
+    # Events of a LazyEventList that are still on disk are copied over without decoding them
+    def _write_jsonl(self, filepath: str, progress: (Callable[[int, int], None] | None)) -> None:
+        header = {**self._template_dict(encode_object), "class_name": self.__class__.__name__}
+        temp_filepath = f"{filepath}.tmp"
+        total = len(self.event_list)
+        try:
+            with open(temp_filepath, 'wb') as f:
+                f.write(dumps(header).encode() + b"\n")
+                if isinstance(self.event_list, LazyEventList):
+                    items = self.event_list.raw()
+                else:
+                    items = ((event, None) for event in self.event_list)
+                for done, (event, line) in enumerate(items, 1):
+                    f.write(line if line is not None else dumps(encode_object(event)).encode() + b"\n")
+                    if progress:
+                        progress(done, total)
+
+            # Windows can't replace a file that is open, so a list saved over its own file lets go of it first
+            # Elsewhere the list (and its copies) keep reading the replaced file until re-opened
+            events = self.event_list
+            if (os.name == "nt") and isinstance(events, LazyEventList) and os.path.exists(filepath) and os.path.samefile(events.filepath, filepath):
+                events.close()
+            os.replace(temp_filepath, filepath)
+        finally:
+            if os.path.exists(temp_filepath):
+                os.remove(temp_filepath)
+
+    """
+    Returns the current TestConfig as wire-encoded data for the config message that
+    starts a test process (see Protocol.py). A lazily opened test that has not been
+    edited is sent as the path of its file instead of its events, along with the
+    file's size and modification time, so the test process can stream the events
+    from the same file. The test process checks that the file is unchanged when it
+    opens it, and keeps it open for the whole run (see LazyEventList), so saving
+    over the file during the run does not affect the running test.
+    The size and modification time are those of the file that was opened. If the
+    file at that path is no longer the same (e.g. it was saved over from outside),
+    the events are sent inline instead, read from the opened file.
+    """
+    def to_message(self) -> dict[str, Any]:
+        events = self.event_list
+        if not (isinstance(events, LazyEventList) and not events.modified) or events.file.closed:
+            return self.to_dict(wire=True)
+        opened = os.fstat(events.file.fileno())
+        try:
+            on_disk = os.stat(events.filepath)
+        except OSError:
+            return self.to_dict(wire=True)
+        identity = lambda stat: (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if identity(opened) != identity(on_disk):
+            return self.to_dict(wire=True)
+        template = copy.copy(self)
+        template.event_list = []
+        data = template.to_dict(wire=True)
+        data["event_file"] = {"path": os.path.abspath(events.filepath), "size": opened.st_size, "mtime_ns": opened.st_mtime_ns}
+        return data
+
+    # Populate the current TestConfig from the output of to_message()
+    # Raises ValueError if the event file was changed since the message was made
+    def from_message(self, data: dict[str, Any]) -> None:
+        self.from_dict(data)
+        event_file = data.get("event_file")
+        if event_file:
+            # Open first, then check the opened file, so the file that is checked is the one that is read
+            events = LazyEventList.open(event_file["path"])[1]
+            stat = os.fstat(events.file.fileno())
+            if (stat.st_size, stat.st_mtime_ns) != (event_file["size"], event_file["mtime_ns"]):
+                events.close()
+                raise ValueError(f"Test file {event_file['path']} changed after the test was started.")
+            self.event_list = events
+
+    # Return the current TestConfig as a single line of wire-encoded JSON
+    def to_wire(self) -> str:
+        return dumps_data(self.to_dict(wire=True), wire=True)
+
+    # Populate the current TestConfig from the output of to_wire()
+    def from_wire(self, text: str) -> None:
+        self.from_dict(loads(text))
@@ -1,3 +1,4 @@
-# Set up logging
+# Set up logging - see LogSystem.py
 import logging
-logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+from Cerebellum.LogSystem import setup_logging
+setup_logging(level=logging.INFO)
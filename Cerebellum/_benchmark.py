@@ -0,0 +1,100 @@
+"""
+_benchmark.py
+This script measures the cost of handling large test programs, for checking
+changes to the config classes and their encodings. It is not used by Cerebellum
+itself. Run it from a terminal:
+
+    python3 Cerebellum/_benchmark.py codec [--events N]
+    python3 Cerebellum/_benchmark.py memory [--events N]
+
+codec: Round-trip time of a TestConfig of N events through the file format
+(write_json/read_json) and the wire format (to_wire/from_wire).
+
+memory: Memory held by N events as a list of Event objects and as an
+EventTable, and the time to build and iterate each.
+"""
+
+import sys, os
+ABS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(f"{ABS_DIR}/../") # Cerebellum parent directory
+
+from Cerebellum.Common import EVENTS
+from Cerebellum.TestConfig import TestConfig, EventTable
+
+import argparse, copy, logging, tempfile, time, tracemalloc
+
+
+
+# Build a TestConfig of `count` events, cycling through the installed device-free and PSU events
+def make_test(count: int) -> TestConfig:
+    classes = [EVENTS[name] for name in ("Sleep", "SetPSU", "EvalPSUVoltage", "Checkpoint") if name in EVENTS]
+    config = TestConfig()
+    for idx in range(count):
+        event = classes[idx % len(classes)]()
+        event.comment = f"Step {idx}"
+        config.event_list.append(event)
+    return config
+
+# Return the best of `repeat` wall-clock times (s) of func()
+def best_time(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+
+def bench_codec(count: int) -> None:
+    config = make_test(count)
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, "test.json")
+
+        write = best_time(lambda: config.write_json(filepath))
+        read = best_time(lambda: TestConfig().read_json(filepath))
+        file_size = os.path.getsize(filepath)
+
+        wire = config.to_wire()
+        encode = best_time(config.to_wire)
+        decode = best_time(lambda: TestConfig().from_wire(wire))
+
+    print(f"{count} events")
+    print(f"  file: write {write * 1e3:8.1f} ms, read {read * 1e3:8.1f} ms, {file_size / 1e6:6.2f} MB")
+    print(f"  wire: encode {encode * 1e3:7.1f} ms, decode {decode * 1e3:7.1f} ms, {len(wire) / 1e6:6.2f} MB")
+
+# Return (result of func(), bytes allocated by it that are still held)
+def held_memory(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, held
+
+def bench_memory(count: int) -> None:
+    events = make_test(count).event_list
+    for name, build in (("objects", lambda: [copy.copy(event) for event in events]), ("table", lambda: EventTable(events))):
+        held_events, held = held_memory(build)
+        build_time = best_time(build)
+        iterate_time = best_time(lambda: sum(1 for _ in held_events))
+        print(f"  {name:7}: {held / 1e6:7.2f} MB ({held / count:6.1f} B/event), build {build_time * 1e3:7.1f} ms, iterate {iterate_time * 1e3:7.1f} ms")
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cerebellum config benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    codec_parser = subparsers.add_parser("codec", help="file/wire round-trip time of a large TestConfig")
+    codec_parser.add_argument("--events", type=int, default=100000)
+    memory_parser = subparsers.add_parser("memory", help="memory held by a large event list, as objects and as an EventTable")
+    memory_parser.add_argument("--events", type=int, default=100000)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR) # Hide import warnings for missing device libraries
+    if args.benchmark == "codec":
+        bench_codec(args.events)
+    elif args.benchmark == "memory":
+        print(f"{args.events} events")
+        bench_memory(args.events)
@@ -1,17 +1,26 @@
 """
 _run_test.py
 This script is used by RunTestGUI to run a test program as a subprocess.
-RunTestGUI writes the current EnvironmentConfig and TestConfig to JSON files
-and starts this script in a subprocess. This script will run the test specified
-by those JSON files, and RunTestGUI will capture its output for display in the
-GUI.
+RunTestGUI starts this script with the --stdin-config flag and sends the current
+EnvironmentConfig and TestConfig as the first message on its stdin (see
+Protocol.py), so nothing is written to disk and any number of tests can run at
+once from the same installation. This script will run the test specified by
+those configs, and RunTestGUI will capture its output for display in the GUI.
 
 This script can be used to bypass normal GUI operation. Save an
-EnvironmentConfig JSON to this directory as "env_config.json", and save a
-TestConfig JSON to this directory as "test_config.json". Then, executing this
-script in a terminal will use these configurations to immediately run a test,
-with the output being displayed in your terminal. Note that these files will be
-overwritten and deleted the next time a test is executed through the GUI.
+EnvironmentConfig JSON and a TestConfig JSON (or JSON-lines file, see
+TestConfig.py), then run this script in a terminal with
+--env ENV_FILE --test TEST_FILE to immediately run a test, with the output
+being displayed in your terminal. Without those options, "temp_env.json" and
+"temp_test.json" in this directory are used.
+
+RunTestGUI passes the --protocol flag, which switches the output from plain log
+lines to the message protocol defined in Protocol.py.
+
+If the TestConfig declares parameters (see TestConfig.py), --parameter-set NAME
+runs the test with one of its named parameter sets; given several times, the test
+is run once per set, one after another. --parameters '{"name": value, ...}' sets
+individual parameters on top of the chosen set.
 """
 
 import sys, os
@@ -20,11 +29,56 @@ sys.path.append(f"{ABS_DIR}/../") # Cerebellum parent directory
 from Cerebellum.EnvironmentConfig import EnvironmentConfig
 from Cerebellum.TestConfig import TestConfig
 from Cerebellum.Controller import run_test
+from Cerebellum.InputProcessing import read_message, stop_event
+from Cerebellum.Protocol import enable_protocol
 
-env_config = EnvironmentConfig()
-env_config.read_json(f"{ABS_DIR}/temp_env.json")
+import argparse, json, logging
+
+parser = argparse.ArgumentParser(description="Run a test (normally started by RunTestGUI).")
+parser.add_argument("--protocol", action="store_true", help="write protocol messages instead of plain log lines")
+parser.add_argument("--stdin-config", action="store_true", help="read the configs from a config message on stdin")
+parser.add_argument("--env", default=f"{ABS_DIR}/temp_env.json", metavar="FILE", help="EnvironmentConfig JSON file")
+parser.add_argument("--test", default=f"{ABS_DIR}/temp_test.json", metavar="FILE", help="TestConfig JSON or JSON-lines file")
+parser.add_argument("--parameter-set", action="append", default=[], metavar="NAME", help="run with the named parameter set; repeat to run once per set")
+parser.add_argument("--parameters", default="{}", metavar="JSON", help="parameter values to set on top of the parameter set")
+args = parser.parse_args()
 
+if args.protocol:
+    enable_protocol(sys.stdout)
+
+env_config = EnvironmentConfig()
 test_config = TestConfig()
-test_config.read_json(f"{ABS_DIR}/temp_test.json")
+if args.stdin_config:
+    message = read_message()
+    if (message is None) or (message["type"] != "config"):
+        sys.exit("Expected a config message on stdin.")
+    env_config.from_dict(message["env"])
+    test_config.from_message(message["test"])
+else:
+    env_config.read_json(args.env)
+
+    # Opened lazily, so the events of a JSON-lines file are streamed from it during the test rather than all loaded up front
+    test_config.read_json(args.test, lazy=True)
+
+# Check the parameter options before running anything
+try:
+    overrides = json.loads(args.parameters)
+except ValueError as e:
+    parser.error(f"--parameters is not valid JSON: {e}")
+if not isinstance(overrides, dict):
+    parser.error("--parameters must be a JSON object of parameter values")
+try:
+    parameter_sets = [(set_name, {**test_config.parameter_set(set_name), **overrides}) for set_name in args.parameter_set]
+    test_config.resolve_parameters(overrides)
+except ValueError as e:
+    parser.error(str(e))
 
-run_test(env_config, test_config)
+# Run once per requested parameter set (or once with the default parameters)
+# A stopped test skips the sets that have not run yet
+for set_name, parameters in (parameter_sets or [(None, overrides)]):
+    if stop_event.is_set():
+        logging.info("Test was stopped, skipping the remaining parameter sets.")
+        break
+    if set_name:
+        logging.info(f"Parameter set: {set_name} ==========")
+    run_test(env_config, test_config, parameters)